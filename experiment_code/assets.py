@@ -0,0 +1,71 @@
+"""
+the task images (pictures/*.png)
+preload() decodes them on a background thread (main.py starts it before the instructions, so it runs while the
+participant reads them). image_stim() gives one ImageStim per window and image that is reused on every trial, instead of
+a new ImageStim that loads the png file again in every trial.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import threading
+from backend import visual
+try:
+    from PIL import Image
+except ImportError:  # psychopy loads the files itself
+    Image = None
+
+
+###################################
+# FUNCTIONS
+###################################
+IMAGES = ['pictures/spaceship.png', 'pictures/flame.png', 'pictures/heart.png', 'pictures/money.png']
+_decoded = {}  # path -> decoded PIL image
+_stims = {}  # (window, path) -> ImageStim
+_preload_thread = None
+
+
+def _decode(paths):
+    for path in paths:
+        try:
+            image = Image.open(path)
+            image.load()
+            _decoded[path] = image
+        except OSError:
+            pass  # psychopy loads (and reports) it when it is used
+
+
+def preload(paths=IMAGES):
+    """
+    start decoding the images on a background thread
+    """
+    global _preload_thread
+    if Image is None or _preload_thread is not None:
+        return
+    _preload_thread = threading.Thread(target=_decode, args=(list(paths),), name='image_preload', daemon=True)
+    _preload_thread.start()
+
+
+def image(path):
+    """
+    the decoded image for an ImageStim (waits for the preloading if it is still running), or the path itself if it was
+    not preloaded
+    """
+    if _preload_thread is not None:
+        _preload_thread.join()
+    return _decoded.get(path, path)
+
+
+def image_stim(win, path, **attributes):
+    """
+    the ImageStim showing path in win, created the first time and otherwise reset to attributes (pos, size, ori,
+    opacity, ...) that the last trial may have changed
+    """
+    stim = _stims.get((win, path))
+    if stim is None:
+        stim = visual.ImageStim(win, image=image(path), **attributes)
+        _stims[(win, path)] = stim
+    else:
+        for name, value in attributes.items():
+            setattr(stim, name, value)
+    return stim
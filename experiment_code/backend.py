@@ -0,0 +1,33 @@
+"""
+psychopy modules used by the task: the real ones, or the headless stand-ins from headless.py when the
+REWARD_EFFORT_HEADLESS environment variable is set ('fast' for a virtual clock that runs as fast as possible, or a
+simulated refresh rate in Hz, see headless.configure). sessions with a simulated participant (REWARD_EFFORT_SIMULATE,
+see simulate.py) are always headless.
+
+all scripts import psychopy through here:
+    from backend import gui, visual, core, data, event, keyboard
+the psychopy modules are only imported when they are first asked for, so e.g. main.py can show the participant info
+pop-up (gui, core) before psychopy.visual is loaded.
+"""
+
+import importlib
+import os
+
+HEADLESS = os.environ.get('REWARD_EFFORT_HEADLESS')
+if HEADLESS is None and os.environ.get('REWARD_EFFORT_SIMULATE') is not None:
+    HEADLESS = 'fast'  # simulated participants (simulate.py) always run headless
+
+if HEADLESS is not None:
+    import headless
+    headless.configure(HEADLESS)
+    from headless import gui, visual, core, data, event, keyboard
+else:
+    _PSYCHOPY_MODULES = dict(gui='psychopy.gui', visual='psychopy.visual', core='psychopy.core', data='psychopy.data',
+                             event='psychopy.event', keyboard='psychopy.hardware.keyboard')
+
+    def __getattr__(name):
+        if name not in _PSYCHOPY_MODULES:
+            raise AttributeError(f"module 'backend' has no attribute '{name}'")
+        module = importlib.import_module(_PSYCHOPY_MODULES[name])
+        globals()[name] = module
+        return module
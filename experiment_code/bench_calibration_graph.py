@@ -0,0 +1,94 @@
+"""
+benchmark of the live strength graph in gripper_calibration.py
+draws a synthetic 4-second calibration trial (plus a previous trial) once with a new visual.Line per segment per frame
+(the old graph loop) and once with hf.LiveTrace, and prints frame-time statistics over the recording window
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+from backend import visual, core
+import helper_functions as hf
+
+
+###################################
+# SETTINGS
+###################################
+recording_duration = 4  # seconds, as in gripper_calibration.py
+sample_rate = 100  # samples per second (sample_strength waits 10 ms)
+graph_start_x, graph_start_y = -300, -280
+graph_length, graph_height = 600, 400
+scale = (graph_length / recording_duration, graph_height / 6)
+
+
+def synthetic_trace(rng):
+    times = np.arange(0, recording_duration, 1 / sample_rate)
+    strengths = 5 * np.sin(np.pi * times / recording_duration) + rng.normal(0, 0.1, len(times))
+    return times, strengths
+
+
+def to_pixels(t, s):
+    return [graph_start_x + t * scale[0], graph_start_y + s * scale[1]]
+
+
+def run_segments(win, prev, current):
+    """
+    the old graph loop: a new visual.Line for every segment of both traces on every frame
+    """
+    prev_times, prev_strengths = prev
+    times, strengths = current
+    start = core.getTime()
+    while core.getTime() - start < recording_duration:
+        n = np.searchsorted(times, core.getTime() - start, side='right')  # samples that have come in so far
+        for i in range(1, len(prev_times)):
+            visual.Line(win, start=to_pixels(prev_times[i - 1], prev_strengths[i - 1]),
+                        end=to_pixels(prev_times[i], prev_strengths[i]), lineWidth=8, lineColor='lightblue').draw()
+        for i in range(1, n):
+            visual.Line(win, start=to_pixels(times[i - 1], strengths[i - 1]),
+                        end=to_pixels(times[i], strengths[i]), lineWidth=8, lineColor='red').draw()
+        win.flip()
+
+
+def run_live_trace(win, prev, current):
+    """
+    the new graph loop: one static strip for the previous trial and one growing strip for the current one
+    """
+    prev_trace = hf.LiveTrace(win, (graph_start_x, graph_start_y), scale, 'lightblue')
+    prev_trace.set_data(*prev)
+    trace = hf.LiveTrace(win, (graph_start_x, graph_start_y), scale, 'red')
+    times, strengths = current
+    start = core.getTime()
+    n = 0
+    while core.getTime() - start < recording_duration:
+        n_arrived = np.searchsorted(times, core.getTime() - start, side='right')  # samples that have come in so far
+        while n < n_arrived:
+            trace.append(times[n], strengths[n])
+            n += 1
+        prev_trace.draw()
+        trace.draw()
+        win.flip()
+
+
+def frame_stats(intervals):
+    intervals = np.asarray(intervals) * 1000
+    return (f'{len(intervals):5d} frames, mean {intervals.mean():6.2f} ms, p99 {np.percentile(intervals, 99):6.2f} ms, '
+            f'max {intervals.max():6.2f} ms, last second mean {intervals[-int(len(intervals) / 4):].mean():6.2f} ms')
+
+
+###################################
+# BENCHMARK
+###################################
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    prev, current = synthetic_trace(rng), synthetic_trace(rng)
+    win = visual.Window(size=[1024, 768], fullscr=False, color='black', units='pix')
+    for name, run in [('visual.Line per segment', run_segments), ('hf.LiveTrace', run_live_trace)]:
+        win.flip()
+        win.frameIntervals = []
+        win.recordFrameIntervals = True
+        run(win, prev, current)
+        win.recordFrameIntervals = False
+        print(f'{name:25s} {frame_stats(win.frameIntervals)}')
+    win.close()
+    core.quit()
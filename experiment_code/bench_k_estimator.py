@@ -0,0 +1,69 @@
+"""
+benchmark of the online k estimator (see k_estimator.py) in simulated pre-tests
+1. time of an update plus the choice of the next offer, every trial, against the time main.py can spare in the
+   inter-trial interval (the shortest ITI is 0.75 s, most of it goes to the journal, the archive and garbage collection)
+2. how well k is recovered after the same number of trials as the staircase, with the participants of the staircase
+   simulation (staircase.py): they choose by the sign of the net value and flip a choice with probability --flip.
+   the staircases are old/staircase.py's (its step rule and offers, 'task') and the notebook's informative offers
+    python bench_k_estimator.py --participants 100 --trials 50
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import time
+import numpy as np
+import k_estimator
+import staircase
+
+
+###################################
+# SETTINGS
+###################################
+ITI_BUDGET = 0.05  # seconds of the ITI the estimator may take
+
+
+###################################
+# BENCHMARK
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the online k estimator')
+    parser.add_argument('--participants', type=int, default=100)
+    parser.add_argument('--trials', type=int, default=50)
+    parser.add_argument('--flip', type=float, default=0.1, help='probability of a flipped choice')
+    parser.add_argument('--budget', type=float, default=ITI_BUDGET, help='seconds per trial')
+    args = parser.parse_args()
+
+    true_ks = np.linspace(0.001, 0.999, args.participants)
+    draws = staircase.random_streams(args.participants, args.trials, seed=1)
+    start = time.perf_counter()
+    k_estimator.KEstimator()
+    setup_seconds = time.perf_counter() - start
+
+    seconds, estimates, sds = [], [], []
+    for i, true_k in enumerate(true_ks):
+        estimator = k_estimator.KEstimator()
+        reward, effort = staircase.INITIAL_OFFER
+        for trial in range(args.trials):
+            accepted = (staircase.net_value(reward, effort, true_k) > 0) ^ (draws[i, trial, 0] < args.flip)
+            start = time.perf_counter()
+            estimator.update(reward, effort, accepted)
+            reward, effort = estimator.next_offer()
+            seconds.append(time.perf_counter() - start)
+        estimates.append(estimator.mean_k())
+        sds.append(estimator.sd_k())
+    seconds = np.array(seconds) * 1000
+    print(f'grid of {len(estimator.k)} (k, noise) points, {len(estimator.offer_rewards)} candidate offers, '
+          f'set up in {setup_seconds * 1000:.1f} ms (before the pre-test)')
+    print(f'update + next offer over {len(seconds)} trials: median {np.median(seconds):.2f} ms, '
+          f'99th percentile {np.percentile(seconds, 99):.2f} ms, max {seconds.max():.2f} ms')
+    print(f"budget {args.budget * 1000:.0f} ms per trial: {'met' if seconds.max() <= args.budget * 1000 else 'NOT met'}")
+
+    errors = np.abs(true_ks - np.array(estimates))
+    print(f'|true k - estimate| after {args.trials} trials ({args.participants} participants):')
+    print(f'  grid estimator                   mean {errors.mean():.3f}  sd {errors.std():.3f}  '
+          f'(mean posterior sd {np.mean(sds):.3f})')
+    for label, offers in (('staircase, old/staircase.py', 'task'), ('staircase, informative offers', 'informative')):
+        staircase_errors = np.abs(true_ks - staircase.simulate(true_ks, draws=draws, noise=args.flip, offers=offers))
+        print(f'  {label:32s} mean {staircase_errors.mean():.3f}  sd {staircase_errors.std():.3f}')
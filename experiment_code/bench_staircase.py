@@ -0,0 +1,55 @@
+"""
+benchmark of the k staircase recovery sweep (see staircase.py): seconds per number of simulated participants and
+trials, for the notebook's loop over participants (staircase.estimate_k, trial by trial) and for the batch
+(staircase.simulate), which also checks that both give the same estimates. drawing the random streams of the
+participants is timed separately, it is the same for both
+    python bench_staircase.py --participants 100 1000 10000 --trials 50 200
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import time
+import numpy as np
+import staircase
+
+
+###################################
+# BENCHMARK
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the k staircase recovery sweep')
+    parser.add_argument('--participants', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--trials', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--max-loop-trials', type=int, default=500000,
+                        help='skip the loop when participants x trials is larger than this')
+    parser.add_argument('--step', default='log', choices=['log', 'fixed'])
+    parser.add_argument('--offers', default='informative', choices=['informative', 'random', 'task'])
+    args = parser.parse_args()
+    settings = dict(step=args.step, offers=args.offers)
+
+    print(f"{'participants':>12s} {'trials':>6s} {'streams s':>10s} {'batch s':>9s} {'loop s':>9s} {'speedup':>8s} "
+          f"{'same':>5s} {'mean |error|':>12s}")
+    for n_trials in args.trials:
+        for n in args.participants:
+            true_ks = np.linspace(0.001, 0.999, n)
+            start = time.perf_counter()
+            draws = staircase.random_streams(n, n_trials, seed=1)
+            streams_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batch = staircase.simulate(true_ks, draws=draws, **settings)
+            batch_seconds = time.perf_counter() - start
+
+            if n * n_trials <= args.max_loop_trials:
+                start = time.perf_counter()
+                loop = np.array([staircase.estimate_k(true_k, draws[i], **settings)[0]
+                                 for i, true_k in enumerate(true_ks)])
+                loop_seconds = time.perf_counter() - start
+                same = np.array_equal(loop, batch)
+                loop_columns = f'{loop_seconds:9.3f} {loop_seconds / batch_seconds:7.0f}x {str(same):>5s}'
+            else:
+                loop_columns = f"{'-':>9s} {'-':>8s} {'-':>5s}"
+            print(f'{n:12d} {n_trials:6d} {streams_seconds:10.3f} {batch_seconds:9.4f} {loop_columns} '
+                  f'{np.abs(true_ks - batch).mean():12.3f}')
@@ -0,0 +1,97 @@
+"""
+benchmark of the startup of main.py
+1. import times in a fresh interpreter: what the participant info pop-up waits for (backend gui and core), what is
+   imported in the background while it is open (startup.BACKGROUND_MODULES) and what is left for the main thread after
+   it is closed (psychopy.visual and the modules that use it)
+2. startup times of a few headless sessions with a simulated participant (see startup.py): dialog closed, first frame
+   on the monitor and first trial ready, in seconds since main.py started
+    python bench_startup.py --sessions 5
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import csv
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+import numpy as np
+import simulate
+import startup
+
+
+###################################
+# SETTINGS
+###################################
+here = os.path.dirname(os.path.abspath(__file__))
+dialog_imports = 'from backend import gui, core'
+background_imports = 'import ' + ', '.join(startup.BACKGROUND_MODULES)
+main_thread_imports = 'from backend import visual, data, event; import helper_functions, critical, assets'
+
+
+def import_time(statement, env, setup='pass'):
+    """
+    seconds that statement takes in a fresh interpreter, after running setup
+    """
+    code = f'{setup}; import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)'
+    process = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, cwd=here)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    return float(process.stdout.strip().splitlines()[-1])
+
+
+def startup_times(participant_nr):
+    """
+    the startup marks saved by the newest session of participant_nr
+    """
+    paths = glob.glob(os.path.join(here, 'data', f'{participant_nr}_*_startup.csv'))
+    with open(max(paths, key=os.path.getmtime), 'r') as csvfile:
+        return {row['step']: float(row['seconds']) for row in csv.DictReader(csvfile)}
+
+
+###################################
+# BENCHMARK
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the startup of main.py')
+    parser.add_argument('--sessions', type=int, default=3)
+    parser.add_argument('--schedule', default='testing')
+    parser.add_argument('--headless', default='fast', help="'fast' or a simulated refresh rate in Hz")
+    args = parser.parse_args()
+
+    # import times with psychopy if it is installed, otherwise with the headless stand-ins
+    env = dict(os.environ)
+    env.pop('REWARD_EFFORT_SIMULATE', None)
+    if importlib.util.find_spec('psychopy') is None:
+        env['REWARD_EFFORT_HEADLESS'] = 'fast'
+    else:
+        env.pop('REWARD_EFFORT_HEADLESS', None)
+    label = 'headless' if 'REWARD_EFFORT_HEADLESS' in env else 'psychopy'
+    before_dialog = [import_time(dialog_imports, env) for _ in range(args.sessions)]
+    background = [import_time(background_imports, env, dialog_imports) for _ in range(args.sessions)]
+    after_dialog = [import_time(main_thread_imports, env, f'{dialog_imports}; {background_imports}')
+                    for _ in range(args.sessions)]
+    print(f'imports ({label}), median of {args.sessions}:')
+    print(f'  before the pop-up            {np.median(before_dialog):7.3f} s')
+    print(f'  background, during pop-up    {np.median(background):7.3f} s')
+    print(f'  main thread, after pop-up    {np.median(after_dialog):7.3f} s')
+
+    # startup of simulated sessions
+    times = {}
+    for n in range(args.sessions):
+        participant_nr = f'startup_bench_{n}'
+        _, returncode, seconds, last_line = simulate.run_session(participant_nr, args.schedule, dict(seed=n),
+                                                                 args.headless)
+        if returncode != 0:
+            raise RuntimeError(f'session failed: {last_line}')
+        for step, value in startup_times(participant_nr).items():
+            times.setdefault(step, []).append(value)
+    print(f'startup of {args.sessions} headless sessions ({args.schedule}), seconds since main.py started:')
+    for step, values in times.items():
+        print(f'  {step:28s} median {np.median(values):7.3f} s  max {np.max(values):7.3f} s')
+    if 'dialog_closed' in times and 'first_frame' in times:
+        print(f"  {'dialog to first frame':28s} median "
+              f"{np.median(np.subtract(times['first_frame'], times['dialog_closed'])):7.3f} s")
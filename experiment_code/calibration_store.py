@@ -0,0 +1,162 @@
+"""
+index of the grip strength calibrations in calibration_data/, so main.py finds a participant's max strength without
+opening every calibration file
+    calibration_data/calibration_index.csv    one line per calibration: participant, date, max_strength,
+                                              gripper_zero_baseline, path (the calibration csv, without .csv)
+    calibration_data/latest/<participant>.csv the index line of the participant's newest calibration
+gripper_calibration.py adds a line when it saves a calibration and replaces the participant's latest file (both are
+replaced in one step, so a crash leaves either the old or the new file). latest() only reads the participant's latest
+file, so finding a calibration at startup does not depend on how many calibrations there are. participants are
+matched exactly, so participant 1 does not find the calibrations of participants 10 to 19. the strength traces of a
+calibration are in <path>_traces.f32/.idx and their sample times in <path>_trace_times.f32/.idx (see effort_traces.py,
+trace i is calibration trial i + 1). they are only loaded when asked for:
+    calibration = calibration_store.latest('7')
+    calibration['max_strength']
+    calibration_store.load_traces(calibration)[2]    # strength trace of calibration trial 3
+    calibration_store.load_traces(calibration, 'trace_times')[2]    # and its sample times
+if there is no index yet (calibrations from before it existed), it is built from the calibration files once, and the
+latest files are built from the index once if they do not exist yet.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import os
+import shutil
+from urllib.parse import quote
+import effort_traces
+
+
+###################################
+# FUNCTIONS
+###################################
+FOLDER = 'calibration_data'
+INDEX_NAME = 'calibration_index.csv'
+LATEST_FOLDER = 'latest'
+INDEX_FIELDS = ['participant', 'date', 'max_strength', 'gripper_zero_baseline', 'path']
+
+
+def read_index(folder=FOLDER):
+    """
+    all calibrations in the index as a list of dicts, oldest first (the index is built if it does not exist yet)
+    """
+    path = os.path.join(folder, INDEX_NAME)
+    if not os.path.exists(path):
+        if not os.path.isdir(folder):
+            return []
+        write_index(folder, rebuild_index(folder))
+    return _read_entries(path)
+
+
+def write_index(folder, entries):
+    """
+    replace the index with entries (a list of dicts with INDEX_FIELDS) in one step
+    """
+    _write_entries(os.path.join(folder, INDEX_NAME), entries)
+
+
+def write_latest(folder, entries):
+    """
+    replace the latest file of every participant in entries with their newest entry
+    """
+    newest = {}
+    for entry in entries:
+        participant = str(entry['participant'])
+        if participant not in newest or entry['date'] >= newest[participant]['date']:
+            newest[participant] = entry
+    os.makedirs(os.path.join(folder, LATEST_FOLDER), exist_ok=True)
+    for participant, entry in newest.items():
+        _write_entries(_latest_path(folder, participant), [entry])
+
+
+def _latest_path(folder, participant):
+    return os.path.join(folder, LATEST_FOLDER, quote(str(participant), safe='') + '.csv')
+
+
+def _read_entries(path):
+    with open(path, 'r', newline='') as csvfile:
+        entries = list(csv.DictReader(csvfile))
+    for entry in entries:
+        entry['max_strength'] = float(entry['max_strength'])
+        baseline = entry['gripper_zero_baseline']
+        entry['gripper_zero_baseline'] = float(baseline) if baseline else None
+    return entries
+
+
+def _write_entries(path, entries):
+    """
+    replace the csv file path with entries in one step
+    """
+    with open(path + '.tmp', 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=INDEX_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(entries)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def add(filename, participant, date, max_strength, gripper_zero_baseline=None):
+    """
+    add a calibration saved under filename (calibration_data/<participant>_<date>, without .csv) to the index
+    """
+    folder = os.path.dirname(filename) or '.'
+    entries = read_index(folder)
+    entries.append(dict(participant=participant, date=date, max_strength=max_strength,
+                        gripper_zero_baseline='' if gripper_zero_baseline is None else gripper_zero_baseline,
+                        path=os.path.basename(filename)))
+    write_index(folder, entries)
+    write_latest(folder, [entry for entry in entries if entry['participant'] == str(participant)])
+
+
+def latest(participant, folder=FOLDER):
+    """
+    the index entry of a participant's newest calibration, or None if they were never calibrated
+    """
+    if not os.path.isdir(os.path.join(folder, LATEST_FOLDER)):
+        if not os.path.isdir(folder):
+            return None
+        write_latest(folder, read_index(folder))  # an index from before the latest files
+    path = _latest_path(folder, participant)
+    return _read_entries(path)[0] if os.path.exists(path) else None
+
+
+def load_traces(entry, name='traces', folder=FOLDER):
+    """
+    the strength traces ('traces') or their sample times ('trace_times') of a calibration (memory-mapped, see
+    effort_traces.py)
+    """
+    return effort_traces.load(os.path.join(folder, entry['path']), name)
+
+
+def rebuild_index(folder=FOLDER):
+    """
+    index entries for the calibration files in folder (the last line of every csv with a max_strength column)
+    """
+    entries = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.csv') or name == INDEX_NAME:
+            continue
+        with open(os.path.join(folder, name), 'r', newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if not reader.fieldnames or 'max_strength' not in reader.fieldnames:
+                continue  # frame timing and other side-car files
+            row = None
+            for row in reader:
+                pass
+        if row is None or not row['max_strength']:
+            continue
+        entries.append(dict(participant=row['participant'], date=row['date'], max_strength=float(row['max_strength']),
+                            gripper_zero_baseline=row.get('gripper_zero_baseline', ''), path=name[:-4]))
+    entries.sort(key=lambda entry: entry['date'])
+    return entries
+
+
+if __name__ == '__main__':
+    # rebuild the index from the calibration files, e.g. after copying calibrations from another computer
+    write_index(FOLDER, rebuild_index(FOLDER))
+    shutil.rmtree(os.path.join(FOLDER, LATEST_FOLDER), ignore_errors=True)
+    write_latest(FOLDER, read_index(FOLDER))
+    for entry in read_index(FOLDER):
+        print(f"{entry['participant']:>6s} {entry['date']} {entry['max_strength']:.3f}")
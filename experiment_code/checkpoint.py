@@ -0,0 +1,58 @@
+"""
+checkpoints for resuming an interrupted session of main.py
+after every trial main.py saves the state it needs to carry on (trial count, points, block, random number generator
+states, gripper zero baseline, all trials so far, and how much of the data files belongs to completed trials) to
+<session>_checkpoint.pkl: the size of the trial csv and its side-car files (journal, frame timing, garbage collection
+pauses) and the number of effort traces and archive chunks. the file is replaced in one step, so a crash leaves either
+the old or the new checkpoint.
+
+to resume, start main.py with the same participant and session number and 'resume (y/n)' set to y: it loads the
+newest checkpoint, skips the instructions and the gripper calibration, cuts the data files back to the last completed
+trial (so nothing the interrupted run wrote after it is mixed with the new one) and continues with the block start
+screen of the next trial, appending to the same files. the trial schedule is the one the session started with (not the
+one in the dialog), and the session is not resumed if its file has changed since (the schedule hash in the checkpoint,
+see schedule_store.py).
+the checkpoint is deleted when the session finishes.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import glob
+import os
+import pickle
+
+
+###################################
+# FUNCTIONS
+###################################
+def save(filename, state):
+    """
+    save the state (a dict) as the checkpoint of the session filename
+    """
+    path = filename + '_checkpoint.pkl'
+    with open(path + '.tmp', 'wb') as checkpoint_file:
+        pickle.dump(state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def load_latest(folders, participant, session_nr):
+    """
+    the state of the newest checkpoint of a participant's session in any of folders, or None if there is none
+    """
+    pattern = f'{glob.escape(participant)}_{glob.escape(session_nr)}_*_checkpoint.pkl'
+    paths = [path for folder in folders for path in glob.glob(os.path.join(folder, pattern))]
+    if not paths:
+        return None
+    with open(max(paths, key=os.path.getmtime), 'rb') as checkpoint_file:
+        return pickle.load(checkpoint_file)
+
+
+def remove(filename):
+    """
+    delete the checkpoint of a finished session
+    """
+    if os.path.exists(filename + '_checkpoint.pkl'):
+        os.remove(filename + '_checkpoint.pkl')
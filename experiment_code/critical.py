@@ -0,0 +1,156 @@
+"""
+critical sections for the timing-critical phases of a trial (offer display, effort window, outcome presentation)
+inside a critical section python's cyclic garbage collector is switched off and the process priority is raised with
+core.rush, so neither a collection nor the OS scheduler interrupts the frames. the garbage is collected in the ITI
+instead (collect()), where a pause of a few milliseconds does not matter.
+
+every garbage collection is timed (with gc.callbacks) and saved with the trial and the section it happened in, next
+to the behavioural csv (*_gc.csv). to measure the effect, run a session with REWARD_EFFORT_NO_CRITICAL set: the
+pauses are still recorded, but the collector and the priority are left alone.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import gc
+import os
+import time
+from backend import core
+
+
+###################################
+# CLASSES
+###################################
+class CriticalSections:
+    fields = ['trial', 'section', 'generation', 'pause_ms', 'collected', 'forced']
+
+    def __init__(self, filename, rush=True, append=False, size=None):
+        """
+        append continues the file of a resumed session, after cutting it back to size bytes (its size at the last
+        checkpoint) if given
+        """
+        self.enabled = not os.environ.get('REWARD_EFFORT_NO_CRITICAL')
+        self.rush = rush
+        self.trial = 0
+        self.section_name = None  # name of the critical section we are in
+        self._depth = 0
+        self._forced = False
+        self._gc_start = None
+        self.pauses = []  # (trial, section, generation, pause in ms, objects collected, forced)
+        self._n_written = 0  # pauses already in the file
+        if append and size is not None:
+            os.truncate(filename, size)
+        self.datafile = open(filename, 'a' if append else 'w', newline='')
+        self.writer = csv.writer(self.datafile)
+        if not append:
+            self.writer.writerow(self.fields)
+        gc.callbacks.append(self._on_gc)
+
+    def start_trial(self, trial):
+        self.trial = trial
+
+    def section(self, name):
+        """
+        context manager for a critical section, e.g. with critical_sections.section('effort'): ...
+        sections can be nested; the outermost one names the section
+        """
+        return _Section(self, name)
+
+    def enter(self, name):
+        self._depth += 1
+        if self._depth > 1:
+            return
+        self.section_name = name
+        if self.enabled:
+            gc.disable()
+            if self.rush:
+                core.rush(True)
+
+    def leave(self):
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        self.section_name = None
+        if self.enabled:
+            if self.rush:
+                core.rush(False)
+            gc.enable()
+
+    def collect(self):
+        """
+        collect all garbage now (call in the ITI). returns how long it took in seconds
+        """
+        if not self.enabled:
+            return 0
+        start = time.perf_counter()
+        self._forced = True
+        gc.collect()
+        self._forced = False
+        return time.perf_counter() - start
+
+    def freeze(self):
+        """
+        collect, then move everything that is still alive (windows, stimuli, the schedule) to the permanent
+        generation, so later collections only look at objects created during the task
+        """
+        if self.enabled:
+            self.collect()
+            gc.freeze()
+
+    def flush(self):
+        """
+        save the garbage collection pauses recorded since the last flush (call between trials). returns the size of the
+        file
+        """
+        self.writer.writerows(self.pauses[self._n_written:])
+        self._n_written = len(self.pauses)
+        self.datafile.flush()
+        return self.datafile.tell()
+
+    def close(self):
+        """
+        save the remaining garbage collection pauses, print a summary, and leave any open section
+        """
+        if self._depth > 0:
+            self._depth = 1
+            self.leave()
+        gc.callbacks.remove(self._on_gc)
+        gc.unfreeze()
+        self.flush()
+        self.datafile.close()
+        self.print_summary()
+
+    def print_summary(self):
+        automatic = [pause for pause in self.pauses if not pause[5]]
+        in_sections = [pause for pause in automatic if pause[1] is not None]
+        forced_ms = sum(pause[3] for pause in self.pauses if pause[5])
+        print(f'Garbage collection: {len(automatic)} automatic collections '
+              f'({sum(pause[3] for pause in automatic):.1f} ms), {len(in_sections)} inside critical sections '
+              f'(max {max((pause[3] for pause in in_sections), default=0):.2f} ms); '
+              f'{len(self.pauses) - len(automatic)} in the ITI ({forced_ms:.1f} ms)')
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            pause_ms = round((time.perf_counter() - self._gc_start) * 1000, 4)
+            self.pauses.append((self.trial, self.section_name, info['generation'], pause_ms, info['collected'],
+                                self._forced))
+            self._gc_start = None
+
+
+class _Section:
+    __slots__ = ('sections', 'name')
+
+    def __init__(self, sections, name):
+        self.sections = sections
+        self.name = name
+
+    def __enter__(self):
+        self.sections.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sections.leave()
+        return False
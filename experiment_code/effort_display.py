@@ -0,0 +1,104 @@
+"""
+mapping between the effort a participant exerts and the effort shown on the dynamic effort bar
+in 'normal' blocks the bar shows the exerted effort, in 'shifted' blocks the net value of the effort is shifted:
+    displayed level = sqrt((k * exerted level**2 - net_value_shift) / k)    (levels are effort / 10, clamped at 0)
+the shifted mapping is precomputed as a dense lookup table, so the online loop does one table lookup per sample.
+the same objects work on whole numpy arrays, so offline analysis can reconstruct the displayed effort of entire
+effort traces in one call, e.g. effort_display.for_state('shifted', gv)(np.array(effort_trace))
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class EffortDisplay:
+    """
+    identity mapping (normal blocks): the bar shows the exerted effort
+    """
+    def __call__(self, effort):
+        """
+        exerted effort (%) -> displayed effort (%), for a scalar or an array
+        """
+        return effort
+
+    def inverse(self, displayed):
+        """
+        displayed effort (%) -> smallest exerted effort (%) that produces it, for a scalar or an array
+        """
+        return displayed
+
+
+class ShiftedEffortDisplay(EffortDisplay):
+    """
+    net-value shift of the effort (shifted blocks), tabulated from 0 to max_effort in steps of resolution and linearly
+    interpolated between table entries. effort outside the table is computed directly from the formula.
+    """
+    def __init__(self, assumed_k, net_value_shift, max_effort=200, resolution=0.01):
+        self.k = assumed_k
+        self.net_value_shift = net_value_shift
+        self.resolution = resolution
+        grid = np.arange(0, max_effort + resolution, resolution)
+        self.max_effort = grid[-1]
+        self._table = self._shift(grid)
+        self._inverse_table = self._unshift(grid)
+
+    def __call__(self, effort):
+        return self._lookup(self._table, self._shift, effort)
+
+    def inverse(self, displayed):
+        # every effort up to sqrt(net_value_shift / k) is displayed as 0, so the smallest one that shows 0 is 0
+        if isinstance(displayed, (int, float)):
+            return self._lookup(self._inverse_table, self._unshift, displayed) if displayed > 0 else 0.0
+        displayed = np.asarray(displayed, dtype=float)
+        result = np.where(displayed > 0, self._lookup(self._inverse_table, self._unshift, displayed), 0.0)
+        return float(result) if result.ndim == 0 else result
+
+    def _shift(self, effort):
+        level = np.asarray(effort, dtype=float) / 10
+        return 10 * np.sqrt(np.maximum(self.k * level ** 2 - self.net_value_shift, 0) / self.k)
+
+    def _unshift(self, displayed):
+        level = np.maximum(np.asarray(displayed, dtype=float), 0) / 10
+        return 10 * np.sqrt((self.k * level ** 2 + self.net_value_shift) / self.k)
+
+    def _lookup(self, table, formula, values):
+        if isinstance(values, (int, float)) and values <= self.max_effort:
+            # single sample in the online loop: plain python indexing is much faster than going through numpy
+            position = max(values, 0) / self.resolution
+            index = min(int(position), len(table) - 2)
+            lower, upper = table.item(index), table.item(index + 1)
+            return lower + (position - index) * (upper - lower)
+        values = np.asarray(values, dtype=float)
+        position = np.clip(values, 0, self.max_effort) / self.resolution
+        index = np.minimum(position.astype(int), len(table) - 2)
+        fraction = position - index
+        result = table[index] + fraction * (table[index + 1] - table[index])
+        outside = values > self.max_effort
+        if np.any(outside):
+            result = np.where(outside, formula(values), result)
+        return float(result) if result.ndim == 0 else result
+
+
+###################################
+# FUNCTIONS
+###################################
+_displays = {}
+
+
+def for_state(effort_state, gv):
+    """
+    effort display for a block's global effort state ('normal' or 'shifted'), built once per set of parameters
+    """
+    if effort_state != 'shifted':
+        key = (effort_state,)
+    else:
+        key = (effort_state, gv['assumed_k'], gv['net_value_shift'])
+    if key not in _displays:
+        _displays[key] = ShiftedEffortDisplay(gv['assumed_k'], gv['net_value_shift']) if effort_state == 'shifted' \
+            else EffortDisplay()
+    return _displays[key]
@@ -0,0 +1,125 @@
+"""
+binary side-car store for the effort traces of a session, next to the behavioural csv:
+    <session>_traces.f32    all samples of all traces, one after the other (float32)
+    <session>_traces.idx    int64 offsets: trace i is samples[offsets[i]:offsets[i + 1]] (starts with 0)
+the csv only keeps the index of a trial's trace (effort_trace_id, empty for rejected trials). both files are appended
+to after every accepted trial (samples first, then the offset), so a crash loses at most the trial in progress.
+
+load them without parsing any text, memory-mapped:
+    traces = effort_traces.load('data/2_1_2025-01-22_14h20.17.139')
+    traces[trial_data['effort_trace_id'][5]]    # numpy view of one trace
+    traces.ragged()                             # list of views of all traces
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import json
+import os
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class EffortTraceWriter:
+    def __init__(self, filename, resume_from=None, name='traces'):
+        """
+        start new trace files (<filename>_<name>.f32/.idx), or with resume_from=n_traces continue the files of an
+        interrupted session after its first n_traces traces (anything written after them is dropped)
+        """
+        filename = f'{filename}_{name}'
+        if resume_from is None:
+            self.values_file = open(filename + '.f32', 'wb')
+            self.offsets_file = open(filename + '.idx', 'wb')
+            self.n_traces = 0
+            self.n_values = 0
+            np.zeros(1, dtype=np.int64).tofile(self.offsets_file)
+            self.offsets_file.flush()
+        else:
+            offsets = np.fromfile(filename + '.idx', dtype=np.int64, count=resume_from + 1)
+            self.n_traces = resume_from
+            self.n_values = int(offsets[resume_from])
+            os.truncate(filename + '.idx', (resume_from + 1) * 8)
+            os.truncate(filename + '.f32', self.n_values * 4)
+            self.values_file = open(filename + '.f32', 'ab')
+            self.offsets_file = open(filename + '.idx', 'ab')
+
+    def append(self, trace):
+        """
+        save a trace and return its id
+        """
+        values = np.asarray(trace, dtype=np.float32)
+        values.tofile(self.values_file)
+        self.values_file.flush()
+        self.n_values += len(values)
+        np.array([self.n_values], dtype=np.int64).tofile(self.offsets_file)
+        self.offsets_file.flush()
+        self.n_traces += 1
+        return self.n_traces - 1
+
+    def close(self):
+        self.values_file.close()
+        self.offsets_file.close()
+
+
+class EffortTraces:
+    """
+    the effort traces of a session: traces[i] is a float32 view of trace i (no copy)
+    """
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, trace_id):
+        trace_id = int(trace_id)
+        return self.values[self.offsets[trace_id]:self.offsets[trace_id + 1]]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def ragged(self):
+        """
+        list of views of all traces
+        """
+        if len(self) == 0:
+            return []
+        return np.split(self.values, self.offsets[1:-1])
+
+
+###################################
+# FUNCTIONS
+###################################
+def load(filename, name='traces'):
+    """
+    memory-map the traces of a session (filename without the _<name>.* suffix). traces that were being written
+    during a crash are left out
+    """
+    filename = f'{filename}_{name}'
+    offsets = np.fromfile(filename + '.idx', dtype=np.int64)
+    n_values = os.path.getsize(filename + '.f32') // 4
+    offsets = offsets[offsets <= n_values]
+    if offsets[-1] == 0:
+        values = np.zeros(0, dtype=np.float32)
+    else:
+        values = np.memmap(filename + '.f32', dtype=np.float32, mode='r', shape=(int(offsets[-1]),))
+    return EffortTraces(values, offsets)
+
+
+def from_json_column(column):
+    """
+    traces of data files from before the side-car store (json strings in the effort_trace column), as
+    (EffortTraces, trace ids) with trace id None for trials without a trace
+    """
+    traces, trace_ids = [], []
+    for cell in column:
+        trace = json.loads(cell.strip('"')) if isinstance(cell, str) else None
+        trace_ids.append(len(traces) if trace is not None else None)
+        if trace is not None:
+            traces.append(np.asarray(trace, dtype=np.float32))
+    offsets = np.concatenate([[0], np.cumsum([len(trace) for trace in traces])]).astype(np.int64)
+    values = np.concatenate(traces).astype(np.float32) if traces else np.zeros(0, dtype=np.float32)
+    return EffortTraces(values, offsets), trace_ids
@@ -0,0 +1,178 @@
+"""
+frame-interval recording for the task window, tagged with the trial and trial phase that was on screen
+writes per-trial, per-phase summaries (frame count, mean, p99, dropped frames) next to the behavioural csv
+and produces a post-session report of trials whose timing budget was violated
+
+run as a script on a *_frames.csv file to print the report for a finished session:
+    python frame_timing.py data/2_1_2025-01-22_14h20.17.139_frames.csv
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import os
+import sys
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class FrameTimer:
+    """
+    turns on frame-interval recording on a psychopy window and attributes every interval to the trial and phase of the
+    screen that was shown during it (i.e. the screen flipped at the start of the interval).
+
+    each phase has an optional wait: how long the code waits after flipping a screen of that phase before drawing the
+    next one (the same as the wait argument of draw_all_stimuli). a screen is then expected to stay up until the first
+    refresh after the wait, i.e. one refresh for animated phases (wait 0) and the presentation time for static screens
+    (fixation, offers). screens that wait for the participant (decision, rating) have wait None, so they are summarised
+    but never count as dropped frames.
+    """
+    fields = ['trial', 'phase', 'frame_count', 'mean_interval', 'p99_interval', 'dropped_frames', 'budget_violated']
+
+    def __init__(self, win, filename, max_dropped_frames=0, append=False, size=None):
+        """
+        append continues the file of a resumed session, after cutting it back to size bytes (its size at the last
+        checkpoint) if given
+        """
+        global _active
+        win.recordFrameIntervals = True
+        self.win = win
+        self.frame_period = win.monitorFramePeriod or 1 / 60
+        self.max_dropped_frames = max_dropped_frames
+        self.trial = 0
+        self.phase = None
+        self.wait = None
+        self._on_screen = (0, None, None)  # trial, phase and wait of the frame currently displayed
+        win.callOnFlip(self._mark_on_screen)  # the first flip has no interval, so tag its screen when it happens
+        self._n_seen = len(win.frameIntervals)
+        self._intervals = {}  # (trial, phase) -> [intervals], [waits]
+        if append and size is not None:
+            os.truncate(filename, size)
+        self.datafile = open(filename, 'a' if append else 'w', newline='')  # append when resuming a session
+        self.writer = csv.writer(self.datafile)
+        if not append:
+            self.writer.writerow(self.fields)
+        self.datafile.flush()
+        _active = self
+
+    def start_trial(self, trial):
+        """
+        intervals recorded from now on belong to this trial
+        """
+        self._collect()
+        self.trial = trial
+
+    def set_phase(self, phase, wait=None):
+        """
+        intervals recorded from now on belong to this phase
+        """
+        self._collect()
+        self.phase = phase
+        self.wait = wait
+
+    def hold(self, wait):
+        """
+        the screen that is currently displayed will be held for wait seconds (e.g. the last frame of an animated phase)
+        """
+        self._collect()
+        self._on_screen = self._on_screen[:2] + (wait,)
+
+    def dropped_frames(self, intervals, waits):
+        """
+        number of refreshes by which the screens overran the first refresh after their wait
+        """
+        timed = [(interval, wait) for interval, wait in zip(intervals, waits) if wait is not None]
+        if not timed:
+            return 0
+        intervals, waits = np.array(timed).T
+        expected_frames = np.ceil(waits / self.frame_period) + 1
+        overrun = np.round(intervals / self.frame_period) - expected_frames
+        return int(np.maximum(overrun, 0).sum())
+
+    def flush(self):
+        """
+        write the summaries of the trials before the one on screen (e.g. of the last trial, right after the ITI screen
+        was flipped). returns the size of the file
+        """
+        self._collect()
+        return self.datafile.tell()
+
+    def close(self):
+        """
+        write the summaries of all remaining trials and close the file
+        """
+        global _active
+        self._collect()
+        self._write(lambda trial: True)
+        self.datafile.close()
+        if _active is self:
+            _active = None
+
+    def _mark_on_screen(self):
+        self._on_screen = (self.trial, self.phase, self.wait)
+
+    def _collect(self):
+        new_intervals = self.win.frameIntervals[self._n_seen:]
+        self._n_seen += len(new_intervals)
+        for interval in new_intervals:
+            trial, phase, wait = self._on_screen
+            intervals, waits = self._intervals.setdefault((trial, phase), ([], []))
+            intervals.append(interval)
+            waits.append(wait)
+            # every flip after the first one in this batch happened in the current phase
+            self._on_screen = (self.trial, self.phase, self.wait)
+        # trials before the one on screen cannot receive any more intervals
+        self._write(lambda trial: trial < self._on_screen[0])
+
+    def _write(self, is_complete):
+        for (trial, phase) in [key for key in self._intervals if is_complete(key[0])]:
+            intervals, waits = self._intervals.pop((trial, phase))
+            dropped = self.dropped_frames(intervals, waits)
+            self.writer.writerow([trial, phase, len(intervals), round(float(np.mean(intervals)), 6),
+                                  round(float(np.percentile(intervals, 99)), 6), dropped,
+                                  dropped > self.max_dropped_frames])
+        self.datafile.flush()
+
+
+###################################
+# FUNCTIONS
+###################################
+_active = None
+
+
+def set_phase(phase, wait=None):
+    """
+    tag the frames of the active frame timer with a phase (does nothing if frame timing is not running)
+    """
+    if _active is not None:
+        _active.set_phase(phase, wait)
+
+
+def report(filename):
+    """
+    read a *_frames.csv file and return the trials whose timing budget was violated,
+    as a dict of trial -> list of (phase, dropped frames)
+    """
+    violations = {}
+    with open(filename, 'r') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if row['budget_violated'] == 'True':
+                violations.setdefault(int(row['trial']), []).append((row['phase'], int(row['dropped_frames'])))
+    return violations
+
+
+def print_report(filename):
+    violations = report(filename)
+    if not violations:
+        print('Frame timing: no trials violated their timing budget.')
+    for trial, phases in sorted(violations.items()):
+        print(f'Frame timing: trial {trial} dropped frames in ' +
+              ', '.join(f'{phase} ({dropped})' for phase, dropped in phases))
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        print_report(path)
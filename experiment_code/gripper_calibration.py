@@ -11,9 +11,12 @@ Maja Friedemann 2024
 # IMPORT PACKAGES
 ###################################
 import os
-import json
-from psychopy import gui, visual, core, data, event
+from backend import gui, visual, core, data, event
 import helper_functions as hf
+import frame_timing
+import calibration_store
+import effort_traces
+from strength_stream import StrengthStream
 
 print('Reminder: Press Q to quit.')
 
@@ -37,12 +40,12 @@ info = dict(
     date=data.getDateStr(),
     participant=expInfo['participant nr'],
 
+    gripper_zero_baseline=0.0,  # mean over the last 2 seconds of the baseline countdown
     # following variables are all corrected for the gripper 0 baseline
-    strength_trace_1='', # strength trace for calibration trial 1
+    # (the full-rate strength traces of the 3 calibration trials are saved to <filename>_traces.f32/.idx and their
+    # sample times (s since the recording started) to <filename>_trace_times.f32/.idx, see effort_traces.py)
     max_strength_1=0.0, # average strength in a half-second window around the peak strength for calibration trial 1
-    strength_trace_2='', # strength trace for calibration trial 2
     max_strength_2=0.0, # average strength in a half-second window around the peak strength for calibration trial 2
-    strength_trace_3='', # strength trace for calibration trial 3
     max_strength_3=0.0, # average strength in a half-second window around the peak strength for calibration trial 3
     max_strength=0.0,  # average of max_strength_calibration_2 and max_strength_calibration_3
 )
@@ -64,7 +67,7 @@ DUMMY = expInfo['grippers (y/n)'].lower() == 'n'
 gripper = None
 if not DUMMY:
     from mpydev import BioPac
-    gripper = BioPac("MP160", n_channels=1, samplerate=200, logfile="test", overwrite=True)
+    gripper = BioPac("MP160", n_channels=1, samplerate=200, logfile=filename, overwrite=False)
     gripper.start_recording()
 
 
@@ -81,6 +84,9 @@ win = visual.Window(
     useFBO=True,  # Frame Buffer Object for rendering (good for complex stimuli)
     units='pix'  # units in pixels (fine for this task but for more complex (e.g. dot motion) stimuli, we probably need visual degrees
 )
+# FRAME TIMING (per-trial, per-phase frame intervals are saved next to the data file)
+frame_timer = frame_timing.FrameTimer(win, filename + '_frames.csv')
+frame_timer.set_phase('instructions')
 
 
 ###################################
@@ -98,6 +104,10 @@ graph_start_y = -280
 graph_height = 400
 horizontal_graph_line = visual.Line(win, start=(graph_start_x, graph_start_y), end=(graph_start_x + graph_length, graph_start_y), lineWidth=2, lineColor='white')
 vertical_graph_line = visual.Line(win, start=(graph_start_x, graph_start_y), end=(graph_start_x, graph_start_y + graph_height), lineWidth=2, lineColor='white')
+recording_duration = 4  # seconds recorded per calibration trial (x-axis of the graph)
+graph_scale = (graph_length / recording_duration, graph_height / 6)
+prev_strength_trace = hf.LiveTrace(win, (graph_start_x, graph_start_y), graph_scale, 'lightblue')  # previous trial, static
+strength_trace = hf.LiveTrace(win, (graph_start_x, graph_start_y), graph_scale, 'red')  # current trial, grows live
 
 
 ###################################
@@ -126,13 +136,23 @@ hf.check_button(win, [green_button], stimuli, mouse) # show instructions until b
 
 # CALIBRATE HAND GRIPPER ZERO BASELINE
 instructions_top_txt.text = "Calibration in progress. Do not touch the hand gripper."
+frame_timer.set_phase('baseline', 1)
 hf.draw_all_stimuli(win, [instructions_top_txt], 1)
 gripper_zero_baseline = graph_start_y  # set the gripper zero baseline to the bottom of the graph if we are in dummy mode
+if not DUMMY:
+    gripper.start_recording_to_buffer()  # the full-rate stream during the countdown
 for countdown in range(3, 0, -1):
     big_txt.text = str(countdown)
     hf.draw_all_stimuli(win, [instructions_top_txt, big_txt], 1) # display a 3, 2, 1 countdown
-    if not DUMMY and countdown == 3:
-        gripper_zero_baseline = gripper.sample()[0]  # on 1, sample the gripper 0 baseline
+if not DUMMY:
+    gripper.stop_recording_to_buffer()
+    baseline_stream = StrengthStream(time_scale=0.001)  # BIOPAC timestamps are in ms
+    baseline_stream.extend(*gripper.read_buffer())
+    if baseline_stream.n:
+        gripper_zero_baseline = baseline_stream.mean_last(2)  # the gripper 0 baseline: mean of the last 2 seconds
+    else:
+        gripper_zero_baseline = gripper.sample()[0]  # no samples came in, use the newest one
+frame_timer.set_phase('instructions')
 win.flip()
 core.wait(1)
 
@@ -150,13 +170,15 @@ hf.check_button(win, [green_button], stimuli, mouse) # show instructions until b
 strength_samples = []  # list to store strength values
 times = []  # list to store time values
 max_trial_strengths = []
-trial_strength_samples = []
+trial_streams = []  # full-rate strength samples of every trial (the graph only shows what is sampled every frame)
 
 for trial in range(3):  # 3 calibration trials
-    prev_strength_samples = strength_samples.copy()  # get previous trial's strength_samples
-    prev_times = times.copy()  # get previous trial's times
+    prev_strength_trace.set_data(times, strength_samples)  # draw previous trial's strength_samples as a static trace
+    strength_trace.set_data([], [])
     strength_samples = []  # reset the current trial's strength_samples
     times = []  # reset the current trial's times
+    frame_timer.start_trial(trial + 1)
+    frame_timer.set_phase('instructions')
 
     # instructions and draw graph
     if trial == 0:
@@ -177,59 +199,77 @@ for trial in range(3):  # 3 calibration trials
             start_time = core.getTime()
 
     # begin recording for 4 seconds after strength threshold is exceeded
-    recording_duration = 4
+    frame_timer.set_phase('recording', 0)
+    if DUMMY:
+        trial_stream = StrengthStream()  # the mouse samples of the graph
+    else:
+        trial_stream = StrengthStream(time_scale=0.001)  # the full-rate BIOPAC stream
+        gripper.start_recording_to_buffer()
     while core.getTime() - start_time < recording_duration:
         strength = hf.sample_strength(DUMMY, mouse, gripper, gripper_zero_baseline)
         strength_samples.append(strength)
         current_time = core.getTime() - start_time
         times.append(current_time)
+        strength_trace.append(current_time, strength)
+        if DUMMY:
+            trial_stream.add(current_time, strength)
+        else:
+            sample_times, sample_values = gripper.read_buffer()
+            trial_stream.extend(sample_times, sample_values - gripper_zero_baseline)
 
         # draw the graph
         instructions_top_txt.draw()
         horizontal_graph_line.draw()
         vertical_graph_line.draw()
-        # draw previous strength_samples
-        for i in range(1, len(prev_strength_samples)):
-            start_point = [graph_start_x + prev_times[i-1] * (graph_length / recording_duration), graph_start_y + prev_strength_samples[i-1] * (graph_height / 6)]
-            end_point = [graph_start_x + prev_times[i] * (graph_length / recording_duration), graph_start_y + prev_strength_samples[i] * (graph_height / 6)]
-            visual.Line(win, start=start_point, end=end_point, lineWidth=8, lineColor='lightblue').draw()
-        # draw current strength_samples
-        for i in range(1, len(strength_samples)):
-            start_point = [graph_start_x + times[i - 1] * (graph_length / recording_duration), graph_start_y + strength_samples[i - 1] * (graph_height / 6)]
-            end_point = [graph_start_x + times[i] * (graph_length / recording_duration), graph_start_y + strength_samples[i] * (graph_height / 6)]
-            visual.Line(win, start=start_point, end=end_point, lineWidth=8, lineColor='red').draw()
+        prev_strength_trace.draw()
+        strength_trace.draw()
         win.flip()
         hf.exit_q(win)
 
+    if not DUMMY:
+        gripper.stop_recording_to_buffer()
+        sample_times, sample_values = gripper.read_buffer()
+        trial_stream.extend(sample_times, sample_values - gripper_zero_baseline)
+
     # save strength trace and max strength in a half-second window around the peak for each trial
-    quarter_second_window_length = int((len(strength_samples) / recording_duration) / 4) # determine how many samples represent a quarter of a second
-    window_start = max(0, strength_samples.index(max(strength_samples)) - quarter_second_window_length)
-    window_end = min(strength_samples.index(max(strength_samples)) + quarter_second_window_length + 1, len(strength_samples))
-    max_trial_strengths.append(sum(strength_samples[window_start:window_end]) / (window_end - window_start))
-    trial_strength_samples.append(strength_samples)
+    max_trial_strengths.append(trial_stream.peak_window_mean(0.25))
+    trial_streams.append(trial_stream)
 
     # rest period message
+    frame_timer.hold(3)  # the finished graph stays up for 3 seconds
+    frame_timer.set_phase('rest')
     core.wait(3)
     instructions_txt.text = "Trial completed. \n\n Relax for a moment."
     hf.draw_all_stimuli(win, [instructions_txt], 5)
 
 
 # SAVE DATA
+info['gripper_zero_baseline'] = gripper_zero_baseline
 info['max_strength_1'] = max_trial_strengths[0]
-info['strength_trace_1'] = '"' + json.dumps(trial_strength_samples[0]) + '"'
 info['max_strength_2'] = max_trial_strengths[1]
-info['strength_trace_2'] = '"' + json.dumps(trial_strength_samples[1]) + '"'
 info['max_strength_3'] = max_trial_strengths[2]
-info['strength_trace_3'] = '"' + json.dumps(trial_strength_samples[2]) + '"'
 info['max_strength'] = (max_trial_strengths[1] + max_trial_strengths[2]) / 2
 dataline = ','.join([str(info[v]) for v in log_vars])
 datafile.write(dataline + '\n')
 datafile.flush()
+datafile.close()
+trace_writer = effort_traces.EffortTraceWriter(filename)
+time_writer = effort_traces.EffortTraceWriter(filename, name='trace_times')
+for trial_stream in trial_streams:
+    trace_writer.append(trial_stream.values)
+    time_writer.append(trial_stream.times - (trial_stream.times[0] if trial_stream.n else 0))
+trace_writer.close()
+time_writer.close()
+calibration_store.add(filename, info['participant'], info['date'], info['max_strength'], gripper_zero_baseline)
 
 
 # THANK YOU
+frame_timer.start_trial(4)
+frame_timer.set_phase('end')
 big_txt.text = 'Your grip strength test is completed.'
 hf.draw_all_stimuli(win,[big_txt], 8)
+frame_timer.close()
+frame_timing.print_report(filename + '_frames.csv')
 
 
 # CLOSE WINDOW
@@ -0,0 +1,454 @@
+"""
+headless (null-window) stand-in for the parts of psychopy used by main.py and gripper_calibration.py
+nothing is rendered: stimuli are plain attribute holders and Window.flip only advances a virtual vsync clock.
+the clock either runs as fast as possible (flips and waits jump ahead in virtual time) or in real time at a simulated
+refresh rate. key presses and mouse clicks come from a responder function (see set_responder), so a whole session can
+run without a display or a participant.
+
+every stimulus construction and draw is timed, and print_profile() reports the cost per stimulus type (printed when
+the script quits if REWARD_EFFORT_PROFILE is set).
+
+use it through backend.py, e.g. to run a session as fast as possible or at a simulated 60 Hz:
+    REWARD_EFFORT_HEADLESS=fast python main.py
+    REWARD_EFFORT_HEADLESS=60 python main.py
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+
+
+###################################
+# CLOCK
+###################################
+class VsyncClock:
+    """
+    session clock with a vsync every 1 / refresh_rate seconds.
+    in virtual mode (realtime=False) time only moves when something waits or flips, so sessions run as fast as the code
+    allows; in real-time mode it follows the computer clock and flips block until the next simulated vsync.
+    """
+    def __init__(self, refresh_rate=60, realtime=False):
+        self.frame_period = 1 / refresh_rate
+        self.realtime = realtime
+        self._t = 0.0
+        self._start = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter() - self._start if self.realtime else self._t
+
+    def sleep(self, secs):
+        if secs <= 0:
+            return
+        if self.realtime:
+            time.sleep(secs)
+        else:
+            self._t += secs
+
+    def next_vsync(self):
+        """
+        wait for the next vsync and return its time
+        """
+        t = self.now()
+        target = (math.floor(t / self.frame_period + 1e-9) + 1) * self.frame_period
+        self.sleep(target - t)
+        if not self.realtime:
+            self._t = target
+        return target
+
+
+vsync_clock = VsyncClock()
+
+
+def configure(mode):
+    """
+    'fast' (or '') for a virtual 60 Hz clock that runs as fast as possible, or a refresh rate in Hz (e.g. '60') for a
+    real-time clock at that simulated refresh rate. 'fast:144' runs a virtual 144 Hz clock.
+    """
+    global vsync_clock
+    mode = str(mode).strip().lower()
+    if mode in ('', '1', 'true', 'fast'):
+        vsync_clock = VsyncClock(60, realtime=False)
+    elif mode.startswith('fast:'):
+        vsync_clock = VsyncClock(float(mode.split(':')[1]), realtime=False)
+    else:
+        vsync_clock = VsyncClock(float(mode), realtime=True)
+
+
+###################################
+# PROFILING
+###################################
+profile = {}  # (stimulus type, 'construct' or 'draw') -> [count, total seconds]
+
+
+def _record(kind, operation, seconds):
+    entry = profile.setdefault((kind, operation), [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+
+def print_profile():
+    """
+    print count, total and mean time of stimulus construction and drawing per stimulus type
+    """
+    print(f"{'stimulus':12s} {'operation':10s} {'count':>8s} {'total ms':>10s} {'mean us':>9s}")
+    for (kind, operation), (count, seconds) in sorted(profile.items()):
+        print(f'{kind:12s} {operation:10s} {count:8d} {seconds * 1000:10.2f} {seconds / count * 1e6:9.2f}')
+
+
+###################################
+# INPUT
+###################################
+class KeyPress:
+    def __init__(self, name, tDown, rt):
+        self.name = name
+        self.tDown = tDown
+        self.rt = rt
+        self.duration = None
+
+    def __repr__(self):
+        return f'KeyPress({self.name!r}, rt={self.rt:.3f})'
+
+
+def default_responder(key_list):
+    """
+    press SPACE if it is allowed (instructions, rating confirmation), otherwise a random allowed key, after 0.5 s.
+    never presses q, so polls that only check for quitting get no response.
+    """
+    candidates = [key for key in key_list if key != 'q']
+    if not candidates:
+        return None
+    return ('space' if 'space' in candidates else random.choice(candidates)), 0.5
+
+
+_responder = default_responder
+_pending = None  # [key name, virtual press time] of the next key press
+
+
+def set_responder(responder):
+    """
+    responder(key_list) is called when the task waits for one of key_list and no key press is pending.
+    it returns (key, latency in seconds) or None for no response.
+    """
+    global _responder, _pending
+    _responder = responder
+    _pending = None
+
+
+def _next_press(key_list, ask=True):
+    """
+    return the name and time of the pending key press if it is in key_list and due, asking the responder for one first
+    """
+    global _pending
+    if _pending is None and ask and key_list:
+        response = _responder(list(key_list))
+        if response is not None:
+            _pending = [response[0], vsync_clock.now() + response[1]]
+    if _pending is not None and (not key_list or _pending[0] in key_list) and _pending[1] <= vsync_clock.now():
+        press, _pending = _pending, None
+        return press
+    return None
+
+
+def _clear_presses():
+    global _pending
+    _pending = None
+
+
+###################################
+# WINDOW
+###################################
+class Window:
+    def __init__(self, size=(1920, 1080), fullscr=False, screen=0, allowGUI=True, color='black', blendMode='avg',
+                 useFBO=False, units='pix', **kwargs):
+        self.size = np.array(size)
+        self.fullscr = fullscr
+        self.screen = screen
+        self.color = color
+        self.units = units
+        self.mouseVisible = True
+        self.monitorFramePeriod = vsync_clock.frame_period
+        self.frameIntervals = []
+        self.recordFrameIntervals = False
+        self.lastFrameT = None
+        self._to_call = []
+        self.closed = False
+
+    def flip(self, clearBuffer=True):
+        flip_time = vsync_clock.next_vsync()
+        if self.recordFrameIntervals and self.lastFrameT is not None:
+            self.frameIntervals.append(flip_time - self.lastFrameT)
+        self.lastFrameT = flip_time
+        to_call, self._to_call = self._to_call, []
+        for function, args, kwargs in to_call:
+            function(*args, **kwargs)
+        return flip_time
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._to_call.append((function, args, kwargs))
+
+    def clearBuffer(self, color=True, depth=False, stencil=False):
+        pass
+
+    def getActualFrameRate(self, *args, **kwargs):
+        return 1 / self.monitorFramePeriod
+
+    def setMouseVisible(self, visibility):
+        self.mouseVisible = visibility
+
+    def close(self):
+        self.closed = True
+
+
+###################################
+# STIMULI
+###################################
+class _Stim:
+    """
+    attribute holder with the psychopy defaults used in the task; construction and draw() are timed
+    """
+    defaults = dict(pos=(0, 0), size=None, ori=0.0, opacity=1.0, color='white', units='pix', autoDraw=False)
+
+    def __init__(self, win=None, **kwargs):
+        t0 = time.perf_counter()
+        self.win = win
+        for key, value in dict(self.defaults, **kwargs).items():
+            setattr(self, key, value)
+        self.pos = np.array(self.pos, dtype=float)
+        _record(type(self).__name__, 'construct', time.perf_counter() - t0)
+
+    def draw(self, win=None):
+        t0 = time.perf_counter()
+        self._draw()
+        _record(type(self).__name__, 'draw', time.perf_counter() - t0)
+
+    def _draw(self):
+        pass
+
+    def contains(self, x, y=None, units=None):
+        """
+        the headless mouse is over every stimulus, so check_button returns after the first click
+        """
+        if isinstance(x, Mouse):
+            return True
+        point = np.array([x, y] if y is not None else x, dtype=float)
+        size = np.array(getattr(self, 'size', None) or (getattr(self, 'width', 0), getattr(self, 'height', 0)))
+        return bool(np.all(np.abs(point - self.pos) <= size / 2))
+
+
+class TextStim(_Stim):
+    defaults = dict(_Stim.defaults, text='', font='', height=None, wrapWidth=None, bold=False, italic=False,
+                    alignText='center', anchorHoriz='center', anchorVert='center')
+
+    def __init__(self, win=None, text='', **kwargs):
+        super().__init__(win, text=text, **kwargs)
+
+
+class ImageStim(_Stim):
+    defaults = dict(_Stim.defaults, image=None, mask=None, color=(1.0, 1.0, 1.0))
+
+
+class ShapeStim(_Stim):
+    defaults = dict(_Stim.defaults, vertices=((-0.5, 0), (0, 0.5), (0.5, 0)), lineWidth=1.5, lineColor='white',
+                    fillColor=None, closeShape=True, edges=None)
+
+    def __init__(self, win=None, **kwargs):
+        super().__init__(win, **kwargs)
+        self.vertices = np.array(self.vertices, dtype=float)
+
+
+class Rect(ShapeStim):
+    defaults = dict(ShapeStim.defaults, width=0.5, height=0.5)
+
+    def __init__(self, win=None, width=0.5, height=0.5, **kwargs):
+        super().__init__(win, width=width, height=height, **kwargs)
+        self.size = (width, height)
+
+
+class Circle(ShapeStim):
+    defaults = dict(ShapeStim.defaults, radius=0.5, edges=32)
+
+
+class Line(ShapeStim):
+    defaults = dict(ShapeStim.defaults, start=(-0.5, 0), end=(0.5, 0))
+
+
+last_slider = None  # the slider drawn most recently (read by simulated participants, see simulate.py)
+
+
+class Slider(_Stim):
+    defaults = dict(_Stim.defaults, ticks=(1, 2, 3, 4, 5), labels=None, granularity=0, style='rating', flip=False,
+                    labelHeight=None, markerColor='red', font='Helvetica Bold', readOnly=False)
+
+    def __init__(self, win=None, **kwargs):
+        super().__init__(win, **kwargs)
+        self.markerPos = None
+        self.rating = None
+
+    def reset(self):
+        self.markerPos = None
+        self.rating = None
+
+    def _draw(self):
+        global last_slider
+        last_slider = self
+
+
+###################################
+# PSYCHOPY NAMESPACES
+###################################
+class Clock:
+    def __init__(self):
+        self._t0 = vsync_clock.now()
+
+    def getTime(self):
+        return vsync_clock.now() - self._t0
+
+    def reset(self, newT=0.0):
+        self._t0 = vsync_clock.now() + newT
+
+    def addTime(self, t):
+        self._t0 -= t
+
+
+def getTime():
+    return vsync_clock.now()
+
+
+def wait(secs, hogCPUperiod=0.2):
+    vsync_clock.sleep(secs)
+
+
+def quit():
+    if os.environ.get('REWARD_EFFORT_PROFILE'):
+        print_profile()
+    sys.exit(0)
+
+
+def rush(value=True, realtime=False):
+    return True
+
+
+class Mouse:
+    def __init__(self, visible=True, newPos=None, win=None):
+        self.visible = visible
+        self.win = win
+        self.pos = np.array(newPos if newPos is not None else (0.0, 0.0), dtype=float)
+        self._last_reset = vsync_clock.now()
+        self._next_click = vsync_clock.now() + 0.5
+
+    def getPos(self):
+        return self.pos
+
+    def setPos(self, newPos=(0, 0)):
+        self.pos = np.array(newPos, dtype=float)
+
+    def setVisible(self, visible):
+        self.visible = visible
+
+    def getPressed(self, getTime=False):
+        """
+        the headless participant clicks the left button every 0.5 s
+        """
+        pressed = vsync_clock.now() >= self._next_click
+        if pressed:
+            self._next_click = vsync_clock.now() + 0.5
+        buttons = [int(pressed), 0, 0]
+        if getTime:
+            return buttons, [vsync_clock.now() - self._last_reset if pressed else 0.0, 0.0, 0.0]
+        return buttons
+
+    def isPressedIn(self, shape, buttons=(0, 1, 2)):
+        return bool(self.getPressed()[0])
+
+    def clickReset(self, buttons=(0, 1, 2)):
+        self._last_reset = vsync_clock.now()
+
+
+def getKeys(keyList=None, timeStamped=False):
+    press = _next_press(keyList, ask=False)
+    if press is None:
+        return []
+    return [(press[0], press[1])] if timeStamped else [press[0]]
+
+
+def waitKeys(maxWait=float('inf'), keyList=None, timeStamped=False):
+    start = vsync_clock.now()
+    while vsync_clock.now() - start < maxWait:
+        press = _next_press(keyList)
+        if press is not None:
+            return [(press[0], press[1])] if timeStamped else [press[0]]
+        wait(0.001)
+    return None
+
+
+def clearEvents(eventType=None):
+    _clear_presses()
+
+
+class Keyboard:
+    """
+    stand-in for psychopy.hardware.keyboard.Keyboard, fed by the same responder as event.waitKeys
+    """
+    def __init__(self, *args, **kwargs):
+        self.clock = Clock()
+
+    def getKeys(self, keyList=None, waitRelease=True, clear=True):
+        press = _next_press(keyList)
+        if press is None:
+            return []
+        return [KeyPress(press[0], press[1] - self.clock._t0, press[1] - self.clock._t0)]
+
+    def waitKeys(self, maxWait=float('inf'), keyList=None, waitRelease=True, clear=True):
+        start = vsync_clock.now()
+        while vsync_clock.now() - start < maxWait:
+            keys = self.getKeys(keyList)
+            if keys:
+                return keys
+            wait(0.001)
+        return None
+
+    def clearEvents(self, eventType=None):
+        _clear_presses()
+
+
+dialog_values = {'grippers (y/n)': 'n', 'eeg (y/n)': 'n'}  # no hardware on a headless machine
+
+
+class DlgFromDict:
+    """
+    accepts the dialog straight away. values come from the dictionary's defaults, then dialog_values, then the
+    REWARD_EFFORT_DIALOG environment variable (json, e.g. '{"participant nr": "test", "trial schedule": "A_1"}')
+    """
+    def __init__(self, dictionary, title='', fixed=None, order=None, tip=None, sortKeys=True, copyDict=False,
+                 show=True, **kwargs):
+        overrides = dict(dialog_values, **json.loads(os.environ.get('REWARD_EFFORT_DIALOG', '{}')))
+        for key, value in overrides.items():
+            if key in dictionary:
+                dictionary[key] = value
+        self.dictionary = dictionary
+        self.OK = True
+
+
+def getDateStr(format="%Y-%m-%d_%Hh%M.%S.%f", fractionalSecondDigits=3):
+    now = datetime.now().strftime(format)
+    if format.endswith('%f'):
+        now = now[:len(now) - (6 - fractionalSecondDigits)]
+    return now
+
+
+visual = SimpleNamespace(Window=Window, TextStim=TextStim, ImageStim=ImageStim, ShapeStim=ShapeStim, Rect=Rect,
+                         Circle=Circle, Line=Line, Slider=Slider)
+core = SimpleNamespace(Clock=Clock, getTime=getTime, wait=wait, quit=quit, rush=rush)
+event = SimpleNamespace(Mouse=Mouse, getKeys=getKeys, waitKeys=waitKeys, clearEvents=clearEvents)
+keyboard = SimpleNamespace(Keyboard=Keyboard, KeyPress=KeyPress)
+gui = SimpleNamespace(DlgFromDict=DlgFromDict)
+data = SimpleNamespace(getDateStr=getDateStr)
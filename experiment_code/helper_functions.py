@@ -8,27 +8,35 @@ Maja Friedemann 2024
 # IMPORT PACKAGES
 ###################################
 import random
-from psychopy import gui, visual, core, data, event, core, clock
-import pandas as pd
+import time
+from backend import gui, visual, core, data, event
 import numpy as np
-import serial
+from timeline import Timeline, linear_move, accelerate_move, fade_out, follow
+import frame_timing
+from text_cache import TextCache
+import effort_display
+import responses
+import tracing
+import journal
+import assets
 
 
 ###################################
 # CLASSES
 ###################################
-import serial
-import time
-
 class EEGConfig:
     def __init__(self, triggers, send_triggers):
         self.triggers = triggers
         self.send_triggers = send_triggers
+        self.sent = []  # (session time, code) of every trigger, saved in the session archive
         if self.send_triggers:
             # Initialize the serial port connection if send_triggers is True
+            import serial  # only needed when sending triggers
             self.IOport = serial.Serial('COM6', 115200, timeout=0.001)  # Change port if necessary
 
+    @tracing.traced('send_trigger')
     def send_trigger(self, code):
+        self.sent.append((core.getTime(), code))
         if self.send_triggers:
             # Actual sending of the trigger over serial port
             try:
@@ -53,9 +61,63 @@ class EEGConfig:
             print(f'would send trigger: {code}')
 
 
+class LiveTrace:
+    """
+    a line graph drawn as one persistent line strip (used for the live strength graph in gripper_calibration.py).
+    samples are appended to a preallocated vertex array and the strip is only updated when new samples came in,
+    instead of creating a new visual.Line for every segment on every frame.
+    """
+    def __init__(self, win, origin, scale, color, line_width=8, capacity=1024):
+        self.origin = np.asarray(origin, dtype=float)  # pixel position of data point (0, 0)
+        self.scale = np.asarray(scale, dtype=float)  # pixels per data unit in x and y
+        self.stim = visual.ShapeStim(win, vertices=[(0, 0), (0, 0)], closeShape=False, fillColor=None,
+                                     lineColor=color, lineWidth=line_width)
+        self._vertices = np.zeros((capacity, 2))
+        self.n = 0
+        self._changed = False
+
+    def append(self, x, y):
+        """
+        add one sample to the end of the trace
+        """
+        if self.n == len(self._vertices):
+            self._vertices = np.concatenate([self._vertices, np.zeros_like(self._vertices)])  # double the capacity
+        self._vertices[self.n] = self.origin + self.scale * (x, y)
+        self.n += 1
+        self._changed = True
+
+    def set_data(self, xs, ys):
+        """
+        replace the trace with a complete set of samples (e.g. the previous trial, which then stays static)
+        """
+        self.n = 0
+        if len(xs) > len(self._vertices):
+            self._vertices = np.zeros((len(xs), 2))
+        self._vertices[:len(xs)] = self.origin + self.scale * np.column_stack([xs, ys])
+        self.n = len(xs)
+        self._changed = True
+
+    def draw(self):
+        if self.n < 2:
+            return
+        if self._changed:
+            self.stim.vertices = self._vertices[:self.n]
+            self._changed = False
+        self.stim.draw()
+
+
+###################################
+# TEXT STYLES
+###################################
+points_text_style = dict(height=60, pos=(0, 0), color='white', bold=True, font='Arial', alignText='center', wrapWidth=800)
+rating_question_style = dict(height=40, pos=(0, 220), color='white', bold=True, font='Arial', alignText='center',
+                             wrapWidth=1000)
+
+
 ###################################
 # FUNCTIONS
 ###################################
+@tracing.traced('key_poll')
 def exit_q(win, key_list=None):
     """
     allow exiting the experiment by pressing q when we are in full screen mode
@@ -63,7 +125,7 @@ def exit_q(win, key_list=None):
     """
     if key_list is None:
         key_list = ['q']
-    keys = event.getKeys(keyList=key_list)
+    keys = [key.name for key in responses.get_collector().poll(key_list)]
     res = len(keys) > 0
     if res:
         if 'q' in keys:
@@ -75,20 +137,24 @@ def exit_q(win, key_list=None):
 def draw_all_stimuli(win, stimuli, wait=0.0, EEG_config=None, trigger_code=None):
     """
     draw all stimuli, flip window, and send EEG trigger if provided.
+    returns the time of the flip.
     """
     flattened_stimuli = [stim for sublist in stimuli for stim in (
         sublist if isinstance(sublist, list) else [sublist])]  # flatten the list of stimuli to accommodate nested lists
-    for stimulus in flattened_stimuli:
-        stimulus.draw()
+    with tracing.span('draw'):
+        for stimulus in flattened_stimuli:
+            stimulus.draw()
 
     # If an EEG_config and trigger_code are provided, use callOnFlip to send the trigger
     if EEG_config and trigger_code is not None:
         win.callOnFlip(EEG_config.send_trigger, trigger_code)
 
     # Flip the window and wait for the specified time
-    win.flip()
+    with tracing.span('flip'):
+        flip_time = win.flip()
     exit_q(win)
     core.wait(wait)
+    return flip_time
 
 
 def check_button(win, buttons, stimuli, mouse):
@@ -132,27 +198,23 @@ def check_mouse_click(win, mouse):
         core.wait(0.01)
 
 
+@tracing.traced('key_wait')
 def check_key_press(win, key_list, EEG_config=None, trigger_mapping=None):
     """
     check for key press, return the key and reaction time.
+    the reaction time is measured from the flip passed to responses.get_collector().start_on_flip (or from now if the
+    response window was not started on a flip), using the hardware timestamp of the key press.
     if EEG_config and trigger_mapping are provided, send the appropriate trigger when a key is pressed.
     """
-    start_time = core.getTime()
-    event.clearEvents()
-    while True:
-        keys = event.getKeys(timeStamped=True)
-        for key, time in keys:
-            if key in key_list:
-                reaction_time = time - start_time
-                # send the trigger if EEG_config and trigger_mapping are provided
-                if EEG_config and trigger_mapping:
-                    trigger_code = trigger_mapping.get(key)
-                    if trigger_code:
-                        EEG_config.send_trigger(trigger_code)
-                return key, reaction_time
-        exit_q(win)
-        event.clearEvents()
-        core.wait(0.01)
+    collector = responses.get_collector()
+    key = collector.wait(key_list, win)
+    collector.stop()
+    # send the trigger if EEG_config and trigger_mapping are provided
+    if EEG_config and trigger_mapping:
+        trigger_code = trigger_mapping.get(key.name)
+        if trigger_code:
+            EEG_config.send_trigger(trigger_code)
+    return key.name, key.rt
 
 
 def convert_rgb_to_psychopy(color, alpha=1.0):
@@ -239,16 +301,19 @@ def draw_meteor(win, pos, size=30, color=None):
     return meteor
 
 
+@tracing.traced('build_trial_stimuli')
 def draw_trial_stimuli(win, trial_effort, trial_outcome, action_type, gv):
     """
     Draw outcome and effort stimuli for the trial offer
     """
     # SPACESHIP
-    spaceship = visual.ImageStim(
+    spaceship = assets.image_stim(
         win,
-        image='pictures/spaceship.png',
+        'pictures/spaceship.png',
         pos=(-2, -125),
-        size=(340, 300)
+        size=(340, 300),
+        ori=0,
+        opacity=1
     )
 
     # EFFORT BAR
@@ -306,7 +371,9 @@ def draw_trial_stimuli(win, trial_effort, trial_outcome, action_type, gv):
     return spaceship, outline, target, effort_text, outcomes
 
 
-def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv, EEG_config, effort_state):
+@tracing.traced()
+def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv, EEG_config, effort_state,
+                  effort_map=None):
     """
     Sample effort from gripper or mouse, zero_baseline and max_strength corrected.
     Effort needs to exceed a defined level for one consecutive second to be successful.
@@ -314,7 +381,10 @@ def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv,
     Outputs success/failure, the complete effort trace, and the average effort expended during the successful time window.
     When global effort state is shifted, we manipulate the visual display of the effort and the threshold crossing (the shift will be subtracted from the dynamic effort bar).
     However, the effort trace will still save the actual effort.
+    effort_map maps actual to displayed effort; by default it is the mapping for the effort state (see effort_display.py).
     """
+    if effort_map is None:
+        effort_map = effort_display.for_state(effort_state, gv)
     effort_trace = []
     average_effort = 0
     temp_effort_trace = []  # Temporary list to track efforts during success duration
@@ -333,35 +403,31 @@ def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv,
     stimuli.append(dynamic_bar)
     effort_started = False
     threshold_crossed = False
+    frame_timing.set_phase('effort', 0)
+    journal.log_on_flip(win, 'effort')
 
     while not success and not trial_failed:
         if trial_start_time.getTime() > gv['time_limit']:  # check if max time allowed has passed
             break  # exit the loop if the trial is considered a failure
 
-        if dummy:
-            effort_expended = mouse.getPos()[1]  # vertical movement
-            if effort_expended < 0:
-                effort_expended = 0
-        else:
-            effort_expended = (gripper.sample()[0] - gv['gripper_zero_baseline']) / gv['max_strength'] * 100
+        with tracing.span('gripper_sample'):
+            if dummy:
+                effort_expended = mouse.getPos()[1]  # vertical movement
+                if effort_expended < 0:
+                    effort_expended = 0
+            else:
+                effort_expended = (gripper.sample()[0] - gv['gripper_zero_baseline']) / gv['max_strength'] * 100
 
         # if effort state is 'shifted', adjust the effort for visual display and threshold crossing
         actual_effort_expended = effort_expended  # preserve the actual effort value
-
-        if effort_state == 'shifted':
-            k = gv['assumed_k']
-            net_value_shift = gv['net_value_shift']
-            what_participant_exerts_level = actual_effort_expended / 10
-            what_is_displayed_level = np.sqrt((k * what_participant_exerts_level ** 2 - net_value_shift) / k)
-            what_is_displayed = what_is_displayed_level * 10
-            what_is_displayed = np.maximum(what_is_displayed, 0)
-            effort_expended = what_is_displayed
+        effort_expended = effort_map(actual_effort_expended)
 
         effort_trace.append(actual_effort_expended)  # append the actual effort to the trace we are saving
 
         if effort_expended > gv['effort_started_threshold'] and not effort_started:
             effort_started = True
             EEG_config.send_trigger(EEG_config.triggers['effort_started'])
+            journal.log('effort_started', actual_effort_expended)
 
         dynamic_height = min(max(0, effort_expended), 100) * (138 / 100)
         dynamic_bar.height = dynamic_height
@@ -375,6 +441,7 @@ def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv,
 
             if not threshold_crossed:
                 EEG_config.send_trigger(EEG_config.triggers['effort_threshold_crossed'])
+                journal.log('effort_threshold_crossed', actual_effort_expended)
                 threshold_crossed = True
 
             if success_time is None:
@@ -392,62 +459,42 @@ def sample_effort(win, dummy, mouse, gripper, stimuli, trial_effort, target, gv,
             temp_effort_trace.clear()  # clear temporary efforts since condition was not met
 
     result = "success" if success else "failure"
+    journal.log('effort_end', float(success))
     effort_time = trial_start_time.getTime()
     return result, effort_trace, average_effort, effort_time  # return outcome, the complete effort trace, the average of successful efforts, and the time taken to complete the trial
 
 
-def update_opacity(stimuli, frame, frames):
-    opacity_factor = 1 - (frame / frames)
-    for stim in stimuli:
-        stim.opacity = opacity_factor
-
-
-def update_position(stimuli, delta_pos):
-    for stim in stimuli:
-        stim.pos += delta_pos
-
-
-def animate_success(win, spaceship, outcomes, target, outline, points, action_type, EEG_config, gv, cue):
+@tracing.traced()
+def animate_success(win, spaceship, outcomes, target, outline, points, action_type, EEG_config, gv, cue,
+                    text_cache=None):
     """
     Animate the success outcome for either approach or avoid blocks, including displaying points.
+    Returns the achieved duration and dropped-frame count of the animation.
     """
-    frames = 30  # Number of frames for the animation
-    points_text = visual.TextStim(
-        win,
-        text=f'+ {points}' if action_type == 'approach' else f'{points}',
-        height=60,
-        pos=(0, 0),
-        color='white',
-        bold=True,
-        font='Arial',
-        alignText='center',
-        wrapWidth=800,
-    )
+    if text_cache is None:
+        text_cache = TextCache(win)
+    points_text = text_cache.get(outcome_message(points, action_type, 'success', gv['training']), **points_text_style)
 
-    if gv['training']:
-        if action_type == 'approach':
-            points_text.text = f'+ {points} POINTS \n\nYou reached the stars!'
-        if action_type == 'avoid':
-            points_text.text = f'{points} POINTS \n\nYou evaded the meteors!'
-    else:
-        pass
-
-    flame = visual.ImageStim(
+    flame = assets.image_stim(
         win,
-        image='pictures/flame.png',
+        'pictures/flame.png',
         pos=(spaceship.pos[0], spaceship.pos[1]),
         size=(200, 200),
         ori=0 if action_type == 'approach' else 180
     )
     target.fillColor = convert_rgb_to_psychopy([243, 133, 19], alpha=0.95)
-    move_delta = (0, 5) if action_type == 'approach' else (0, -5)
-    flame_delta = (0, -170) if action_type == 'approach' else (0, 170)
-
-    for frame in range(frames):
-        update_position([spaceship, outline, target], move_delta)
-        flame.pos = (spaceship.pos[0], spaceship.pos[1] + flame_delta[1])
-        stimuli = [spaceship, outline, target, flame] + outcomes
-        draw_all_stimuli(win, stimuli, 0.008)
+    duration = gv['animation_duration']
+    move_distance = (0, 150) if action_type == 'approach' else (0, -150)
+    flame_offset = (0, -170) if action_type == 'approach' else (0, 170)
+
+    # the spaceship flies off with its flame attached
+    timeline = Timeline(win, duration)
+    timeline.add([spaceship, outline, target], 'pos', linear_move(move_distance, duration))
+    timeline.add(flame, 'pos', follow(spaceship, flame_offset))
+    stimuli = [spaceship, outline, target, flame] + outcomes
+    frame_timing.set_phase('outcome_animation', 0)
+    journal.log_on_flip(win, 'outcome_animation')
+    animation = timeline.play(lambda: draw_all_stimuli(win, stimuli))
 
     # determine EEG trigger
     if action_type == 'approach':
@@ -456,54 +503,38 @@ def animate_success(win, spaceship, outcomes, target, outline, points, action_ty
         trigger_code = EEG_config.triggers['outcome_presentation_avoid_success']
 
     # draw the outcome and send the trigger when the window flips
+    frame_timing.set_phase('outcome', gv['outcome_presentation_time'] + (2 if gv['training'] else 0))
+    journal.log_on_flip(win, 'outcome', points)
     draw_all_stimuli(win, [points_text], gv['outcome_presentation_time'], EEG_config, trigger_code)
 
     # ff in training, wait an additional 2 seconds
     if gv['training']:
         core.wait(2)
 
+    return animation
 
 
-def animate_failure_or_reject(win, spaceship, outline, target, outcomes, points, action_type, result, EEG_config, gv, cue):
+@tracing.traced()
+def animate_failure_or_reject(win, spaceship, outline, target, outcomes, points, action_type, result, EEG_config, gv, cue,
+                              text_cache=None):
     """
     Animate the failure outcome for either approach or avoid blocks, showing negative consequences.
+    Returns the achieved duration and dropped-frame count of the animation.
     """
-    frames = 30  # Number of frames for the animation
-    points_text = visual.TextStim(
-        win,
-        text=f'{points}',
-        height=60,
-        pos=(0, 0),
-        color='white',
-        bold=True,
-        font='Arial',
-        alignText='center',
-        wrapWidth=800
-    )
-    if points < 0:
-        points_text.text = f'- {abs(points)}'
-    if gv['training']:
-        if result == 'failure':
-            points_text.text = f'{points} POINTS \n\nYou failed to exert the required effort!'
-            if points < 0:
-                points_text.text = f'- {abs(points)} POINTS \n\nYou failed to exert the required effort!'
-        if result == 'reject':
-            points_text.text = f'{points} POINTS \n\nYou rejected the offer!'
-            if points < 0:
-                points_text.text = f'- {abs(points)} POINTS \n\nYou rejected the offer!'
-    else:
-        pass
-
-    for frame in range(frames):
-        update_opacity([spaceship, outline, target] + outcomes, frame, frames)
-        if action_type == 'avoid':
-            for outcome in outcomes:
-                outcome.pos = (
-                    outcome.pos[0],
-                    outcome.pos[1] - (frame / frames) * 50
-                )
-        stimuli = [spaceship, outline, target] + outcomes
-        draw_all_stimuli(win, stimuli, 0.008)
+    if text_cache is None:
+        text_cache = TextCache(win)
+    points_text = text_cache.get(outcome_message(points, action_type, result, gv['training']), **points_text_style)
+
+    # everything fades out, and in avoid blocks the meteors fall onto the spaceship
+    duration = gv['animation_duration']
+    timeline = Timeline(win, duration)
+    timeline.add([spaceship, outline, target] + outcomes, 'opacity', fade_out(duration))
+    if action_type == 'avoid':
+        timeline.add(outcomes, 'pos', accelerate_move((0, -750), duration))
+    stimuli = [spaceship, outline, target] + outcomes
+    frame_timing.set_phase('outcome_animation', 0)
+    journal.log_on_flip(win, 'outcome_animation')
+    animation = timeline.play(lambda: draw_all_stimuli(win, stimuli))
 
     # determine the appropriate trigger code for outcome presentation
     if action_type == 'approach':
@@ -518,18 +549,20 @@ def animate_failure_or_reject(win, spaceship, outline, target, outcomes, points,
             trigger_code = EEG_config.triggers['outcome_presentation_avoid_reject']
 
     # dse draw_all_stimuli to present the outcome and send the EEG trigger at the same time
+    frame_timing.set_phase('outcome', gv['outcome_presentation_time'] + (2 if gv['training'] else 0))
+    journal.log_on_flip(win, 'outcome', points)
     draw_all_stimuli(win, [points_text], gv['outcome_presentation_time'], EEG_config, trigger_code)
 
     # if in training, wait an additional 2 seconds
     if gv['training']:
         core.wait(2)
 
+    return animation
+
 
-def get_rating(win, attention_focus, image, gv, EEG_config=None, response_trigger_code=None):
+def make_rating_slider(win, attention_focus):
     """
-    get a rating for heart rate or reward rate from the participant using a discrete slider controlled by keys.
-    outputs the rating, the response time, and the random start position.
-    sends an EEG trigger when the participant confirms their rating.
+    discrete slider with 11 ticks for the heart rate or reward rate rating
     """
     # Define the slider with 11 ticks and vertical lines
     ticks = list(range(11))  # 11 ticks
@@ -550,24 +583,31 @@ def get_rating(win, attention_focus, image, gv, EEG_config=None, response_trigge
                            )
     if attention_focus == 'reward':
         slider.markerColor = convert_rgb_to_psychopy([234, 144, 46])  # reward gold
+    return slider
+
+
+@tracing.traced('rating')
+def get_rating(win, attention_focus, image, gv, EEG_config=None, response_trigger_code=None, text_cache=None):
+    """
+    get a rating for heart rate or reward rate from the participant using a discrete slider controlled by keys.
+    outputs the rating, the response time, and the random start position.
+    sends an EEG trigger when the participant confirms their rating.
+    """
+    if text_cache is None:
+        text_cache = TextCache(win)
+    slider = text_cache.get_or_create(('slider', attention_focus), lambda: make_rating_slider(win, attention_focus))
+    slider.reset()
     # Start the slider at a random position
     start_pos = random.randint(0, 10)
     slider.markerPos = start_pos
-    slider_question_text = visual.TextStim(
-        win,
-        text=f'How is your current {attention_focus} rate?',
-        height=40,
-        pos=(0, 220),
-        color='white',
-        bold=True,
-        font='Arial',
-        alignText='center',
-        wrapWidth=1000
-    )
+    slider_question_text = text_cache.get(rating_question(attention_focus), **rating_question_style)
     image.pos = [0, 150]
 
-    # Start timing the response
-    response_timer = clock.Clock()
+    # Start timing the response when the slider is first shown
+    collector = responses.get_collector()
+    collector.start_on_flip(win)
+    frame_timing.set_phase('rating')
+    journal.log_on_flip(win, 'rating')
 
     # Present the slider and question, flip the window, and start response timer
     while True:
@@ -577,27 +617,95 @@ def get_rating(win, attention_focus, image, gv, EEG_config=None, response_trigge
         win.flip()
 
         # Capture key presses and process slider movement or rating confirmation
-        keys = event.waitKeys(keyList=gv['response_keys'] + ['space'])
-        if 'j' in keys:
+        key = collector.wait(gv['response_keys'] + ['space'], win)
+        if key.name == 'j':
             slider.markerPos = max(0, slider.markerPos - 1)
-        elif 'k' in keys:
+        elif key.name == 'k':
             slider.markerPos = min(10, slider.markerPos + 1)
         # To finalize the rating, the 'space' key is used to confirm the selection
-        if 'space' in keys:
+        if key.name == 'space':
             if EEG_config and response_trigger_code:
                 EEG_config.send_trigger(response_trigger_code)  # Send the trigger when the rating is confirmed
             break
 
     # Stop the timer and get the response time
-    response_time = response_timer.getTime()
+    collector.stop()
+    response_time = key.rt
     # Calculate the rating based on the marker position
     rating = slider.markerPos
+    journal.log('rating_response', rating)
 
     core.wait(0.5)
 
     return rating, response_time, start_pos
 
 
+def outcome_message(points, action_type, result, training):
+    """
+    text shown after the outcome animation (result is 'success', 'failure' or 'reject')
+    """
+    if result == 'success':
+        text = f'+ {points}' if action_type == 'approach' else f'{points}'
+        if training:
+            if action_type == 'approach':
+                text = f'+ {points} POINTS \n\nYou reached the stars!'
+            if action_type == 'avoid':
+                text = f'{points} POINTS \n\nYou evaded the meteors!'
+        return text
+
+    text = f'- {abs(points)}' if points < 0 else f'{points}'
+    if training:
+        if result == 'failure':
+            text += ' POINTS \n\nYou failed to exert the required effort!'
+        if result == 'reject':
+            text += ' POINTS \n\nYou rejected the offer!'
+    return text
+
+
+def block_message(block_number, num_blocks, action_type, attention_focus):
+    """
+    text shown at the start of each block
+    """
+    if action_type == 'approach':
+        action_text = "collect stars to earn points"
+    elif action_type == 'avoid':
+        action_text = "evade meteors to avoid losing points"
+    return (
+        f"This is block {block_number} of {num_blocks}\n\n"
+        f"Your mission is to {action_text}\n\n"
+        f"Throughout this block, pay attention to your {attention_focus} rate\n\n"
+        "When you're ready to continue, press SPACE!"
+    )
+
+
+def rating_question(attention_focus):
+    return f'How is your current {attention_focus} rate?'
+
+
+def warm_up_text_cache(win, text_cache, gv, block_text_style):
+    """
+    pre-render every outcome, block and rating text the trial schedule in gv will show, plus the rating sliders
+    """
+    # every trial can end in success, failure or reject, which determines the points shown
+    points_texts = set()
+    for action_type, actual_outcome in zip(gv['action_type'], gv['actual_outcome']):
+        for result in ['success', 'failure', 'reject']:
+            rewarded = result == 'success' if action_type == 'approach' else result != 'success'
+            points = actual_outcome if rewarded else 0
+            points_texts.add(outcome_message(points, action_type, result, gv['training']))
+    text_cache.warm_up(sorted(points_texts), **points_text_style)
+
+    blocks = sorted(set(zip(gv['block_number'], gv['action_type'], gv['attention_focus'])))
+    text_cache.warm_up([block_message(block, max(gv['block_number']), action_type, attention_focus)
+                        for block, action_type, attention_focus in blocks], like=block_text_style)
+
+    attention_foci = sorted(set(gv['attention_focus']))
+    text_cache.warm_up([rating_question(attention_focus) for attention_focus in attention_foci], **rating_question_style)
+    text_cache.warm_up(stimuli=[
+        text_cache.get_or_create(('slider', attention_focus), lambda: make_rating_slider(win, attention_focus))
+        for attention_focus in attention_foci])
+
+
 def calculate_bonus_payment(all_trials, gv):
     """
     Calculate the bonus payment based on the points earned in randomly selected trials.
@@ -0,0 +1,179 @@
+"""
+append-only binary journal of the phase events of every trial, with session-clock timestamps (core.getTime)
+the trial csv only has one row per finished trial; the journal has one fixed-size record per event (trial, phase code,
+time, value): screen onsets (the time of the flip that showed them), responses, effort events and outcomes.
+records are collected in memory and written in batches at the end of every trial, so logging costs no file access
+during a trial. every run of the session logs the wall-clock time of its session clock when it starts ('session_start',
+or 'resume' with the trial it resumes at), as the clock starts again from zero in a resumed session.
+
+file layout (<session>_journal.bin): a 1024-byte header (magic, then the phase names as json, padded with spaces),
+then the records as a flat array of RECORD.
+
+    timeline = journal.timelines('data/2_1_2025-01-22_14h20.17.139_journal.bin')
+    timeline['time'][:, timeline['phases'].index('decision')]    # onset of the decision cue in every trial
+    python journal.py data/2_1_2025-01-22_14h20.17.139_journal.bin   # mean onset of every phase within a trial
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import json
+import os
+import sys
+import time
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+RECORD = np.dtype([('trial', '<i4'), ('phase', '<i4'), ('time', '<f8'), ('value', '<f8')])
+PHASES = ['iti', 'block_start', 'fixation', 'effort_offer', 'outcome_offer', 'decision', 'response', 'effort',
+          'effort_started', 'effort_threshold_crossed', 'effort_end', 'outcome_animation', 'outcome', 'rating',
+          'rating_response', 'trial_end', 'session_start', 'resume']
+MAGIC = b'REJOURNAL1'
+HEADER_SIZE = 1024
+
+
+class Journal:
+    def __init__(self, filename, append=False, batch_size=256, size=None):
+        """
+        append continues the journal of a resumed session, after cutting it back to size bytes (the size at its
+        last checkpoint) if given
+        """
+        global _active
+        from backend import core  # only needed for writing, so the readers work without psychopy
+        self.get_time = core.getTime
+        self.codes = {phase: code for code, phase in enumerate(PHASES)}
+        self.trial = 0
+        self._buffer = np.zeros(batch_size, dtype=RECORD)
+        self._n_buffered = 0
+        if append and os.path.exists(filename):
+            if size is not None:
+                os.truncate(filename, size)
+            self.file = open(filename, 'ab')  # resuming a session: the header is already there
+        else:
+            self.file = open(filename, 'wb')
+            header = MAGIC + json.dumps(PHASES).encode()
+            self.file.write(header.ljust(HEADER_SIZE, b' '))
+            self.file.flush()
+        _active = self
+
+    def start_trial(self, trial):
+        self.trial = trial
+
+    def log(self, phase, value=np.nan, time=None):
+        """
+        record an event of the current trial, at time (session clock) or now
+        """
+        if self._n_buffered == len(self._buffer):
+            self.flush()
+        self._buffer[self._n_buffered] = (self.trial, self.codes[phase], self.get_time() if time is None else time,
+                                          value)
+        self._n_buffered += 1
+
+    def log_clock(self, phase):
+        """
+        record the wall-clock time (unix seconds) of the session clock's now, e.g. when the session starts or resumes
+        """
+        self.log(phase, time.time())
+
+    def log_on_flip(self, win, phase, value=np.nan):
+        """
+        record the onset of a screen: the event is logged when the next flip happens
+        """
+        win.callOnFlip(self.log, phase, value)
+
+    def flush(self):
+        """
+        write the buffered records (call between trials). returns the size of the file
+        """
+        if self._n_buffered:
+            self._buffer[:self._n_buffered].tofile(self.file)
+            self.file.flush()
+            self._n_buffered = 0
+        return self.file.tell()
+
+    def close(self):
+        global _active
+        self.flush()
+        self.file.close()
+        if _active is self:
+            _active = None
+
+
+###################################
+# FUNCTIONS
+###################################
+_active = None
+
+
+def log(phase, value=np.nan, time=None):
+    """
+    record an event in the active journal (does nothing if there is none, e.g. in gripper_calibration.py)
+    """
+    if _active is not None:
+        _active.log(phase, value, time)
+
+
+def log_on_flip(win, phase, value=np.nan):
+    if _active is not None:
+        _active.log_on_flip(win, phase, value)
+
+
+def read(filename):
+    """
+    all records of a journal (memory-mapped) and the phase names their phase codes refer to
+    """
+    with open(filename, 'rb') as journal_file:
+        header = journal_file.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f'{filename} is not an event journal')
+    phases = json.loads(header[len(MAGIC):].decode().strip())
+    n_records = (os.path.getsize(filename) - HEADER_SIZE) // RECORD.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=RECORD), phases
+    return np.memmap(filename, dtype=RECORD, mode='r', offset=HEADER_SIZE, shape=(n_records,)), phases
+
+
+def timelines(filename):
+    """
+    per-trial phase timelines: a dict with the trial numbers, the phase names, and time and value arrays of shape
+    (trials, phases) holding the first event of each phase in each trial (nan if the phase did not happen).
+    times are on the session clock of the run that recorded the trial; clock_offset (per trial) converts them to
+    wall-clock (unix) times, and run counts the resumes before the trial (0 for the trials of the first run)
+    """
+    records, phases = read(filename)
+    trials, rows = np.unique(records['trial'], return_inverse=True)
+    time = np.full((len(trials), len(phases)), np.nan)
+    value = np.full((len(trials), len(phases)), np.nan)
+    # keep the first event of each phase in each trial (e.g. the first of the two fixation crosses)
+    _, first = np.unique(rows * len(phases) + records['phase'], return_index=True)
+    time[rows[first], records['phase'][first]] = records['time'][first]
+    value[rows[first], records['phase'][first]] = records['value'][first]
+    # the wall-clock time of the session clock of every run (see Journal.log_clock), in the order of the runs
+    codes = [phases.index(phase) for phase in ('session_start', 'resume') if phase in phases]
+    starts = records[np.isin(records['phase'], codes)]
+    start_index = np.searchsorted(starts['trial'], trials, side='right') - 1
+    clock_offset = np.full(len(trials), np.nan)
+    clock_offset[start_index >= 0] = (starts['value'] - starts['time'])[start_index[start_index >= 0]]
+    run = np.searchsorted(starts['trial'][starts['phase'] == codes[-1]], trials, side='right') if len(codes) == 2 \
+        else np.zeros(len(trials), dtype=int)
+    return dict(trials=trials, phases=phases, time=time, value=value, clock_offset=clock_offset, run=run)
+
+
+def print_timelines(filename):
+    timeline = timelines(filename)
+    onsets = timeline['time'] - timeline['time'][:, [timeline['phases'].index('iti')]]
+    print(f"{len(timeline['trials'])} trials; mean onset (s after the ITI started) and number of trials per phase:")
+    for trial in timeline['trials'][np.flatnonzero(np.diff(timeline['run'])) + 1]:
+        print(f'(resumed at trial {trial}, onsets are on the clock of the run that recorded the trial)')
+    for column, phase in enumerate(timeline['phases']):
+        happened = ~np.isnan(onsets[:, column])
+        if happened.any():
+            print(f'{phase:26s} {np.nanmean(onsets[:, column]):8.3f} {happened.sum():6d}')
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        print_timelines(path)
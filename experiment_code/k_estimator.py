@@ -0,0 +1,118 @@
+"""
+online estimate of the effort cost k (net value = reward - k * effort ** 2, calculate_net_value in old/staircase.py and
+staircase.net_value) and the choice noise, to pick the offers of an adaptive pre-test. instead of moving one estimate of
+k by a step after every choice (the staircase of old/staircase.py, simulated in staircase.py), KEstimator keeps the
+posterior of (k, noise) on a grid. a participant accepts an offer with probability
+    p(accept) = lapse / 2 + (1 - lapse) / (1 + exp(-net value / noise))    (softmax choice noise, the notebook's plan)
+where a small fixed lapse rate keeps one careless choice from ruling out the true k.
+the probability of every candidate offer under every grid point is computed once, so a choice updates the posterior
+with one multiply by a row of that table (other offers, e.g. a reward outside REWARDS, get theirs computed for the
+exact offer), and the next offer is the candidate with the largest expected information gain about (k, noise): the
+entropy of its mean accept probability minus the mean entropy of its accept probabilities, two matrix-vector products
+over the table.
+    estimator = k_estimator.KEstimator()
+    reward, effort = estimator.next_offer()
+    estimator.update(reward, effort, accepted=True)
+    estimator.mean_k(), estimator.sd_k()
+bench_k_estimator.py checks that an update plus the choice of the next offer fits in the inter-trial interval, and
+compares the estimates with those of old/staircase.py's staircase.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+import staircase
+
+
+###################################
+# SETTINGS
+###################################
+K_GRID = np.linspace(0.001, 1, 200)
+NOISE_GRID = np.geomspace(0.25, 10, 20)  # softmax temperature, in points of net value
+REWARDS = np.arange(staircase.REWARD_RANGE[0], staircase.REWARD_RANGE[1] + 1, 1.0)
+EFFORTS = np.arange(staircase.EFFORT_RANGE[0], staircase.EFFORT_RANGE[1] + 0.25, 0.5)
+LAPSE = 0.02
+
+
+###################################
+# FUNCTIONS
+###################################
+def p_accept(reward, effort, k, noise, lapse=LAPSE):
+    """
+    probability of accepting an offer (any shapes that broadcast)
+    """
+    with np.errstate(over='ignore'):
+        return lapse / 2 + (1 - lapse) / (1 + np.exp(-staircase.net_value(reward, effort, k) / noise))
+
+
+def binary_entropy(p):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return -(p * np.log(p) + (1 - p) * np.log(1 - p))
+
+
+###################################
+# CLASSES
+###################################
+class KEstimator:
+    def __init__(self, k_grid=K_GRID, noise_grid=NOISE_GRID, rewards=REWARDS, efforts=EFFORTS, lapse=LAPSE):
+        """
+        uniform prior over the (k, noise) grid; the candidate offers are every combination of rewards and efforts
+        """
+        self.k, self.noise = (grid.ravel() for grid in np.meshgrid(k_grid, noise_grid, indexing='ij'))
+        self.shape = (len(k_grid), len(noise_grid))
+        self.offer_rewards, self.offer_efforts = (grid.ravel() for grid in np.meshgrid(rewards, efforts, indexing='ij'))
+        # (offers x grid points) tables, computed once
+        self._p_accept = p_accept(self.offer_rewards[:, None], self.offer_efforts[:, None], self.k, self.noise,
+                                  lapse)
+        self._entropy = binary_entropy(self._p_accept)
+        self.lapse = lapse
+        self.posterior = np.full(len(self.k), 1 / len(self.k))
+        self.n_choices = 0
+
+    def offer_index(self, reward, effort):
+        """
+        the index of the candidate offer (reward, effort), or None if it is not a candidate
+        """
+        index = np.flatnonzero((self.offer_rewards == reward) & (self.offer_efforts == effort))
+        return int(index[0]) if len(index) else None
+
+    def update(self, reward, effort, accepted):
+        """
+        update the posterior with one choice. the accept probabilities of a candidate offer come from the table, those
+        of any other offer (e.g. the rewards of old/staircase.py below 8) are computed for the exact offer
+        """
+        index = self.offer_index(reward, effort)
+        likelihood = self._p_accept[index] if index is not None else p_accept(reward, effort, self.k, self.noise,
+                                                                                  self.lapse)
+        self.posterior *= likelihood if accepted else 1 - likelihood
+        self.posterior /= self.posterior.sum()
+        self.n_choices += 1
+
+    def information_gain(self):
+        """
+        expected information gain about (k, noise) of every candidate offer
+        """
+        return binary_entropy(self._p_accept @ self.posterior) - self._entropy @ self.posterior
+
+    def next_offer(self):
+        """
+        reward and effort of the candidate offer with the largest expected information gain
+        """
+        best = int(np.argmax(self.information_gain()))
+        return self.offer_rewards[best], self.offer_efforts[best]
+
+    def mean_k(self):
+        return self.posterior @ self.k
+
+    def sd_k(self):
+        return np.sqrt(self.posterior @ (self.k - self.mean_k()) ** 2)
+
+    def mean_noise(self):
+        return self.posterior @ self.noise
+
+    def marginal_k(self):
+        """
+        posterior of k alone, on the k grid
+        """
+        return self.posterior.reshape(self.shape).sum(axis=1)
@@ -12,15 +12,19 @@ Maja Friedemann 2024
 ###################################
 # IMPORT PACKAGES
 ###################################
+# only what the participant info pop-up needs is imported before it. numpy and the task modules that do not touch
+# psychopy are imported on a background thread while the pop-up is open (see startup.py); psychopy.visual and the
+# modules that use it are imported on the main thread after it is closed
 import csv
-import json
+import glob
 import os
 import random
 from datetime import datetime
 import time
-from psychopy import gui, visual, core, data, event
-import helper_functions as hf
 import ctypes
+import startup
+startup.import_in_background(startup.BACKGROUND_MODULES)
+from backend import gui, core
 
 print('Reminder: Press Q to quit.')
 
@@ -35,21 +39,48 @@ expInfo = {'participant nr': '2',
            'grippers (y/n)': 'y',  # if y, use real grippers, if n, use mouse movement
            'eeg (y/n)': 'y',  # if y, send EEG triggers, if n, just print them
            'session nr': '1',  # 0 for training session, then 1, 2, 3
+           'resume (y/n)': 'n',  # if y, continue the interrupted session of this participant and session nr
            'age': '',
            'gender (f/m/o)': '', 
            }
 dlg = gui.DlgFromDict(dictionary=expInfo, sortKeys=False, title=expName)
 if not dlg.OK:
     core.quit()
+startup.mark('dialog_closed')
+
+# the modules imported in the background while the pop-up was open, then the ones that use psychopy.visual
+startup.wait_for_imports()
+import numpy as np
+from backend import visual, data, event
+import helper_functions as hf
+import frame_timing
+from text_cache import TextCache
+import responses
+import simulate
+import tracing
+import critical
+import effort_traces
+import session_data
+import checkpoint
+import journal
+import session_archive
+import calibration_store
+import schedule_store
+import schedule_validator
+import assets
+assets.preload()  # decode the task images on a background thread while the window opens and the instructions run
+
+# SIMULATED PARTICIPANT (None unless REWARD_EFFORT_SIMULATE is set, see simulate.py)
+simulated = simulate.from_environment()
 
 # PARTICIPANT MAX GRIP STRENGTH
-for filename in os.listdir('calibration_data'):
-    if filename.startswith(expInfo['participant nr']) and filename.endswith('.csv'):
-        filepath = os.path.join('calibration_data/', filename)
-        with open(filepath, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                max_strength = float(row['max_strength'])
+max_strength = None
+if simulated:
+    max_strength = simulated.max_strength
+else:
+    calibration = calibration_store.latest(expInfo['participant nr'])  # newest calibration, see calibration_store.py
+    if calibration is not None:
+        max_strength = calibration['max_strength']
 if max_strength is None:
     print('Max strength calibration file for participant not found.')
 else:
@@ -65,6 +96,7 @@ gv = dict(
     effort_duration=1,  # second duration for which the effort needs to be above threshold 1
     time_limit=5,  # time limit for exerting the effort 5
     outcome_presentation_time=1.5,  # time for which the outcome is presented
+    animation_duration=0.5,  # seconds for the outcome animation (spaceship flying off or fading out)
     effort_started_threshold=0.1,  # threshold to consider effort exertion started for EEG trigger
     net_value_shift=30,  # shift in net value for shifted effort state
     assumed_k=1.1,  # assumed k value for effort shift calculation
@@ -88,11 +120,26 @@ gv = dict(
     effort_bar_height=138,
 )
 
-# READ TRIAL SCHEDULE
-trial_schedule_key = expInfo['trial schedule']
+# RESUME an interrupted session from its last checkpoint (see checkpoint.py)
+resumed = None
+if expInfo['resume (y/n)'].lower() == 'y':
+    resumed = checkpoint.load_latest(['data', 'training_data'], expInfo['participant nr'], expInfo['session nr'])
+    if resumed is None:
+        print('No checkpoint found for this participant and session, starting a new session.')
+
+# READ TRIAL SCHEDULE (a resumed session continues with the schedule it started with, whatever the dialog says)
+trial_schedule_key = resumed['info']['trial_schedule'] if resumed else expInfo['trial schedule']
+if resumed and trial_schedule_key != expInfo['trial schedule']:
+    print(f"Resuming with the session's trial schedule {trial_schedule_key} "
+          f"(not {expInfo['trial schedule']} from the dialog).")
 # trial_schedule_filepath = f'../final_trial_schedules/schedule_{trial_schedule_key}.csv'  # removing reward rate tracking
 trial_schedule_filepath = f'../final_trial_schedules_without_reward_rate/schedule_{trial_schedule_key}.csv'
 if os.path.exists(trial_schedule_filepath):
+    # check the rating placement, block patterns and trial numbering before using the schedule (see schedule_validator.py)
+    schedule_problems = schedule_validator.failures(schedule_validator.validate([trial_schedule_filepath]))
+    if schedule_problems:
+        print('Error: the trial schedule failed these checks:\n' + '\n'.join(schedule_problems))
+        core.quit()
     max_trial_number = 0
     max_block_trial_number = 0
     with open(trial_schedule_filepath, 'r') as csvfile:
@@ -110,15 +157,31 @@ if os.path.exists(trial_schedule_filepath):
             max_block_trial_number = max(max_block_trial_number, int(row['trial_in_block']))
     gv['num_trials'] = max_trial_number
     gv['num_trials_per_block'] = max_block_trial_number
+    # keep the exact content of the schedule under its hash, so the session records what it ran (see schedule_store.py)
+    schedules = schedule_store.ScheduleStore()
+    schedule_hash = schedules.add_file(trial_schedule_filepath)
+    # the committed schedule_A_4 and B_4 are copies of A_2 and B_2, so one block order is missing (schedule_generator.py)
+    same_trials = [os.path.basename(path) for path in sorted(glob.glob(os.path.join(
+        os.path.dirname(trial_schedule_filepath), 'schedule_[AB]_*.csv'))) if not os.path.samefile(
+        path, trial_schedule_filepath) and schedule_store.file_hash(path) == schedule_hash]
+    if same_trials:
+        print(f"Warning: {os.path.basename(trial_schedule_filepath)} has the same trials as {', '.join(same_trials)}, "
+              f"so these schedules do not counterbalance the block order (see schedule_generator.py).")
+    if resumed and schedule_hash != resumed['info']['schedule_hash']:
+        print(f"Error: {trial_schedule_filepath} has changed since the session started, it cannot be resumed.")
+        core.quit()
 else:
     print(f"Error: File {trial_schedule_filepath} not found.")
     core.quit()
 
-if expInfo['trial schedule'] == 'training':
+if trial_schedule_key == 'training':
     gv['training'] = True
 else:
     pass
 
+if simulated:
+    simulated.start_session(gv)
+
 ###################################
 # DATA SAVING
 ###################################
@@ -128,7 +191,8 @@ all_trials = []
 info = dict(
     expName=expName,
     curec_ID=curecID,
-    trial_schedule=expInfo['trial schedule'],
+    trial_schedule=trial_schedule_key,
+    schedule_hash=schedule_hash,  # content hash of the trial schedule (see schedule_store.py)
     session_nr=expInfo['session nr'],
     date=data.getDateStr(),
     start_time=None,
@@ -158,22 +222,44 @@ info = dict(
     points=None,  # points won or lost in the trial
     cumulative_points=None,  # points across trials
 
-    effort_trace='',
+    effort_trace_id=None,  # index of the trial's effort trace in the *_traces files (see effort_traces.py)
     effort_expended=None,  # average effort expended on trial during the 1 second where effort is above the threshold
     effort_response_time=None,
+    animation_duration=None,  # achieved duration of the outcome animation in seconds
+    animation_dropped_frames=None,  # number of frames dropped during the outcome animation
 
     final_bonus_payment=None
 )
 
 # start a csv file for saving the participant data
 log_vars = list(info.keys())
+# session-level variables saved in the session summary at the end (see session_data.py)
+summary_vars = ['participant', 'session_nr', 'trial_schedule', 'schedule_hash', 'date', 'start_time', 'end_time',
+                'duration', 'trial_count', 'cumulative_points', 'final_bonus_payment']
 folder = 'training_data' if gv.get('training') else 'data'
 if not os.path.exists(folder):
     os.mkdir(folder)
-filename = os.path.join(folder, '%s_%s_%s' % (info['participant'], info['session_nr'], info['date']))
-datafile = open(filename + '.csv', 'w')
-datafile.write(','.join(log_vars) + '\n')
-datafile.flush()
+
+if resumed:
+    filename = resumed['filename']
+    info = resumed['info']
+    all_trials = resumed['all_trials']
+    gv['gripper_zero_baseline'] = resumed['gripper_zero_baseline']
+    random.setstate(resumed['random_state'])
+    np.random.set_state(resumed['numpy_random_state'])
+    print(f"Resuming session {filename} after trial {info['trial_count']}.")
+    # drop anything written after the last checkpoint (the side-car files are cut back when they are opened)
+    os.truncate(filename + '.csv', resumed['file_sizes']['.csv'])
+    datafile = open(filename + '.csv', 'a')
+    trace_writer = effort_traces.EffortTraceWriter(filename, resume_from=resumed['n_traces'])
+else:
+    filename = os.path.join(folder, '%s_%s_%s' % (info['participant'], info['session_nr'], info['date']))
+    datafile = open(filename + '.csv', 'w')
+    datafile.write(','.join(log_vars) + '\n')
+    datafile.flush()
+    trace_writer = effort_traces.EffortTraceWriter(filename)
+    schedules.record_session(schedule_hash, filename, participant=info['participant'],
+                             key=schedule_store.schedule_key(trial_schedule_filepath))
 
 ##################################################
 # SET UP WINDOW, MOUSE, HAND GRIPPER, EEG TRIGGERS
@@ -190,6 +276,19 @@ win = visual.Window(
     units='pix'
     # units in pixels (fine for this task but for more complex (e.g. dot motion) stimuli, we probably need visual degrees
 )
+win.callOnFlip(startup.mark, 'first_frame')
+# FRAME TIMING (per-trial, per-phase frame intervals are saved next to the data file)
+frame_timer = frame_timing.FrameTimer(win, filename + '_frames.csv', append=bool(resumed),
+                                     size=resumed['file_sizes']['_frames.csv'] if resumed else None)
+# EVENT JOURNAL (onsets of every trial phase, see journal.py)
+event_journal = journal.Journal(filename + '_journal.bin', append=bool(resumed),
+                                size=resumed['file_sizes']['_journal.bin'] if resumed else None)
+if resumed:  # the session clock starts from zero again, so mark where the times of this run begin
+    event_journal.start_trial(info['trial_count'] + 1)
+    event_journal.log_clock('resume')
+else:
+    event_journal.log_clock('session_start')
+frame_timer.set_phase('instructions')
 
 # MOUSE
 win.setMouseVisible(False)
@@ -202,10 +301,13 @@ if os.name == 'nt':  # Check if the OS is Windows
 # HAND GRIPPER
 DUMMY = expInfo['grippers (y/n)'].lower() == 'n'
 gripper = None
-if not DUMMY:
+if simulated:
+    DUMMY = False
+    gripper = simulated.gripper
+elif not DUMMY:
     from mpydev import BioPac
 
-    gripper = BioPac("MP160", n_channels=1, samplerate=200, logfile="test", overwrite=True)
+    gripper = BioPac("MP160", n_channels=1, samplerate=200, logfile=filename, overwrite=False)
     gripper.start_recording()
 
 # EEG TRIGGERS
@@ -241,6 +343,16 @@ trigger_mapping = {
     gv['response_keys'][1]: EEG_config.triggers['participant_choice_reject'],  # trigger for reject
 }
 
+# SESSION ARCHIVE (config, full-rate force stream, triggers and frame intervals in one zip file, see session_archive.py)
+archive = session_archive.SessionArchive(filename + '.zip', append=bool(resumed),
+                                         n_chunks=resumed['archive_chunks'] if resumed else None)
+if not resumed:
+    archive.write_config(dict(expInfo=expInfo, gv=gv, triggers=triggers, frame_period=win.monitorFramePeriod))
+archive.add_stream('triggers', session_archive.ListTail(EEG_config.sent))
+archive.add_stream('frames', session_archive.ListTail(win.frameIntervals))
+if gripper is not None and not simulated:
+    archive.add_stream('force', session_archive.TsvTail(gripper._logfilename, n_columns=2))
+
 ###################################
 # CREATE STIMULI
 ###################################
@@ -262,10 +374,10 @@ lower_button = visual.Rect(win=win, units="pix", width=160, height=60, pos=(0, -
 lower_button_txt = visual.TextStim(win=win, text='REJECT', height=25, pos=lower_button.pos, color='black', bold=True,
                                    font='Arial')
 # heart_rate_stimulus = visual.ImageStim(win, image="pictures/heart.png", pos=(260, 244), size=(65, 65))  # removing reward rate tracking
-heart_rate_stimulus = visual.ImageStim(win, image="pictures/heart.png", pos=(200, 235), size=(65, 65))
-reward_rate_stimulus = visual.ImageStim(win, image="pictures/money.png", pos=(280, 180), size=(65, 65))
-heart_cue = visual.ImageStim(win, image="pictures/heart.png", pos=(0, 0), size=(70, 70))
-reward_cue = visual.ImageStim(win, image="pictures/money.png", pos=heart_cue.pos, size=(70, 70))
+heart_rate_stimulus = visual.ImageStim(win, image=assets.image("pictures/heart.png"), pos=(200, 235), size=(65, 65))
+reward_rate_stimulus = visual.ImageStim(win, image=assets.image("pictures/money.png"), pos=(280, 180), size=(65, 65))
+heart_cue = visual.ImageStim(win, image=assets.image("pictures/heart.png"), pos=(0, 0), size=(70, 70))
+reward_cue = visual.ImageStim(win, image=assets.image("pictures/money.png"), pos=heart_cue.pos, size=(70, 70))
 accept_txt = visual.TextStim(win=win, text='A', height=30, pos=(-35, -300), color='white', bold=True, font='Arial')
 oval_accept = visual.Circle(win=win, radius=24, pos=accept_txt.pos, edges=180, lineColor='white', lineWidth=2, fillColor=None)
 reject_txt = visual.TextStim(win=win, text='R', height=30, pos=(35, -300), color='white', bold=True, font='Arial')
@@ -273,288 +385,331 @@ oval_reject = visual.Circle(win=win, radius=24, pos=reject_txt.pos, edges=180, l
 fixation_cross = visual.TextStim(win, text='+', height=60, color='white', font='Arial')
 fixation_cross_green = visual.TextStim(win, text='+', height=60, color='green', font='Arial')
 
+# TEXT CACHE (pre-render every points, block and rating text of the schedule so they show within one frame)
+text_cache = TextCache(win)
+with tracing.span('text_cache_warm_up'):
+    hf.warm_up_text_cache(win, text_cache, gv, instructions_txt)
+    # and the spaceship and flame images of the trials (reused in every trial, see assets.py)
+    text_cache.warm_up(stimuli=[assets.image_stim(win, 'pictures/spaceship.png'),
+                                assets.image_stim(win, 'pictures/flame.png')])
+
 ###################################
 # INSTRUCTIONS
 ###################################
-# Welcome
-big_txt.text = "Welcome!"
-if gv['training']:
-    instructions_txt.text = (
-        "\n\n\n\nIn this training session, you will learn about the task \nand do a few practice trials!\n\n "
-        "When you're ready, press SPACE."
+# (skipped when resuming an interrupted session)
+if not resumed:
+    # Welcome
+    big_txt.text = "Welcome!"
+    if gv['training']:
+        instructions_txt.text = (
+            "\n\n\n\nIn this training session, you will learn about the task \nand do a few practice trials!\n\n "
+            "When you're ready, press SPACE."
+        )
+    else:
+        instructions_txt.text = (
+            "\n\n\n\nPrepare to embark on your space adventure!\n\n "
+            "When you're ready, press SPACE."
+        )
+    big_txt.draw()
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    hf.exit_q(win)
+    event.clearEvents()
+
+    # Calibrate hand gripper
+    if gv['training']:
+        instructions_txt.text = (
+            "In this task, you will use a hand gripper to power a spaceship.\n\n"
+            "Before starting your training, we must recalibrate this equipment. "
+            "Therefore, please keep your hands clear of the hand gripper for now.\n\n"
+            "Press SPACE to begin the calibration process."
+        )
+    else:
+        instructions_txt.text = (
+            "As you'll remember, your primary control interface is the hand gripper which powers your ship's engines.\n\n"
+            "Before you start, we must recalibrate this equipment. "
+            "Therefore, please keep your hands clear of the hand gripper for now.\n\n"
+            "Press SPACE to begin the calibration process."
+        )
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    hf.exit_q(win)
+    event.clearEvents()
+
+    # CALIBRATE HAND GRIPPER ZERO BASELINE
+    win.flip()
+    instructions_top_txt.text = (
+        "Calibration in progress.\n\n"
+        "Please keep your hands away from the hand gripper."
     )
-else:
+    hf.draw_all_stimuli(win, [instructions_top_txt], 1)
+    big_txt.pos = [0, 20]
+    for countdown in range(3, 0, -1):
+        big_txt.text = f"{countdown}"
+        hf.draw_all_stimuli(win, [instructions_top_txt, big_txt], 1)
+        if not DUMMY and countdown == 1:
+            gv['gripper_zero_baseline'] = gripper.sample()[0]
+    win.flip()
+    core.wait(0.6)
+
+    # Task overview
     instructions_txt.text = (
-        "\n\n\n\nPrepare to embark on your space adventure!\n\n "
-        "When you're ready, press SPACE."
+        "Excellent! Calibration is complete.\n\n"
+        "In this task, you'll pilot a spaceship through the cosmos, encountering star clouds and meteor fields. "
+        "Each encounter will require you to make a decision and potentially exert effort.\n\n"
+        "Press SPACE to review the key elements of the task."
     )
-big_txt.draw()
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-hf.exit_q(win)
-event.clearEvents()
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])
+    hf.exit_q(win)
+    event.clearEvents()
 
-# Calibrate hand gripper
-if gv['training']:
+    # Trial Structure
     instructions_txt.text = (
-        "In this task, you will use a hand gripper to power a spaceship.\n\n"
-        "Before starting your training, we must recalibrate this equipment. "
-        "Therefore, please keep your hands clear of the hand gripper for now.\n\n"
-        "Press SPACE to begin the calibration process."
+        "Each trial consists of the following steps:\n\n"
+        "1. Spaceship & Effort Bar: A spaceship appears with an effort bar, indicating the amount of effort required for the trial.\n"
+        "2. Fixation Cross: A brief white fixation cross is shown on the screen.\n"
+        f"3. Encounter: You'll face either a star cloud (potential win) or a meteor field (potential loss).\n"
+        f"4. Decision: A green fixation cross appears, signaling you to make a choice. Press the designated response keys to accept or reject an encounter.\n"
+        f"5. Outcome: If you accept, you'll need to exert the required effort to either approach the stars or avoid the meteors. "
+        "Rejecting the encounter means no effort is required, but you forgo the chance to win a reward or avoid a loss. After your choice, the outcome is displayed, and the next trial begins."
+        "\n\nPress SPACE to continue."
     )
-else:
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])
+    hf.exit_q(win)
+    event.clearEvents()
+
+    # Block types
     instructions_txt.text = (
-        "As you'll remember, your primary control interface is the hand gripper which powers your ship's engines.\n\n"
-        "Before you start, we must recalibrate this equipment. "
-        "Therefore, please keep your hands clear of the hand gripper for now.\n\n"
-        "Press SPACE to begin the calibration process."
+        "There are two types of encounters:\n\n"
+        "1. In approach encounters, you'll face clouds of stars. More stars mean higher potential rewards. "
+        "If you choose to accept the encounter, it becomes a mission where you must exert effort to approach the stars and collect the reward. "
+        "Rejecting the encounter or failing to exert the required effort during the mission results in no reward.\n\n"
+        "2. In avoid encounters, you'll face meteor fields. More meteors indicate a greater potential loss. "
+        "If you accept the encounter, it becomes a mission where you must exert effort to avoid the meteors and evade the loss. "
+        "Rejecting the encounter or failing to exert the required effort during the mission results in a loss."
+        "\n\nPress SPACE to continue."
     )
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-hf.exit_q(win)
-event.clearEvents()
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    hf.exit_q(win)
+    event.clearEvents()
 
-# CALIBRATE HAND GRIPPER ZERO BASELINE
-win.flip()
-instructions_top_txt.text = (
-    "Calibration in progress.\n\n"
-    "Please keep your hands away from the hand gripper."
-)
-hf.draw_all_stimuli(win, [instructions_top_txt], 1)
-big_txt.pos = [0, 20]
-for countdown in range(3, 0, -1):
-    big_txt.text = f"{countdown}"
-    hf.draw_all_stimuli(win, [instructions_top_txt, big_txt], 1)
-    if not DUMMY and countdown == 1:
-        gv['gripper_zero_baseline'] = gripper.sample()[0]
-win.flip()
-core.wait(0.6)
-
-# Task overview
-instructions_txt.text = (
-    "Excellent! Calibration is complete.\n\n"
-    "In this task, you'll pilot a spaceship through the cosmos, encountering star clouds and meteor fields. "
-    "Each encounter will require you to make a decision and potentially exert effort.\n\n"
-    "Press SPACE to review the key elements of the task."
-)
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])
-hf.exit_q(win)
-event.clearEvents()
-
-# Trial Structure
-instructions_txt.text = (
-    "Each trial consists of the following steps:\n\n"
-    "1. Spaceship & Effort Bar: A spaceship appears with an effort bar, indicating the amount of effort required for the trial.\n"
-    "2. Fixation Cross: A brief white fixation cross is shown on the screen.\n"
-    f"3. Encounter: You'll face either a star cloud (potential win) or a meteor field (potential loss).\n"
-    f"4. Decision: A green fixation cross appears, signaling you to make a choice. Press the designated response keys to accept or reject an encounter.\n"
-    f"5. Outcome: If you accept, you'll need to exert the required effort to either approach the stars or avoid the meteors. "
-    "Rejecting the encounter means no effort is required, but you forgo the chance to win a reward or avoid a loss. After your choice, the outcome is displayed, and the next trial begins."
-    "\n\nPress SPACE to continue."
-)
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])
-hf.exit_q(win)
-event.clearEvents()
-
-# Block types
-instructions_txt.text = (
-    "There are two types of encounters:\n\n"
-    "1. In approach encounters, you'll face clouds of stars. More stars mean higher potential rewards. "
-    "If you choose to accept the encounter, it becomes a mission where you must exert effort to approach the stars and collect the reward. "
-    "Rejecting the encounter or failing to exert the required effort during the mission results in no reward.\n\n"
-    "2. In avoid encounters, you'll face meteor fields. More meteors indicate a greater potential loss. "
-    "If you accept the encounter, it becomes a mission where you must exert effort to avoid the meteors and evade the loss. "
-    "Rejecting the encounter or failing to exert the required effort during the mission results in a loss."
-    "\n\nPress SPACE to continue."
-)
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-hf.exit_q(win)
-event.clearEvents()
-
-# Effort
-instructions_txt.text = (
-    f"When you accept an encounter, squeeze the gripper to power your spaceship. "
-    f"Your goal is to reach the target power level as quickly as possible. "
-    f"Once at target, maintain the power for 1 second until your spaceship starts moving. "
-    f"You have {gv['time_limit']} seconds for each mission attempt. Therefore, starting too slow may result in mission failure.\n\n"
-    f"Your adventure consists of {max(gv['block_number'])} blocks, each with {gv['num_trials_per_block']} encounters.\n"
-    f"Choose which encounters to accept wisely to not run out of energy whilst maximising your rewards and minimising your losses!"
-    f"\n\nPress SPACE to continue."
-)
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-hf.exit_q(win)
-event.clearEvents()
-
-# Monetary reward
-instructions_txt.text = (
-    f"You start your adventure with a base reward of £{gv['base_bonus_payment']}.\n"
-    "At the end, we'll randomly select 10 encounters (5 star clouds and 5 meteor fields). "
-    "Your choices and performance in these encounters will adjust your final reward.\n\n"
-    "Each point is worth 1p. For example, if an encounter where you accepted the mission and collected an 80-point star cloud is chosen, you'll earn 80p. "
-    "However, if you rejected that encounter or failed the mission, you'll earn nothing. "
-    "Similarly, if an encounter where you accepted the mission and successfully evaded an 80-point meteor field is chosen, nothing will be subtracted from your base reward. "
-    "But if you rejected that encounter or failed the mission, you'll lose 80p."
-    "\n\nPress SPACE to continue."
-)
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-hf.exit_q(win)
-event.clearEvents()
-
-# Ratings
-instructions_txt.text = (
-    # "Throughout your adventure, you'll occasionally report on two metrics:\n\n"  # removing reward rate tracking
-    "Throughout your adventure, you'll occasionally report on your \ncurrent heart rate.\n\n"
-    # "\n\n\n\n"
-    "Consider your recent experiences relative to your overall adventure.\n\n"
-    # "To report these metrics, "  # removing reward rate tracking
-    "To report this metric, "  
-    "use the response keys (the same ones you use for accept/reject) to move the slider marker left or right and "
-    "confirm your selection by pressing the SPACE key. "
-    "Note that the slider marker will always start out at a random position."
-    "\n\nPress SPACE to continue."
-)
-heart_rate_text = visual.TextStim(win, text="• Your current heart rate\n\n\n\n\n\n\n\n", pos=instructions_txt.pos,
-                                  height=instructions_txt.height, font='Arial')
-reward_rate_text = visual.TextStim(win, text="\n• Your current reward rate\n\n\n\n\n\n", pos=instructions_txt.pos,
-                                   height=instructions_txt.height, font='Arial')
-# stimuli = [instructions_txt, heart_rate_text, reward_rate_text, heart_rate_stimulus, reward_rate_stimulus]  # removing reward rate tracking
-stimuli = [instructions_txt, heart_rate_stimulus]
-hf.draw_all_stimuli(win, stimuli)
-event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-event.clearEvents()
-
-# removing reward rate tracking
-# instructions_txt.text = (
-#     "You'll see an icon flashing at the beginning of each trial, reminding you which metric (reward or heart rate) you are currently tracking.\n\n"
-#     "In avoid blocks, even though you are losing points, you should still use the complete scale from low to high "
-#     "reward rate. Consider your reward rate in the current context: if the loss is comparatively small, you may still have a high reward rate in that instance."
-#     "\n\nPress SPACE to continue."
-# )
-# instructions_txt.draw()
-# win.flip()
-# event.waitKeys(keyList=['space'])  # show instructions until space is pressed
-# hf.exit_q(win)
-# event.clearEvents()
-
-# Training quiz
-if gv['training']:
-    instructions_top_txt.pos = [0, 200]
-    big_txt.pos = [0, 150]
+    # Effort
     instructions_txt.text = (
-        "Let's make sure you're ready! \n\nAnswer the following questions \nto show you know how the task works."
-        "\n\n Respond with the number of the correct answer (1, 2, or 3). \n\n\n\nPress SPACE to start."
+        f"When you accept an encounter, squeeze the gripper to power your spaceship. "
+        f"Your goal is to reach the target power level as quickly as possible. "
+        f"Once at target, maintain the power for 1 second until your spaceship starts moving. "
+        f"You have {gv['time_limit']} seconds for each mission attempt. Therefore, starting too slow may result in mission failure.\n\n"
+        f"Your adventure consists of {max(gv['block_number'])} blocks, each with {gv['num_trials_per_block']} encounters.\n"
+        f"Choose which encounters to accept wisely to not run out of energy whilst maximising your rewards and minimising your losses!"
+        f"\n\nPress SPACE to continue."
     )
     instructions_txt.draw()
     win.flip()
+    event.waitKeys(keyList=['space'])  # show instructions until space is pressed
     hf.exit_q(win)
+    event.clearEvents()
+
+    # Monetary reward
+    instructions_txt.text = (
+        f"You start your adventure with a base reward of £{gv['base_bonus_payment']}.\n"
+        "At the end, we'll randomly select 10 encounters (5 star clouds and 5 meteor fields). "
+        "Your choices and performance in these encounters will adjust your final reward.\n\n"
+        "Each point is worth 1p. For example, if an encounter where you accepted the mission and collected an 80-point star cloud is chosen, you'll earn 80p. "
+        "However, if you rejected that encounter or failed the mission, you'll earn nothing. "
+        "Similarly, if an encounter where you accepted the mission and successfully evaded an 80-point meteor field is chosen, nothing will be subtracted from your base reward. "
+        "But if you rejected that encounter or failed the mission, you'll lose 80p."
+        "\n\nPress SPACE to continue."
+    )
+    instructions_txt.draw()
+    win.flip()
     event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    hf.exit_q(win)
     event.clearEvents()
 
-    button_1 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, 100), fillColor='white')
-    button_1_txt = visual.TextStim(win=win, text='Option A', height=25, pos=button_1.pos, color='black', bold=True,
-                                   font='Arial')
-    button_2 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, 0), fillColor='white')
-    button_2_txt = visual.TextStim(win=win, text='Option B', height=25, pos=button_2.pos, color='black', bold=True,
-                                   font='Arial')
-    button_3 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, -100), fillColor='white')
-    button_3_txt = visual.TextStim(win=win, text='Option C', height=25, pos=button_3.pos, color='black', bold=True,
-                                   font='Arial')
+    # Ratings
+    instructions_txt.text = (
+        # "Throughout your adventure, you'll occasionally report on two metrics:\n\n"  # removing reward rate tracking
+        "Throughout your adventure, you'll occasionally report on your \ncurrent heart rate.\n\n"
+        # "\n\n\n\n"
+        "Consider your recent experiences relative to your overall adventure.\n\n"
+        # "To report these metrics, "  # removing reward rate tracking
+        "To report this metric, "  
+        "use the response keys (the same ones you use for accept/reject) to move the slider marker left or right and "
+        "confirm your selection by pressing the SPACE key. "
+        "Note that the slider marker will always start out at a random position."
+        "\n\nPress SPACE to continue."
+    )
+    heart_rate_text = visual.TextStim(win, text="• Your current heart rate\n\n\n\n\n\n\n\n", pos=instructions_txt.pos,
+                                      height=instructions_txt.height, font='Arial')
+    reward_rate_text = visual.TextStim(win, text="\n• Your current reward rate\n\n\n\n\n\n", pos=instructions_txt.pos,
+                                       height=instructions_txt.height, font='Arial')
+    # stimuli = [instructions_txt, heart_rate_text, reward_rate_text, heart_rate_stimulus, reward_rate_stimulus]  # removing reward rate tracking
+    stimuli = [instructions_txt, heart_rate_stimulus]
+    hf.draw_all_stimuli(win, stimuli)
+    event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    event.clearEvents()
 
-    quiz_questions = [
-        ("How do you power your spaceship?", ["1. Squeeze the gripper", "2. Press a button", "3. Shout"], 0),
-        ("What do you do in an approach encounter?", ["1. Avoid meteors", "2. Approach stars", "3. Do nothing"], 1),
-        ("What happens if you reject an avoid encounter?", ["1. Gain a reward", "2. No change", "3. Experience a loss"], 2),
-        ("What do more meteors indicate?", ["1. Higher potential reward", "2. Greater potential loss", "3. Easier mission"], 1),
-        ("What happens if you fail to exert the required effort during an approach encounter?", ["1. No reward is given", "2. You still get a reward", "3. You lose points"], 0)
-    ]
-    incorrect_questions = []
-
-    def ask_question(question, options, correct_option):
-        instructions_top_txt.text = question
-        button_1_txt.text = options[0]
-        button_2_txt.text = options[1]
-        button_3_txt.text = options[2]
-        stimuli = [instructions_top_txt, button_1, button_1_txt, button_2, button_2_txt, button_3, button_3_txt]
-        hf.draw_all_stimuli(win, stimuli)
-
-        keys = event.waitKeys(keyList=['1', '2', '3'])
-        response = keys[0]
-        if response == '1':
-            selected_option = 0
-        elif response == '2':
-            selected_option = 1
-        elif response == '3':
-            selected_option = 2
-
-        if selected_option == correct_option:
-            big_txt.text = "Correct!"
-            instructions_txt.text = "\n\n\n\n\n\nPress SPACE to continue."
-        else:
-            big_txt.text = f"Incorrect!"
-            instructions_txt.text = f"\n\n\n\n\n\n\nThe question was: '{question}'\n\nThe correct answer is: '{options[correct_option]}'. \n\n\nPress SPACE to continue."
-            incorrect_questions.append((question, options, correct_option))
-
-        stimuli = [big_txt, instructions_txt]
-        hf.draw_all_stimuli(win, stimuli)
-        event.waitKeys(keyList=['space'])
+    # removing reward rate tracking
+    # instructions_txt.text = (
+    #     "You'll see an icon flashing at the beginning of each trial, reminding you which metric (reward or heart rate) you are currently tracking.\n\n"
+    #     "In avoid blocks, even though you are losing points, you should still use the complete scale from low to high "
+    #     "reward rate. Consider your reward rate in the current context: if the loss is comparatively small, you may still have a high reward rate in that instance."
+    #     "\n\nPress SPACE to continue."
+    # )
+    # instructions_txt.draw()
+    # win.flip()
+    # event.waitKeys(keyList=['space'])  # show instructions until space is pressed
+    # hf.exit_q(win)
+    # event.clearEvents()
+
+    # Training quiz
+    if gv['training']:
+        instructions_top_txt.pos = [0, 200]
+        big_txt.pos = [0, 150]
+        instructions_txt.text = (
+            "Let's make sure you're ready! \n\nAnswer the following questions \nto show you know how the task works."
+            "\n\n Respond with the number of the correct answer (1, 2, or 3). \n\n\n\nPress SPACE to start."
+        )
+        instructions_txt.draw()
+        win.flip()
         hf.exit_q(win)
-        event.clearEvents()
 
-    # Ask all initial questions
-    for question, options, correct_option in quiz_questions:
-        ask_question(question, options, correct_option)
-    # Re-ask incorrect questions
-    while incorrect_questions:
-        question, options, correct_option = incorrect_questions.pop(0)
-        ask_question(question, options, correct_option)
+        button_1 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, 100), fillColor='white')
+        button_1_txt = visual.TextStim(win=win, text='Option A', height=25, pos=button_1.pos, color='black', bold=True,
+                                       font='Arial')
+        button_2 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, 0), fillColor='white')
+        button_2_txt = visual.TextStim(win=win, text='Option B', height=25, pos=button_2.pos, color='black', bold=True,
+                                       font='Arial')
+        button_3 = visual.Rect(win=win, units="pix", width=500, height=60, pos=(0, -100), fillColor='white')
+        button_3_txt = visual.TextStim(win=win, text='Option C', height=25, pos=button_3.pos, color='black', bold=True,
+                                       font='Arial')
+
+        quiz_questions = [
+            ("How do you power your spaceship?", ["1. Squeeze the gripper", "2. Press a button", "3. Shout"], 0),
+            ("What do you do in an approach encounter?", ["1. Avoid meteors", "2. Approach stars", "3. Do nothing"], 1),
+            ("What happens if you reject an avoid encounter?", ["1. Gain a reward", "2. No change", "3. Experience a loss"], 2),
+            ("What do more meteors indicate?", ["1. Higher potential reward", "2. Greater potential loss", "3. Easier mission"], 1),
+            ("What happens if you fail to exert the required effort during an approach encounter?", ["1. No reward is given", "2. You still get a reward", "3. You lose points"], 0)
+        ]
+        incorrect_questions = []
+
+        def feedback_texts(question, options, correct_option):
+            correct_txt = "\n\n\n\n\n\nPress SPACE to continue."
+            incorrect_txt = f"\n\n\n\n\n\n\nThe question was: '{question}'\n\nThe correct answer is: '{options[correct_option]}'. \n\n\nPress SPACE to continue."
+            return correct_txt, incorrect_txt
+
+        # pre-render all quiz questions, options and feedback
+        for question, options, correct_option in quiz_questions:
+            text_cache.warm_up([question], like=instructions_top_txt)
+            for option, button_txt_template in zip(options, [button_1_txt, button_2_txt, button_3_txt]):
+                text_cache.warm_up([option], like=button_txt_template)
+            text_cache.warm_up(feedback_texts(question, options, correct_option), like=instructions_txt)
+        text_cache.warm_up(["Correct!", "Incorrect!"], like=big_txt)
+        event.waitKeys(keyList=['space'])  # show instructions until space is pressed (quiz is pre-rendered in the meantime)
+        event.clearEvents()
 
-# Start
-win.flip()
-if gv['training']:
-    instructions_txt.text = (
-        "Great job!\n\nLet's dive into some practice trials!\n\nThe points from this training session won't count towards your monetary reward, so feel free to explore: "
-        "Try out accepting or rejecting offers, and see what happens when you successfully execute or fail to meet the required effort levels."
-        "\n\nPress SPACE to start."
-    )
-else:
-    big_txt.text = "Grab the hand gripper to prepare for launch!\n"
-    instructions_txt.text = ("\n\n\n\n\n\n\n\n\n\n\nPress SPACE when ready.")
-    big_txt.draw()
-instructions_txt.draw()
-win.flip()
-event.waitKeys(keyList=['space'])
-hf.exit_q(win)
-event.clearEvents()
+        def ask_question(question, options, correct_option):
+            stimuli = [text_cache.get(question, like=instructions_top_txt),
+                       button_1, text_cache.get(options[0], like=button_1_txt),
+                       button_2, text_cache.get(options[1], like=button_2_txt),
+                       button_3, text_cache.get(options[2], like=button_3_txt)]
+            hf.draw_all_stimuli(win, stimuli)
+
+            keys = event.waitKeys(keyList=['1', '2', '3'])
+            response = keys[0]
+            if response == '1':
+                selected_option = 0
+            elif response == '2':
+                selected_option = 1
+            elif response == '3':
+                selected_option = 2
+
+            correct_txt, incorrect_txt = feedback_texts(question, options, correct_option)
+            if selected_option == correct_option:
+                stimuli = [text_cache.get("Correct!", like=big_txt), text_cache.get(correct_txt, like=instructions_txt)]
+            else:
+                stimuli = [text_cache.get("Incorrect!", like=big_txt), text_cache.get(incorrect_txt, like=instructions_txt)]
+                incorrect_questions.append((question, options, correct_option))
+
+            hf.draw_all_stimuli(win, stimuli)
+            event.waitKeys(keyList=['space'])
+            hf.exit_q(win)
+            event.clearEvents()
+
+        # Ask all initial questions
+        for question, options, correct_option in quiz_questions:
+            ask_question(question, options, correct_option)
+        # Re-ask incorrect questions
+        while incorrect_questions:
+            question, options, correct_option = incorrect_questions.pop(0)
+            ask_question(question, options, correct_option)
+
+    # Start
+    win.flip()
+    if gv['training']:
+        instructions_txt.text = (
+            "Great job!\n\nLet's dive into some practice trials!\n\nThe points from this training session won't count towards your monetary reward, so feel free to explore: "
+            "Try out accepting or rejecting offers, and see what happens when you successfully execute or fail to meet the required effort levels."
+            "\n\nPress SPACE to start."
+        )
+    else:
+        big_txt.text = "Grab the hand gripper to prepare for launch!\n"
+        instructions_txt.text = ("\n\n\n\n\n\n\n\n\n\n\nPress SPACE when ready.")
+        big_txt.draw()
+    instructions_txt.draw()
+    win.flip()
+    event.waitKeys(keyList=['space'])
+    hf.exit_q(win)
+    event.clearEvents()
 
 # MAJA - some break point here so that the actual task only starts after TUS has been completed
 
 ###################################
 # TASK
 ###################################
+# CRITICAL SECTIONS (no garbage collection and raised priority during offers, effort and outcomes, see critical.py)
+critical_sections = critical.CriticalSections(filename + '_gc.csv', append=bool(resumed),
+                                              size=resumed['file_sizes']['_gc.csv'] if resumed else None)
+critical_sections.freeze()  # everything set up so far stays alive for the whole session
+
 EEG_config.send_trigger(EEG_config.triggers['experiment_start'])
-start_time = datetime.now()
-info['start_time'] = start_time.strftime("%Y-%m-%d %H:%M:%S")
-current_block = 0
+if resumed:
+    start_time = resumed['start_time']
+else:
+    start_time = datetime.now()
+    info['start_time'] = start_time.strftime("%Y-%m-%d %H:%M:%S")
+current_block = 0  # after resuming, the next trial starts with its block start screen
+session_state = resumed  # the state in the last checkpoint
 while info['trial_count'] < gv['num_trials']:  # this must be < because we start with trial_count = 0
 
     # pause for ca. 1 second between trials
-    win.flip()
     base_wait_time = 1
     jitter_range = 0.25  # (±0.25 seconds)
     jittered_wait_time = base_wait_time + random.uniform(-jitter_range, jitter_range)
-    core.wait(jittered_wait_time)
+    frame_timer.start_trial(info['trial_count'] + 1)
+    tracing.set_trial(info['trial_count'] + 1)
+    critical_sections.start_trial(info['trial_count'] + 1)
+    event_journal.start_trial(info['trial_count'] + 1)
+    frame_timer.set_phase('iti', jittered_wait_time)
+    with tracing.span('iti'):
+        event_journal.log_on_flip(win, 'iti')
+        win.flip()
+        iti_clock = core.Clock()
+        archive.write_trial(info['trial_count'])  # write the force, trigger and frame data of the last trial
+        if session_state is not None:  # its frame timing and archive chunks are complete now, checkpoint them
+            session_state['file_sizes']['_frames.csv'] = frame_timer.flush()
+            session_state['archive_chunks'] = archive.n_chunks
+            checkpoint.save(filename, session_state)
+        critical_sections.collect()  # collect the garbage of the last trial now
+        core.wait(jittered_wait_time - iti_clock.getTime())
 
     # reset variables
     response = None
@@ -566,7 +721,7 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
     effort_trace = None
     effort_time = None
     average_effort = None
-    action_text = None
+    animation = None
 
     # trial info
     block_number = gv['block_number'][info['trial_count']]
@@ -602,16 +757,15 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
 
     # check if we are at the beginning of a new block
     if block_number != current_block:
+        frame_timer.set_phase('block_start')
         EEG_config.send_trigger(EEG_config.triggers['block_start'])
         current_block = block_number
         win.color = 'black'  # set window color to black for block message
         button_txt.text = 'START'
         win.flip()
         if action_type == 'approach':
-            action_text = "collect stars to earn points"
             outcome = hf.draw_star(win, [450, 115], size=25, color=[255, 255, 255])
         elif action_type == 'avoid':
-            action_text = "evade meteors to avoid losing points"
             outcome = hf.draw_meteor(win, [540, 115], size=24, color=[255, 255, 255])
         if attention_focus == 'reward':
             reward_rate_stimulus.pos = [550, 25]
@@ -621,13 +775,10 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
             heart_rate_stimulus.pos = [530, 25]
             image = heart_rate_stimulus
             cue = heart_cue
-        instructions_txt.text = (
-            f"This is block {current_block} of {max(gv['block_number'])}\n\n"
-            f"Your mission is to {action_text}\n\n"
-            f"Throughout this block, pay attention to your {attention_focus} rate\n\n"
-            "When you're ready to continue, press SPACE!"
-        )
-        stimuli = [instructions_txt, image, outcome]
+        block_txt = text_cache.get(hf.block_message(current_block, max(gv['block_number']), action_type,
+                                                    attention_focus), like=instructions_txt)
+        stimuli = [block_txt, image, outcome]
+        event_journal.log_on_flip(win, 'block_start')
         hf.draw_all_stimuli(win, stimuli, 1)
         event.waitKeys(keyList=['space'])  # show instructions until space is pressed
         event.clearEvents()
@@ -639,6 +790,7 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
     # draw stimuli
     spaceship, outline, target, effort_text, outcomes = hf.draw_trial_stimuli(win, trial_effort, trial_outcome_level,
                                                                               action_type, gv)
+    startup.mark('first_trial_ready')
     # shift stimuli to the center of the screen
     shift = abs(outline.pos[1])
     spaceship.pos = (spaceship.pos[0], spaceship.pos[1] + shift)
@@ -649,13 +801,25 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
 
     # sequentially show effort and then outcome offer
     # hf.draw_all_stimuli(win, [cue], 0.5)  # show cue 500ms # removing reward rate tracking
-    hf.draw_all_stimuli(win, [fixation_cross], 0.5)  # show fixation cross 500ms
-    effort_trigger_code = EEG_config.triggers['effort_presentation_approach'] if action_type == 'approach' else EEG_config.triggers['effort_presentation_avoid']
-    hf.draw_all_stimuli(win, [spaceship, outline, target], 1, EEG_config, effort_trigger_code)  # show effort 1s and send EEG trigger
-    hf.draw_all_stimuli(win, [fixation_cross], 0.5)  # show fixation cross 500ms
-    outcome_trigger_code = EEG_config.triggers['outcome_presentation_approach'] if action_type == 'approach' else EEG_config.triggers['outcome_presentation_avoid']
-    hf.draw_all_stimuli(win, [outcomes], 1, EEG_config, outcome_trigger_code)  # show reward/loss 1s and send EEG trigger
-    hf.draw_all_stimuli(win, [fixation_cross_green], 0.1)
+    with tracing.span('offer'), critical_sections.section('offer'):
+        frame_timer.set_phase('fixation', 0.5)
+        event_journal.log_on_flip(win, 'fixation')
+        hf.draw_all_stimuli(win, [fixation_cross], 0.5)  # show fixation cross 500ms
+        effort_trigger_code = EEG_config.triggers['effort_presentation_approach'] if action_type == 'approach' else EEG_config.triggers['effort_presentation_avoid']
+        frame_timer.set_phase('effort_offer', 1)
+        event_journal.log_on_flip(win, 'effort_offer', trial_effort)
+        hf.draw_all_stimuli(win, [spaceship, outline, target], 1, EEG_config, effort_trigger_code)  # show effort 1s and send EEG trigger
+        frame_timer.set_phase('fixation', 0.5)
+        event_journal.log_on_flip(win, 'fixation')
+        hf.draw_all_stimuli(win, [fixation_cross], 0.5)  # show fixation cross 500ms
+        outcome_trigger_code = EEG_config.triggers['outcome_presentation_approach'] if action_type == 'approach' else EEG_config.triggers['outcome_presentation_avoid']
+        frame_timer.set_phase('outcome_offer', 1)
+        event_journal.log_on_flip(win, 'outcome_offer', trial_outcome_level)
+        hf.draw_all_stimuli(win, [outcomes], 1, EEG_config, outcome_trigger_code)  # show reward/loss 1s and send EEG trigger
+        frame_timer.set_phase('decision')
+        event_journal.log_on_flip(win, 'decision')
+        responses.get_collector().start_on_flip(win)  # response times are measured from the green fixation cross
+        decision_onset = hf.draw_all_stimuli(win, [fixation_cross_green], 0.1)
     # EEG_config.send_trigger(2)
 
     # shift back to original position
@@ -666,30 +830,37 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
         outcome.pos = (outcome.pos[0], outcome.pos[1] + 220)
 
     # capture the participant's response and send the trigger when the key is pressed
+    if simulated:
+        simulated.observe_offer(trial_effort, trial_outcome_level, action_type, effort_state, attention_focus)
     clicked_button, response_time = hf.check_key_press(win, gv['response_keys'], EEG_config, trigger_mapping)
+    event_journal.log('response', float(clicked_button == gv['response_keys'][0]), decision_onset + response_time)
 
     # accept
     if clicked_button == gv['response_keys'][0]:
         response = 'accept'
         stimuli = [spaceship, outline, target, outcomes]
-        result, effort_trace, average_effort, effort_time = hf.sample_effort(win, DUMMY, mouse, gripper, stimuli,
-                                                                             trial_effort, target, gv, EEG_config,
-                                                                             effort_state)
+        with critical_sections.section('effort'):
+            result, effort_trace, average_effort, effort_time = hf.sample_effort(win, DUMMY, mouse, gripper, stimuli,
+                                                                                 trial_effort, target, gv, EEG_config,
+                                                                                 effort_state)
         # success
         if result == 'success':
             if action_type == 'approach':
                 points = trial_actual_outcome
             elif action_type == 'avoid':
                 points = 0
-            hf.animate_success(win, spaceship, outcomes, target, outline, points, action_type, EEG_config, gv, cue)
+            with critical_sections.section('outcome'):
+                animation = hf.animate_success(win, spaceship, outcomes, target, outline, points, action_type,
+                                               EEG_config, gv, cue, text_cache)
         # failure
         elif result == 'failure':
             if action_type == 'approach':
                 points = 0
             elif action_type == 'avoid':
                 points = trial_actual_outcome
-            hf.animate_failure_or_reject(win, spaceship, outline, target, outcomes, points, action_type, result,
-                                         EEG_config, gv, cue)
+            with critical_sections.section('outcome'):
+                animation = hf.animate_failure_or_reject(win, spaceship, outline, target, outcomes, points,
+                                                         action_type, result, EEG_config, gv, cue, text_cache)
 
     # reject
     elif clicked_button == gv['response_keys'][1]:
@@ -699,8 +870,13 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
             points = 0
         elif action_type == 'avoid':
             points = trial_actual_outcome
-        hf.animate_failure_or_reject(win, spaceship, outline, target, outcomes, points, action_type, response,
-                                     EEG_config, gv, cue)
+        with critical_sections.section('outcome'):
+            animation = hf.animate_failure_or_reject(win, spaceship, outline, target, outcomes, points, action_type,
+                                                     response, EEG_config, gv, cue, text_cache)
+
+    event_journal.log('trial_end', points)
+    if simulated:
+        simulated.observe_outcome(points, effort_trace)
 
     # check if we are in a rating trial
     if str(rating_trial).lower() == "true":
@@ -710,14 +886,16 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
             # call get_rating and pass the EEG_config and the trigger for rating response (reward)
             rating, rating_time, rating_random_start_pos = hf.get_rating(win, attention_focus, reward_rate_stimulus, gv,
                                                                          EEG_config,
-                                                                         EEG_config.triggers['rating_response_reward'])
+                                                                         EEG_config.triggers['rating_response_reward'],
+                                                                         text_cache)
         elif attention_focus == "heart":
             # send trigger for rating question (heart) right after flipping the window to display the question
             EEG_config.send_trigger(EEG_config.triggers['rating_question_heart'])
             # call get_rating and pass the EEG_config and the trigger for rating response (heart)
             rating, rating_time, rating_random_start_pos = hf.get_rating(win, attention_focus, heart_rate_stimulus, gv,
                                                                          EEG_config,
-                                                                         EEG_config.triggers['rating_response_heart'])
+                                                                         EEG_config.triggers['rating_response_heart'],
+                                                                         text_cache)
     else:
         pass
 
@@ -736,17 +914,33 @@ while info['trial_count'] < gv['num_trials']:  # this must be < because we start
     info['response'] = response
     info['response_time'] = response_time
     info['result'] = result
-    info['effort_trace'] = '"' + json.dumps(effort_trace) + '"'
+    info['effort_trace_id'] = trace_writer.append(effort_trace) if effort_trace is not None else None
     info['effort_expended'] = average_effort
     info['effort_response_time'] = effort_time
+    info['animation_duration'] = animation['duration'] if animation else None
+    info['animation_dropped_frames'] = animation['dropped_frames'] if animation else None
     info['points'] = points
     info['cumulative_points'] = int(info['cumulative_points']) + points if info['cumulative_points'] is not None else points
-    datafile.write(','.join([str(info[var]) for var in log_vars]) + '\n')
-    datafile.flush()
+    with tracing.span('csv_write'):
+        datafile.write(','.join([str(info[var]) for var in log_vars]) + '\n')
+        datafile.flush()
     # append a copy of the current trial info to the all_trials list
     all_trials.append(info.copy())
+    # the side-car files only hold complete trials up to here: the journal and the garbage collection pauses up to
+    # this trial, the frame timing and the archive up to the last one (this trial's are added in the next ITI)
+    file_sizes = {'.csv': datafile.tell(), '_journal.bin': event_journal.flush(), '_gc.csv': critical_sections.flush(),
+                  '_frames.csv': frame_timer.flush()}
+    session_state = dict(
+        filename=filename, info=info, all_trials=all_trials, current_block=current_block, start_time=start_time,
+        gripper_zero_baseline=gv['gripper_zero_baseline'], random_state=random.getstate(),
+        numpy_random_state=np.random.get_state(), file_sizes=file_sizes, archive_chunks=archive.n_chunks,
+        n_traces=trace_writer.n_traces)
+    checkpoint.save(filename, session_state)
 
 # End of experiment
+critical_sections.close()
+frame_timer.start_trial(info['trial_count'] + 1)
+frame_timer.set_phase('end')
 end_time = datetime.now()
 info['end_time'] = end_time.strftime("%Y-%m-%d %H:%M:%S")
 duration = end_time - start_time
@@ -763,33 +957,29 @@ else:
     big_txt.text = "Please let the experimenter know that you are done."
     instructions_txt.text = f"\n\n\n\n\n\nYour bonus payment is £{final_bonus_payment: .2f}!"
 
-# Update the last trial with end time, duration, and bonus payment
-if all_trials:
-    all_trials[-1]['end_time'] = info['end_time']
-    all_trials[-1]['duration'] = info['duration']
-    all_trials[-1]['final_bonus_payment'] = info['final_bonus_payment']
-
-    # Close the file before reopening it in read/write mode
-    datafile.close()
-
-    # Reopen the file in read/write mode
-    with open(filename + '.csv', 'r+') as datafile:
-        # Read the current content of the file
-        lines = datafile.readlines()
-
-        # Replace the last line with the updated trial info
-        lines[-1] = ','.join([str(all_trials[-1][var]) for var in log_vars]) + '\n'
-
-        # Write back the modified content
-        datafile.seek(0)
-        datafile.writelines(lines)
-        datafile.flush()
-
+# save end time, duration, and bonus payment in the session summary (the trial file is never rewritten,
+# session_data.load_session merges the summary back into the last trial)
 datafile.close()
+event_journal.close()
+session_data.write_summary(filename, {var: info[var] for var in summary_vars})
+checkpoint.remove(filename)
+trace_writer.close()
 stimuli = [big_txt, instructions_txt]
 hf.draw_all_stimuli(win, stimuli)
+frame_timer.close()
+frame_timing.print_report(filename + '_frames.csv')
+tracing.save(filename)
+startup.report(filename)
+if gripper is not None:
+    gripper.stop_recording()  # write the rest of the force stream to the BIOPAC log
+session_files = [filename + suffix for suffix in ['.csv', '_summary.csv', '_traces.f32', '_traces.idx', '_journal.bin',
+                                                   '_frames.csv', '_gc.csv', '_trace.json', '_latency.csv',
+                                                   '_startup.csv']]
+if gripper is not None and not simulated:
+    session_files.append(gripper._logfilename)
+archive.close(info['trial_count'] + 1, files=session_files)
 EEG_config.send_trigger(EEG_config.triggers['experiment_end'])
-hf.exit_q(win, mouse)
+hf.exit_q(win)
 core.wait(8)
 
 # CLOSE WINDOW
@@ -142,11 +142,13 @@ class BioPac:
             i = 1
             while os.path.isfile(self._logfilename):
                 i += 1
-                self._logfilename = "%s_%d_BIOPAC_data.tsv" % (i, logfile)
+                self._logfilename = "%s_%d_BIOPAC_data.tsv" % (logfile, i)
         
         # Pre-create properties that are used by methods.
         self._newestsample = numpy.zeros(n_channels, dtype=float)
         self._buffer = []
+        self._buffer_times = []
+        self._buffer_read = 0
         self._buffch = 0
         
         # Connect to the BIOPAC device. The first passed variable is the
@@ -266,6 +268,8 @@ class BioPac:
         
         # Clear the internal buffer.
         self._buffer = []
+        self._buffer_times = []
+        self._buffer_read = 0
         self._buffch = channel
         
         # Signal to the sample processing thread that recording to the internal
@@ -316,6 +320,29 @@ class BioPac:
         
         return numpy.array(self._buffer)
 
+
+    def read_buffer(self):
+        
+        """
+        desc:
+            Returns the samples that were added to the internal buffer
+            since the last call (or since start_recording_to_buffer), with
+            their timestamps. Safe to call while recording to the buffer.
+        
+        returns:
+            desc: Two NumPy arrays: the timestamps (ms, see get_timestamp)
+                and the values of the new samples.
+            type: tuple
+        """
+        
+        # The sample processing thread only appends, and the timestamp is
+        # appended after the value, so every timestamp has its value.
+        n = len(self._buffer_times)
+        times = self._buffer_times[self._buffer_read:n]
+        values = self._buffer[self._buffer_read:n]
+        self._buffer_read = n
+        return numpy.array(times, dtype=float), numpy.array(values, dtype=float)
+
     
     def log(self, msg):
         
@@ -428,6 +455,7 @@ class BioPac:
                 # Add the sample to the buffer.
                 if self._recordtobuff:
                     self._buffer.append(self._newestsample[self._buffch])
+                    self._buffer_times.append(t)
 
             # Pause until the next sample is available.
             # This is commented out, because it is currently unnecessary: 
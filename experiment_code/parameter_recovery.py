@@ -0,0 +1,193 @@
+"""
+parameter recovery for the trial schedules main.py runs (final_trial_schedules_without_reward_rate/schedule_A/B_*):
+how well the accept/reject choices of one session identify the effort discounting, the approach/avoid asymmetry and the
+effect of the shifted effort display
+synthetic participants choose with the model of simulate.py, extended by the two effects:
+    net value = w * |outcome level| - k * (effort / 10)**2 + s * shifted     (w = 1 for approach, avoid_weight for avoid;
+                                                                           s = shift_effect, shifted = 1 in shifted
+                                                                           blocks)
+    p(accept) = 1 / (1 + exp(-net value / temperature))
+which is a logistic regression without intercept on |outcome| in approach and in avoid trials, (effort / 10)**2 and
+shifted, with weights 1 / temperature * (1, avoid_weight, -k, shift_effect). the choices of all agents of a schedule
+are drawn as one (agents x trials) array, and the agents are fitted back in chunks on a process pool, each chunk with
+Newton steps for all its agents at once (a weak ridge penalty keeps the weights finite for agents who never
+accept or never reject a kind of offer).
+    python parameter_recovery.py --agents 2000 --jobs 4      # recovery error per schedule and parameter
+    results = parameter_recovery.recover(2000)               # true and fitted parameters of every agent
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+###################################
+# SETTINGS
+###################################
+SCHEDULE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                               'final_trial_schedules_without_reward_rate')
+PARAMETER_RANGES = dict(  # the true parameters of the agents are drawn uniformly from these ranges
+    k=(0.2, 2.0),
+    avoid_weight=(0.5, 2.0),
+    shift_effect=(-20.0, 20.0),
+    temperature=(3.0, 20.0),
+)
+RIDGE = 1e-3  # penalty on the squared regression weights
+MAX_NEWTON_STEPS = 100
+
+
+###################################
+# FUNCTIONS
+###################################
+def load_schedules(folder=SCHEDULE_FOLDER):
+    """
+    the main schedules in folder (not testing and training), as {name: DataFrame}
+    """
+    paths = sorted(glob.glob(os.path.join(folder, 'schedule_[AB]_*.csv')))
+    return {os.path.basename(path)[len('schedule_'):-4]: pd.read_csv(path) for path in paths}
+
+
+def design_matrix(schedule):
+    """
+    (trials x 4) regressors: |outcome| in approach trials, |outcome| in avoid trials, (effort / 10)**2, shifted
+    """
+    outcome = schedule['outcome_level'].abs().to_numpy(dtype=float)
+    avoid = (schedule['action_type'] == 'avoid').to_numpy()
+    return np.column_stack([
+        np.where(avoid, 0, outcome),
+        np.where(avoid, outcome, 0),
+        (schedule['effort'].to_numpy(dtype=float) / 10) ** 2,
+        (schedule['global_effort_state'] == 'shifted').to_numpy(dtype=float),
+    ])
+
+
+def parameters_to_weights(parameters):
+    """
+    (agents x 4) regression weights of the parameters (a dict of arrays)
+    """
+    return np.column_stack([np.ones_like(parameters['k']), parameters['avoid_weight'], -parameters['k'],
+                            parameters['shift_effect']]) / parameters['temperature'][:, None]
+
+
+def weights_to_parameters(weights):
+    temperature = 1 / weights[:, 0]
+    return dict(k=-weights[:, 2] * temperature, avoid_weight=weights[:, 1] * temperature,
+                shift_effect=weights[:, 3] * temperature, temperature=temperature)
+
+
+def sample_parameters(n_agents, rng):
+    return {name: rng.uniform(low, high, n_agents) for name, (low, high) in PARAMETER_RANGES.items()}
+
+
+def simulate_choices(design, parameters, rng):
+    """
+    accept (True) or reject of every agent in every trial, as an (agents x trials) array
+    """
+    logits = parameters_to_weights(parameters) @ design.T
+    with np.errstate(over='ignore'):
+        return rng.random(logits.shape) < 1 / (1 + np.exp(-logits))
+
+
+def fit(design, choices, ridge=RIDGE):
+    """
+    penalised maximum likelihood weights of every agent (rows of choices), with Newton steps for all agents at once
+    """
+    weights = np.zeros((len(choices), design.shape[1]))
+    penalty = ridge * np.eye(design.shape[1])
+    for _ in range(MAX_NEWTON_STEPS):
+        with np.errstate(over='ignore'):
+            p = 1 / (1 + np.exp(-weights @ design.T))
+        gradient = (choices - p) @ design - ridge * weights
+        hessian = np.einsum('at,tf,tg->afg', p * (1 - p), design, design) + penalty
+        step = np.linalg.solve(hessian, gradient[..., None])[..., 0]
+        weights += step
+        if np.abs(step).max() < 1e-8:
+            break
+    return weights
+
+
+def _fit_chunk(args):
+    """
+    fit one chunk of agents (runs in a worker process)
+    """
+    design, choices = args
+    return fit(design, choices)
+
+
+def recover(n_agents, schedules=None, jobs=None, seed=0, chunk_size=250):
+    """
+    simulate n_agents agents on every schedule (the same agents on all schedules) and fit them back. returns a
+    DataFrame with one row per schedule and agent: the true and the fitted (fit_*) parameters
+    """
+    schedules = load_schedules() if schedules is None else schedules
+    rng = np.random.default_rng(seed)
+    parameters = sample_parameters(n_agents, rng)
+    designs, chunks = {}, []
+    for name, schedule in schedules.items():
+        designs[name] = design_matrix(schedule)
+        choices = simulate_choices(designs[name], parameters, rng)
+        chunks += [(designs[name], choices[start:start + chunk_size]) for start in range(0, n_agents, chunk_size)]
+    if jobs == 1:
+        weights = [_fit_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            weights = list(executor.map(_fit_chunk, chunks))
+    fitted = weights_to_parameters(np.concatenate(weights))
+    results = pd.DataFrame(dict(schedule=np.repeat(list(schedules), n_agents),
+                                agent=np.tile(np.arange(n_agents), len(schedules))))
+    for name in PARAMETER_RANGES:
+        results[name] = np.tile(parameters[name], len(schedules))
+        results['fit_' + name] = fitted[name]
+    return results
+
+
+def summarize(results):
+    """
+    recovery error per schedule and parameter: correlation of true and fitted values, median error (bias), median and
+    mean absolute error
+    """
+    rows = []
+    for name in PARAMETER_RANGES:
+        error = results['fit_' + name] - results[name]
+        grouped = pd.DataFrame(dict(schedule=results['schedule'], true=results[name], fit=results['fit_' + name],
+                                    error=error, abs_error=error.abs())).groupby('schedule')
+        summary = pd.DataFrame(dict(
+            correlation=grouped.apply(lambda group: group['true'].corr(group['fit']), include_groups=False),
+            bias=grouped['error'].median(),
+            median_abs_error=grouped['abs_error'].median(),
+            mean_abs_error=grouped['abs_error'].mean(),
+        ))
+        summary.insert(0, 'parameter', name)
+        rows.append(summary.reset_index())
+    return pd.concat(rows, ignore_index=True)
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='parameter recovery for the trial schedules')
+    parser.add_argument('--agents', type=int, default=2000, help='synthetic participants per schedule')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=250, help='agents per fit on a worker')
+    parser.add_argument('--folder', default=SCHEDULE_FOLDER)
+    parser.add_argument('--out', help='csv file for the true and fitted parameters of every agent')
+    args = parser.parse_args()
+
+    all_schedules = load_schedules(args.folder)
+    start = time.perf_counter()
+    recovered = recover(args.agents, all_schedules, args.jobs, args.seed, args.chunk_size)
+    seconds = time.perf_counter() - start
+    print(f'{args.agents} agents x {len(all_schedules)} schedules simulated and fitted in {seconds:.1f} s '
+          f'on {args.jobs} processes')
+    print(summarize(recovered).to_string(index=False, float_format='%.3f'))
+    if args.out:
+        recovered.to_csv(args.out, index=False)
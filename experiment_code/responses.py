@@ -0,0 +1,80 @@
+"""
+keyboard response collection for check_key_press, get_rating and exit_q in helper_functions.py
+all three read from one psychopy hardware keyboard (with the psychtoolbox backend, key presses are collected on a
+background thread and timestamped by the hardware), so reaction times are no longer quantised by the polling loop and
+no key presses are lost to event.clearEvents().
+response times are measured from the flip that started the response window (e.g. the green fixation cross).
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+from backend import core, keyboard
+
+
+###################################
+# CLASSES
+###################################
+class ResponseCollector:
+    def __init__(self):
+        self.keyboard = keyboard.Keyboard()
+        self.started = False  # whether a response window is running
+
+    def start_on_flip(self, win):
+        """
+        start the response window on the next flip: earlier key presses are discarded and response times are measured
+        from the flip
+        """
+        win.callOnFlip(self.start)
+        self.started = True
+
+    def start(self):
+        """
+        start the response window now
+        """
+        self.keyboard.clock.reset()
+        self.keyboard.clearEvents()
+        self.started = True
+
+    def poll(self, key_list):
+        """
+        return the presses of keys in key_list since the last call (as psychopy KeyPress objects with .name and .rt)
+        without waiting. presses of other keys stay in the queue.
+        """
+        return self.keyboard.getKeys(keyList=key_list, waitRelease=False, clear=True)
+
+    def wait(self, key_list, win=None, quit_key='q'):
+        """
+        wait for the first press of a key in key_list and return it. if a window is given, the experiment can be quit
+        with quit_key while waiting.
+        """
+        if not self.started:
+            self.start()
+        while True:
+            keys = self.poll(key_list + [quit_key] if win is not None else key_list)
+            for key in keys:
+                if win is not None and key.name == quit_key and quit_key not in key_list:
+                    win.close()
+                    core.quit()
+                if key.name in key_list:
+                    return key
+            core.wait(0.001, hogCPUperiod=0)
+
+    def stop(self):
+        self.started = False
+
+
+###################################
+# FUNCTIONS
+###################################
+_collector = None
+
+
+def get_collector():
+    """
+    the response collector shared by the whole session (created on first use, after the window exists)
+    """
+    global _collector
+    if _collector is None:
+        _collector = ResponseCollector()
+    return _collector
@@ -1,5 +1,5 @@
 import os
-from psychopy import visual, event, core
+from backend import visual, event, core
 import ctypes
 import helper_functions as hf
 
@@ -0,0 +1,314 @@
+"""
+generates the trial schedules that main.py reads (replaces final_trial_schedules/final_trial_schedules.ipynb and
+final_trial_schedules_without_reward_rate/remove_reward_rate_trials.ipynb)
+
+schedules A and B start from one selected trial list each (generate_trial_schedules/trial_schedule_1.csv and 13.csv).
+each action type gets two trial orders (order1, order2), shuffled with a fixed seed, with rating trials (one per
+high/low outcome x low/medium/high effort, plus the last trial) spaced 4 to 10 trials apart. the 8 block patterns
+(approach or avoid first, heart or reward first, normal or shifted first) give schedule_<A/B>_1 to 8, plus the testing
+schedule (first 3 trials of every block of schedule_B_8) and the training schedule (fixed trials).
+the schedules without reward rate drop the reward blocks, renumber trials and blocks, and keep one schedule of every
+set of identical ones (numbered 1 to 4; schedule_version still names the schedule it came from).
+
+the seeds are the ones the notebook used, and the 18 schedules with reward rate, schedule_A_1, B_1 and testing without
+reward rate and the training schedule come out the same as the committed files. 6 of the 10 committed files without
+reward rate differ (--compare lists them): A_2, A_3, B_2 and B_3 have the trials this generates under other
+schedule_version labels, and A_4 and B_4 are byte copies of the committed A_2 and B_2, so they differ in their trials
+too. the committed set main.py loads therefore has no avoid-first, shifted-first schedule (the generated A_4 and B_4):
+this condition is missing from the counterbalancing until the generated files are committed. main.py warns when a
+session uses a schedule with the same trials as another one, and schedule_validator.py reports the copies.
+    python schedule_generator.py --compare      # regenerate and compare with the schedule folders of the repository
+    python schedule_generator.py --out new      # write new/final_trial_schedules and new/final_trial_schedules_...
+    schedules = schedule_generator.generate()   # {folder: {file name: DataFrame}}
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import itertools
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+import schedule_store
+
+
+###################################
+# SETTINGS
+###################################
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SOURCES = dict(A='generate_trial_schedules/trial_schedule_1.csv', B='generate_trial_schedules/trial_schedule_13.csv')
+ORDER_SEEDS = dict(  # seed of every (action type, trial order) block, per schedule
+    A={('approach', 'order1'): 10, ('approach', 'order2'): 40, ('avoid', 'order1'): 50, ('avoid', 'order2'): 100},
+    B={('approach', 'order1'): 20, ('approach', 'order2'): 150, ('avoid', 'order1'): 160, ('avoid', 'order2'): 200},
+)
+BLOCK_PATTERNS = dict(  # every combination gives one schedule, in this order
+    action_type=[['approach'] * 4 + ['avoid'] * 4, ['avoid'] * 4 + ['approach'] * 4],
+    trial_order=[['order1', 'order2'] * 4],
+    attention_focus=[['heart', 'heart', 'reward', 'reward'] * 2, ['reward', 'reward', 'heart', 'heart'] * 2],
+    global_effort_state=[['normal', 'shifted'] * 4, ['shifted', 'normal'] * 4],
+)
+TESTING_TRIALS_PER_BLOCK = 3
+TRAINING = dict(
+    outcome_level=[40, 20, 100, 80, 40, 60, -20, -60, -40, -100, -80, -20],
+    actual_outcome=[42, 20, 116, 77, 40, 55, -14, -60, -42, -98, -85, -17],  # drawn once with sd 10 % of the level
+    effort=[50, 55, 80, 70, 50, 60, 90, 85, 75, 100, 95, 55],
+    action_type=['approach'] * 6 + ['avoid'] * 6,
+    rating=[False, False, True] * 4,
+    trial_in_block=[1, 2, 3] * 4,
+    trial_order=['training_trials'] * 12,
+    attention_focus=['heart'] * 3 + ['reward'] * 3 + ['heart'] * 3 + ['reward'] * 3,
+    global_effort_state=['normal'] * 12,
+    trial_in_experiment=list(range(1, 13)),
+    block_number=[1] * 3 + [2] * 3 + [3] * 3 + [4] * 3,
+    schedule_version=['training_schedule'] * 12,
+)
+TRAINING_WITHOUT_REWARD_RATE_RATING = [False, True, False] * 2  # the rating comes after the second training trial
+FOLDERS = ('final_trial_schedules', 'final_trial_schedules_without_reward_rate')
+_rng = np.random.RandomState()  # re-seeded for every draw (much faster than a new RandomState, same numbers)
+
+
+###################################
+# FUNCTIONS
+###################################
+def load_source(name):
+    """
+    the selected trials of schedule name (outcome_level, actual_outcome, effort, action_type)
+    """
+    return pd.read_csv(os.path.join(REPOSITORY, SOURCES[name])).iloc[:, 1:-2]
+
+
+def rating_trials(outcome, effort, seed):
+    """
+    positions of the rating trials of a block (absolute outcome levels and efforts of its trials): one random trial
+    per high/low outcome x low/medium/high effort category (if there is one), then the last trial
+    """
+    ratings = []
+    for outcome_category in (outcome > 60, outcome < 60):
+        for effort_category in (effort < 70, (effort > 65) & (effort < 85), effort > 80):
+            candidates = np.flatnonzero(outcome_category & effort_category)
+            if len(candidates):
+                # what DataFrame.sample(n=1, random_state=seed) picks
+                _rng.seed(seed)
+                ratings.append(candidates[_rng.permutation(len(candidates))[0]])
+    ratings.append(len(outcome) - 1)
+    return ratings
+
+
+def draw_spacings(rng, n_ratings, n_others):
+    """
+    the spacings (4 to 10 trials) drawn by the notebook's placement loop: one per pass, and it makes passes until all
+    rating trials are placed and all other trials are used up
+    """
+    spacings = rng.randint(4, 11, size=max(n_ratings, -(-n_others // 10)))  # the fewest passes it can make
+    while spacings.sum() < n_others:
+        spacings = np.append(spacings, rng.randint(4, 11))
+    return spacings
+
+
+def trial_order(outcome, effort, seed):
+    """
+    shuffle the trials of a block and place its rating trials 4 to 10 trials apart, with a rating trial at the end.
+    returns the positions of the trials in their new order, and which of them are rating trials
+    """
+    shuffle = random.Random(seed).shuffle
+    ratings = rating_trials(outcome, effort, seed)
+    others = np.flatnonzero(~np.isin(np.arange(len(outcome)), ratings)).tolist()
+    shuffle(others)
+    shuffle(ratings)
+    last_rating = ratings.pop()
+    _rng.seed(seed)
+    spacings = draw_spacings(_rng, len(ratings), len(others))
+    # rating trial i comes after the first spacings[0] + ... + spacings[i] other trials
+    positions = np.minimum(np.cumsum(spacings)[:len(ratings)], len(others))
+    order = np.append(np.insert(np.array(others, dtype=int), positions, ratings), last_rating)
+    return order, np.isin(order, ratings + [last_rating])
+
+
+def order_block(block, seed):
+    """
+    a block in the trial order of seed, with rating and trial_in_block columns
+    """
+    order, rating = trial_order(block['outcome_level'].abs().to_numpy(), block['effort'].to_numpy(), seed)
+    ordered = block.iloc[order].reset_index(drop=True)
+    ordered['rating'] = rating
+    ordered['trial_in_block'] = np.arange(1, len(ordered) + 1)
+    return ordered
+
+
+def block_patterns():
+    """
+    the block patterns of the 8 schedules (dicts of column -> value per block), in schedule order
+    """
+    columns = list(BLOCK_PATTERNS)
+    return [dict(zip(columns, values)) for values in itertools.product(*BLOCK_PATTERNS.values())]
+
+
+def assemble(orders, pattern, version):
+    """
+    a schedule: the ordered block of every (action type, trial order) in the pattern, one after the other
+    """
+    blocks = [orders[(action_type, trial_order)]
+              for action_type, trial_order in zip(pattern['action_type'], pattern['trial_order'])]
+    sizes = [len(block) for block in blocks]
+    schedule = pd.concat(blocks, ignore_index=True)
+    for column in ('trial_order', 'attention_focus', 'global_effort_state'):
+        schedule[column] = np.repeat(pattern[column], sizes)
+    schedule['trial_in_experiment'] = np.arange(1, len(schedule) + 1)
+    schedule['block_number'] = np.repeat(np.arange(1, len(blocks) + 1), sizes)
+    schedule['schedule_version'] = version
+    return schedule
+
+
+def main_schedules(name, seeds=None):
+    """
+    schedule_<name>_1 to 8 as {version: DataFrame}
+    """
+    seeds = ORDER_SEEDS[name] if seeds is None else seeds
+    source = load_source(name)
+    orders = {(action_type, trial_order): order_block(source[source['action_type'] == action_type], seed)
+              for (action_type, trial_order), seed in seeds.items()}
+    schedules = {}
+    for pattern in block_patterns():
+        version = f'schedule_{name}_{len(schedules) + 1}'
+        schedules[version] = assemble(orders, pattern, version)
+    return schedules
+
+
+def testing_schedule(schedule):
+    """
+    the first trials of every block of a schedule
+    """
+    testing = schedule.groupby('block_number').head(TESTING_TRIALS_PER_BLOCK).reset_index(drop=True)
+    testing['trial_in_experiment'] = np.arange(1, len(testing) + 1)
+    testing['schedule_version'] = 'testing_schedule'
+    return testing
+
+
+def training_schedule():
+    return pd.DataFrame(TRAINING)
+
+
+def remove_reward_rate(schedule):
+    """
+    a schedule without its reward rate blocks, with trials and blocks renumbered
+    """
+    schedule = schedule[schedule['attention_focus'] != 'reward'].reset_index(drop=True)
+    schedule['trial_in_experiment'] = np.arange(1, len(schedule) + 1)
+    schedule['block_number'] = pd.factorize(schedule['block_number'])[0] + 1
+    return schedule
+
+
+def deduplicate(schedules):
+    """
+    the schedules (a list) without the ones whose trials are identical to an earlier one (same content hash as in the
+    schedule store, see schedule_store.py)
+    """
+    hashes = pd.Series([schedule_store.frame_hash(schedule) for schedule in schedules])
+    return [schedules[i] for i in np.flatnonzero(~hashes.duplicated().to_numpy())]
+
+
+def generate():
+    """
+    all schedules, as {folder: {file name: DataFrame}}
+    """
+    full, without_reward_rate = {}, {}
+    for name in ORDER_SEEDS:
+        schedules = main_schedules(name)
+        full.update({f'{version}.csv': schedule for version, schedule in schedules.items()})
+        unique = deduplicate([remove_reward_rate(schedule) for schedule in schedules.values()])
+        without_reward_rate.update({f'schedule_{name}_{n + 1}.csv': schedule for n, schedule in enumerate(unique)})
+    full['schedule_testing.csv'] = testing_schedule(full[f'schedule_{list(ORDER_SEEDS)[-1]}_8.csv'])
+    full['schedule_training.csv'] = training_schedule()
+    without_reward_rate['schedule_testing.csv'] = remove_reward_rate(full['schedule_testing.csv'])
+    without_reward_rate['schedule_training.csv'] = remove_reward_rate(full['schedule_training.csv'])
+    without_reward_rate['schedule_training.csv']['rating'] = TRAINING_WITHOUT_REWARD_RATE_RATING
+    return {FOLDERS[0]: full, FOLDERS[1]: without_reward_rate}
+
+
+def provenance(schedules):
+    """
+    how every generated schedule was made, as {key: (DataFrame, dict(seed, parent, transform))} with the keys of the
+    schedule store (folder/file name without .csv)
+    """
+    full = FOLDERS[0]
+    version_files = {'testing_schedule': 'schedule_testing', 'training_schedule': 'schedule_training'}
+    result = {}
+    for file_name, schedule in schedules[full].items():
+        name = file_name[:-4]
+        if name == 'schedule_testing':
+            made = dict(seed='', parent=f'{full}/schedule_{list(ORDER_SEEDS)[-1]}_8', transform='testing_subset')
+        elif name == 'schedule_training':
+            made = dict(seed='', parent='', transform='fixed')
+        else:
+            schedule_name = name.split('_')[1]
+            seeds = '/'.join(f'{action_type}_{trial_order}={seed}'
+                             for (action_type, trial_order), seed in ORDER_SEEDS[schedule_name].items())
+            made = dict(seed=seeds, parent=SOURCES[schedule_name], transform='order_blocks')
+        result[f'{full}/{name}'] = (schedule, made)
+    for file_name, schedule in schedules[FOLDERS[1]].items():
+        version = schedule['schedule_version'].iloc[0]
+        parent = f'{full}/{version_files.get(version, version)}'
+        made = dict(seed=result[parent][1]['seed'], parent=parent, transform='remove_reward_rate')
+        result[f'{FOLDERS[1]}/{file_name[:-4]}'] = (schedule, made)
+    return result
+
+
+def write(schedules, root):
+    for folder, files in schedules.items():
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        for file_name, schedule in files.items():
+            schedule.to_csv(os.path.join(root, folder, file_name), index=False)
+
+
+def compare(schedules, root=REPOSITORY):
+    """
+    compare the schedules with the files in root. returns {folder/file name: 'identical', 'missing' or a description
+    of the difference}
+    """
+    report = {}
+    for folder, files in schedules.items():
+        for file_name, schedule in files.items():
+            path = os.path.join(root, folder, file_name)
+            key = f'{folder}/{file_name}'
+            if not os.path.exists(path):
+                report[key] = 'missing'
+                continue
+            existing = pd.read_csv(path, dtype=str)
+            generated = schedule.astype(str)
+            if list(existing.columns) != list(generated.columns) or len(existing) != len(generated):
+                report[key] = f'different shape {existing.shape}, generated {generated.shape}'
+                continue
+            # compare as text (True/TRUE are the same)
+            differs = (existing.apply(lambda column: column.str.lower()).to_numpy()
+                       != generated.apply(lambda column: column.str.lower()).to_numpy())
+            if not differs.any():
+                report[key] = 'identical'
+            else:
+                rows, columns = np.nonzero(differs)
+                report[key] = (f'{len(np.unique(rows))} rows differ (columns '
+                               f'{", ".join(existing.columns[np.unique(columns)])})')
+    return report
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='generate the trial schedules')
+    parser.add_argument('--out', help='folder to write final_trial_schedules(_without_reward_rate) to')
+    parser.add_argument('--compare', nargs='?', const=REPOSITORY,
+                        help='compare with the schedule folders in this folder (default: the repository)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    all_schedules = generate()
+    print(f'generated {sum(len(files) for files in all_schedules.values())} schedules in '
+          f'{time.perf_counter() - start:.3f} s')
+    if args.out:
+        write(all_schedules, args.out)
+        print(f'written to {args.out}')
+    if args.compare:
+        for file_name, result in compare(all_schedules, args.compare).items():
+            print(f'{file_name:60s} {result}')
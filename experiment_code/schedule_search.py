@@ -0,0 +1,217 @@
+"""
+search for the seeds of the block trial orders in schedule_generator.ORDER_SEEDS (they were picked by hand, one
+rolling-correlation plot per seed, in final_trial_schedules.ipynb)
+every seed gives one candidate order of a block (schedule_generator.trial_order). the candidates of a chunk of seeds
+are scored together as (candidates x trials) arrays: rolling correlation between normalised outcome and effort
+(windowed sums from cumulative sums), lag-1 autocorrelation of effort and outcome, the longest run of high-effort
+trials and the smallest distance between rating trials. chunks run on a process pool.
+    python schedule_search.py --schedule A --action-type approach --candidates 20000 --jobs 4
+    python schedule_search.py --schedule A --action-type approach --scaling 1 2 4     # seconds per number of processes
+the objective is a weighted sum of the scores (lower is better, e.g. --objective max_abs_rolling_corr=1 \
+effort_autocorrelation=0.5); candidates whose rating trials are closer than --min-rating-gap are left out.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import schedule_generator
+
+
+###################################
+# SETTINGS
+###################################
+DEFAULT_OBJECTIVE = dict(max_abs_rolling_corr=1.0, mean_abs_rolling_corr=1.0)
+HIGH_EFFORT = 80  # efforts above this count as high effort (as in the rating categories)
+
+
+###################################
+# FUNCTIONS
+###################################
+def block_arrays(name, action_type):
+    """
+    absolute outcome levels and efforts of the trials of one block type of schedule name
+    """
+    source = schedule_generator.load_source(name)
+    block = source[source['action_type'] == action_type]
+    return block['outcome_level'].abs().to_numpy(), block['effort'].to_numpy()
+
+
+def candidate_orders(outcome, effort, seeds):
+    """
+    the trial order of every seed as a (candidates x trials) array of trial positions, and the rating trials as a
+    boolean array of the same shape
+    """
+    orders = np.zeros((len(seeds), len(outcome)), dtype=int)
+    ratings = np.zeros((len(seeds), len(outcome)), dtype=bool)
+    for row, seed in enumerate(seeds):
+        orders[row], ratings[row] = schedule_generator.trial_order(outcome, effort, int(seed))
+    return orders, ratings
+
+
+def normalize(values):
+    return (values - values.min()) / (values.max() - values.min())
+
+
+def windowed_sums(values, window):
+    """
+    sums over every window of consecutive trials, per row
+    """
+    sums = np.cumsum(np.pad(values, ((0, 0), (1, 0))), axis=1)
+    return sums[:, window:] - sums[:, :-window]
+
+
+def rolling_correlation(x, y, window):
+    """
+    pearson correlation of x and y in every window of consecutive trials, per row (like pandas rolling().corr());
+    nan where one of them is constant
+    """
+    sx, sy = windowed_sums(x, window), windowed_sums(y, window)
+    sxx, syy, sxy = windowed_sums(x * x, window), windowed_sums(y * y, window), windowed_sums(x * y, window)
+    covariance = window * sxy - sx * sy
+    variance = (window * sxx - sx ** 2) * (window * syy - sy ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(variance > 1e-12, covariance / np.sqrt(np.maximum(variance, 1e-12)), np.nan)
+
+
+def lag1_autocorrelation(x):
+    a, b = x[:, :-1] - x[:, :-1].mean(axis=1, keepdims=True), x[:, 1:] - x[:, 1:].mean(axis=1, keepdims=True)
+    return (a * b).sum(axis=1) / np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+
+
+def longest_run(mask):
+    """
+    length of the longest run of True per row
+    """
+    counts = np.cumsum(mask, axis=1)
+    last_reset = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return (counts - last_reset).max(axis=1)
+
+
+def min_gap(mask):
+    """
+    smallest distance between two True positions per row (the number of trials if there are fewer than 2)
+    """
+    n = mask.shape[1]
+    positions = np.sort(np.where(mask, np.arange(n), 2 * n), axis=1)
+    gaps = np.diff(positions, axis=1)
+    gaps = np.where(positions[:, 1:] < n, gaps, n)
+    return gaps.min(axis=1)
+
+
+def score(outcome, effort, orders, ratings, window=5):
+    """
+    scores of every candidate order (lower is better), as {score name: array over candidates}
+    """
+    x = normalize(outcome.astype(float))[orders]
+    y = normalize(effort.astype(float))[orders]
+    rolling = np.abs(rolling_correlation(x, y, window))
+    return dict(
+        max_abs_rolling_corr=np.nanmax(np.nan_to_num(rolling, nan=0.0), axis=1),
+        mean_abs_rolling_corr=np.nanmean(rolling, axis=1),
+        effort_autocorrelation=np.abs(lag1_autocorrelation(y)),
+        outcome_autocorrelation=np.abs(lag1_autocorrelation(x)),
+        longest_high_effort_run=longest_run(effort[orders] > HIGH_EFFORT).astype(float),
+        min_rating_gap=min_gap(ratings).astype(float),
+    )
+
+
+def _search_chunk(args):
+    """
+    score the candidates of one chunk of seeds (runs in a worker process)
+    """
+    outcome, effort, seeds, window = args
+    orders, ratings = candidate_orders(outcome, effort, seeds)
+    return seeds, score(outcome, effort, orders, ratings, window)
+
+
+def search(name, action_type, n_candidates, first_seed=0, jobs=None, window=5, objective=None, min_rating_gap=3,
+           top=10, chunk_size=500):
+    """
+    score the orders of seeds first_seed to first_seed + n_candidates of one block type on jobs processes.
+    returns the top candidates (a DataFrame with seed, objective and scores) and the seconds it took
+    """
+    objective = DEFAULT_OBJECTIVE if objective is None else objective
+    outcome, effort = block_arrays(name, action_type)
+    seeds = np.arange(first_seed, first_seed + n_candidates)
+    chunks = [(outcome, effort, seeds[start:start + chunk_size], window) for start in range(0, len(seeds), chunk_size)]
+    start = time.perf_counter()
+    if jobs == 1:
+        results = [_search_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_search_chunk, chunks))
+    seconds = time.perf_counter() - start
+    scores = pd.DataFrame({'seed': np.concatenate([seeds for seeds, _ in results])})
+    for score_name in results[0][1]:
+        scores[score_name] = np.concatenate([chunk_scores[score_name] for _, chunk_scores in results])
+    scores.insert(1, 'objective', sum(weight * scores[score_name] for score_name, weight in objective.items()))
+    scores = scores[scores['min_rating_gap'] >= min_rating_gap]
+    return scores.nsmallest(top, 'objective').reset_index(drop=True), seconds
+
+
+def score_seeds(name, action_type, seeds, window=5, objective=None):
+    """
+    scores of particular seeds (e.g. the ones in schedule_generator.ORDER_SEEDS)
+    """
+    objective = DEFAULT_OBJECTIVE if objective is None else objective
+    outcome, effort = block_arrays(name, action_type)
+    seeds = np.asarray(seeds)
+    _, seed_scores = _search_chunk((outcome, effort, seeds, window))
+    scores = pd.DataFrame(dict(seed=seeds, **seed_scores))
+    scores.insert(1, 'objective', sum(weight * scores[score_name] for score_name, weight in objective.items()))
+    return scores
+
+
+def scaling(name, action_type, n_candidates, job_counts, **search_args):
+    """
+    seconds and candidates per second of the same search on different numbers of processes
+    """
+    rows = []
+    for jobs in job_counts:
+        _, seconds = search(name, action_type, n_candidates, jobs=jobs, **search_args)
+        rows.append(dict(jobs=jobs, seconds=seconds, candidates_per_second=n_candidates / seconds))
+    rows = pd.DataFrame(rows)
+    rows['speedup'] = rows['seconds'].iloc[0] / rows['seconds']
+    return rows
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='search for block trial orders with little effort/outcome correlation')
+    parser.add_argument('--schedule', default='A', choices=list(schedule_generator.ORDER_SEEDS))
+    parser.add_argument('--action-type', default='approach', choices=['approach', 'avoid'])
+    parser.add_argument('--candidates', type=int, default=10000)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--window', type=int, default=5, help='trials per rolling correlation window')
+    parser.add_argument('--objective', nargs='+', default=[f'{k}={v}' for k, v in DEFAULT_OBJECTIVE.items()],
+                        help='score=weight pairs')
+    parser.add_argument('--min-rating-gap', type=int, default=3, help='fewest trials from one rating trial to the next')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--scaling', type=int, nargs='+', help='numbers of processes to time the search with')
+    args = parser.parse_args()
+    weights = {pair.split('=')[0]: float(pair.split('=')[1]) for pair in args.objective}
+    search_args = dict(first_seed=args.first_seed, window=args.window, objective=weights,
+                       min_rating_gap=args.min_rating_gap)
+
+    if args.scaling:
+        print(scaling(args.schedule, args.action_type, args.candidates, args.scaling, **search_args).to_string(index=False))
+    else:
+        best, seconds = search(args.schedule, args.action_type, args.candidates, jobs=args.jobs, top=args.top,
+                               **search_args)
+        print(f'{args.candidates} candidates in {seconds:.2f} s on {args.jobs} processes '
+              f'({args.candidates / seconds:.0f} per second)')
+        print(best.to_string(index=False, float_format='%.3f'))
+        current = [seed for (action_type, _), seed in schedule_generator.ORDER_SEEDS[args.schedule].items()
+                   if action_type == args.action_type]
+        print('seeds in schedule_generator.ORDER_SEEDS:')
+        print(score_seeds(args.schedule, args.action_type, current, args.window, weights).to_string(
+            index=False, float_format='%.3f'))
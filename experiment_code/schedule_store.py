@@ -0,0 +1,242 @@
+"""
+content-addressed store of the trial schedules, so every session records the exact schedule it ran (not just its key,
+e.g. B_2, whose file can change) and duplicate schedules are found without comparing files
+    schedule_store/objects/<hash>.csv    one copy of every distinct schedule, named by its content hash
+    schedule_store/index.csv             one line per stored schedule: key, hash, seed, parent, transform, added
+    schedule_store/sessions.csv          one line per session: hash, key, session, participant, date
+the hash is the sha256 of the schedule's csv text without the schedule_version column (it names where a schedule came
+from, not what is in it), with the rating column lowercased (True/TRUE are the same) and every other value as written.
+the key is the schedule folder and file name, e.g. final_trial_schedules_without_reward_rate/schedule_B_2. seed, parent
+and transform record how a generated schedule was made (see schedule_generator.provenance). both index files are only
+appended to and are read into dictionaries once, so lookups do not open any schedule:
+    store = schedule_store.ScheduleStore()
+    schedule_hash = store.add_file('../final_trial_schedules_without_reward_rate/schedule_B_2.csv')
+    store.record_session(schedule_hash, 'data/7_1_2025-01-22_14h20.17.139', participant='7')
+    store.sessions_using(schedule_hash)    # every session that ran exactly this schedule
+    store.entries_of(schedule_hash)        # every key (and its provenance) with this content
+    store.duplicates()                     # {hash: keys} of schedules stored under more than one key
+from the command line:
+    python schedule_store.py import ../final_trial_schedules_without_reward_rate
+    python schedule_store.py generate         # store the output of schedule_generator.py with its provenance
+    python schedule_store.py duplicates
+    python schedule_store.py sessions final_trial_schedules_without_reward_rate/schedule_B_2    # or a (short) hash
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import csv
+import hashlib
+import io
+import os
+from datetime import datetime
+
+
+###################################
+# SETTINGS
+###################################
+FOLDER = 'schedule_store'
+INDEX_FIELDS = ['key', 'hash', 'seed', 'parent', 'transform', 'added']
+SESSION_FIELDS = ['hash', 'key', 'session', 'participant', 'date']
+IGNORED_COLUMNS = ('schedule_version',)
+BOOLEAN_COLUMNS = ('rating',)  # written as True or TRUE, depending on what saved the file
+
+
+###################################
+# FUNCTIONS
+###################################
+def text_hash(text):
+    """
+    content hash of a schedule's csv text
+    """
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    keep = [i for i, column in enumerate(rows[0]) if column not in IGNORED_COLUMNS]
+    booleans = {i for i, column in enumerate(rows[0]) if column in BOOLEAN_COLUMNS}
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(('\x1f'.join(row[i].strip().lower() if i in booleans else row[i] for i in keep) + '\n')
+                      .encode())
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    with open(path, 'r', newline='') as csvfile:
+        return text_hash(csvfile.read())
+
+
+def frame_hash(schedule):
+    """
+    content hash of a schedule DataFrame (the same as the hash of the csv file it is saved as)
+    """
+    return text_hash(schedule.to_csv(index=False))
+
+
+def schedule_key(path):
+    """
+    the key of a schedule file: its folder and file name without .csv
+    """
+    path = os.path.abspath(path)
+    return f'{os.path.basename(os.path.dirname(path))}/{os.path.splitext(os.path.basename(path))[0]}'
+
+
+def _append(path, fields, row):
+    """
+    append one line to an index file (with a header if the file is new)
+    """
+    new = not os.path.exists(path)
+    with open(path, 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fields, extrasaction='ignore')
+        if new:
+            writer.writeheader()
+        writer.writerow(row)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+###################################
+# CLASSES
+###################################
+class ScheduleStore:
+    def __init__(self, folder=FOLDER):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.csv')
+        self.sessions_path = os.path.join(folder, 'sessions.csv')
+        self.by_key = {}  # newest entry of every key
+        self.by_hash = {}  # all entries of every hash, oldest first
+        for entry in _read(self.index_path):
+            self._index(entry)
+        self._sessions = None  # sessions by hash, read on the first query
+
+    def _index(self, entry):
+        self.by_key[entry['key']] = entry
+        self.by_hash.setdefault(entry['hash'], []).append(entry)
+
+    def object_path(self, schedule_hash):
+        return os.path.join(self.folder, 'objects', schedule_hash + '.csv')
+
+    def add_text(self, text, key, seed='', parent='', transform=''):
+        """
+        store a schedule (csv text) under key and return its hash. the content is only saved if no schedule with
+        the same hash is stored yet, and the index only gets a line if key does not already point to it
+        """
+        schedule_hash = text_hash(text)
+        if schedule_hash not in self.by_hash:
+            path = self.object_path(schedule_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', newline='') as csvfile:
+                csvfile.write(text)
+            os.replace(path + '.tmp', path)
+        entry = dict(key=key, hash=schedule_hash, seed=seed, parent=parent, transform=transform)
+        current = self.by_key.get(key)
+        if current is not None and all(current[field] == str(value) for field, value in entry.items()):
+            return schedule_hash
+        entry['added'] = datetime.now().isoformat(timespec='seconds')
+        _append(self.index_path, INDEX_FIELDS, entry)
+        self._index(entry)
+        return schedule_hash
+
+    def add_file(self, path, key=None, **provenance):
+        """
+        store the schedule file path (under its folder and file name if key is None) and return its hash
+        """
+        with open(path, 'r', newline='') as csvfile:
+            return self.add_text(csvfile.read(), schedule_key(path) if key is None else key, **provenance)
+
+    def add_frame(self, schedule, key, **provenance):
+        return self.add_text(schedule.to_csv(index=False), key, **provenance)
+
+    def lookup(self, key):
+        """
+        the newest index entry of key, or None
+        """
+        return self.by_key.get(key)
+
+    def entries_of(self, schedule_hash):
+        """
+        all index entries with the content schedule_hash
+        """
+        return self.by_hash.get(schedule_hash, [])
+
+    def resolve(self, key_or_hash):
+        """
+        the hash of a key, a hash or the start of a hash (None if there is no match or more than one)
+        """
+        if key_or_hash in self.by_key:
+            return self.by_key[key_or_hash]['hash']
+        matches = [schedule_hash for schedule_hash in self.by_hash if schedule_hash.startswith(key_or_hash)]
+        return matches[0] if len(matches) == 1 else None
+
+    def duplicates(self):
+        """
+        {hash: keys} of the contents stored under more than one key
+        """
+        keys = {schedule_hash: sorted({entry['key'] for entry in entries})
+                for schedule_hash, entries in self.by_hash.items()}
+        return {schedule_hash: names for schedule_hash, names in keys.items() if len(names) > 1}
+
+    def record_session(self, schedule_hash, session, participant='', key=''):
+        """
+        note that session (the session's file name without .csv) ran the schedule schedule_hash
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        entry = dict(hash=schedule_hash, key=key, session=session, participant=participant,
+                     date=datetime.now().isoformat(timespec='seconds'))
+        _append(self.sessions_path, SESSION_FIELDS, entry)
+        if self._sessions is not None:
+            self._sessions.setdefault(schedule_hash, []).append(entry)
+
+    def sessions_using(self, schedule_hash):
+        """
+        the session entries of every session that ran the schedule schedule_hash
+        """
+        if self._sessions is None:
+            self._sessions = {}
+            for entry in _read(self.sessions_path):
+                self._sessions.setdefault(entry['hash'], []).append(entry)
+        return self._sessions.get(schedule_hash, [])
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='content-addressed store of the trial schedules')
+    parser.add_argument('--folder', default=FOLDER)
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='store every schedule file of the given folders')
+    import_parser.add_argument('folders', nargs='+')
+    commands.add_parser('generate', help='store the output of schedule_generator.py with its provenance')
+    commands.add_parser('duplicates', help='list the contents stored under more than one key')
+    sessions_parser = commands.add_parser('sessions', help='list the sessions that ran a schedule')
+    sessions_parser.add_argument('schedule', help='a key, hash or start of a hash')
+    args = parser.parse_args()
+    store = ScheduleStore(args.folder)
+
+    if args.command == 'import':
+        for folder in args.folders:
+            for name in sorted(os.listdir(folder)):
+                if name.endswith('.csv'):
+                    path = os.path.join(folder, name)
+                    print(f'{store.add_file(path)[:12]}  {schedule_key(path)}')
+    elif args.command == 'generate':
+        import schedule_generator
+        schedules = schedule_generator.generate()
+        for key, (schedule, provenance) in schedule_generator.provenance(schedules).items():
+            print(f"{store.add_frame(schedule, 'generated/' + key, **provenance)[:12]}  generated/{key}")
+    elif args.command == 'duplicates':
+        for schedule_hash, keys in store.duplicates().items():
+            print(f"{schedule_hash[:12]}  {', '.join(keys)}")
+    elif args.command == 'sessions':
+        schedule_hash = store.resolve(args.schedule)
+        if schedule_hash is None:
+            parser.exit(1, f'no stored schedule matches {args.schedule}\n')
+        for entry in store.sessions_using(schedule_hash):
+            print(f"{entry['date']}  {entry['participant']:>6s}  {entry['session']}")
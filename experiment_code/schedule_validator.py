@@ -0,0 +1,258 @@
+"""
+checks the trial schedule csv files before they are used: main.py checks its schedule at startup, and
+    python schedule_validator.py                 # every schedule in final_trial_schedules(_without_reward_rate)
+    python schedule_validator.py ../new/*.csv --json report.json
+checks any number of files (the exit status is 1 if one of them fails). all files are loaded into one table with a
+file column and fixed column types, and every check is one vectorized (grouped) operation over the whole table, so
+checking all schedule folders takes about as long as loading them.
+checks of every schedule:
+    columns, types           all columns of a schedule are there, numbers are numbers, categories have known values
+    trial_in_experiment      1, 2, 3, ... in every file
+    block_number             starts at 1 and goes up by 1 from one block to the next
+    trial_in_block           1, 2, 3, ... in every block
+    block_constant           action type, attention focus, effort state and trial order do not change within a block
+    outcome_sign             approach outcomes are gains, avoid outcomes losses (offered and actual)
+    effort_range             efforts are between 0 and 100 %
+checks of the main schedules (schedule_A/B_*, not testing and training):
+    rating_placement         the last trial of every block is a rating trial, every block has the same number of rating
+                             trials (blocks with another number than most blocks of the file are reported), and they
+                             are 4 to 11 trials apart
+    outcome_coverage         every block has every outcome level of its schedule
+    effort_coverage          every block has low, medium and high efforts (the categories of the rating trials)
+    same_trials              the blocks of an action type have the same outcome x effort trials (in another order)
+    action_balance           as many approach as avoid blocks, each action type in one run of blocks
+    effort_state_pattern     normal and shifted blocks alternate
+    trial_order_pattern      order1 and order2 blocks alternate
+    attention_balance        every attention focus of the schedule has the same number of blocks of each action type
+    distinct_schedule        the schedule is not a copy of one checked before it from the same folder (all columns but
+                             schedule_version; the committed schedule_A_4 and B_4 without reward rate are copies of
+                             A_2 and B_2, see schedule_generator.py)
+validate() returns a report that can be saved as json:
+    report = schedule_validator.validate(['../final_trial_schedules_without_reward_rate/schedule_A_1.csv'])
+    report['passed'], report['files'][path]['checks']['rating_placement']    # {passed, violations, examples}
+    schedule_validator.failures(report)    # one line per failed check
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+
+###################################
+# SETTINGS
+###################################
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FOLDERS = ('final_trial_schedules', 'final_trial_schedules_without_reward_rate')
+NUMBER_COLUMNS = ['outcome_level', 'actual_outcome', 'effort', 'trial_in_block', 'trial_in_experiment', 'block_number']
+CATEGORIES = dict(action_type=['approach', 'avoid'], attention_focus=['heart', 'reward'],
+                  global_effort_state=['normal', 'shifted'])
+COLUMNS = NUMBER_COLUMNS + list(CATEGORIES) + ['rating', 'trial_order']
+BLOCK_COLUMNS = list(CATEGORIES) + ['trial_order']
+MIN_RATING_GAP = 4
+MAX_RATING_GAP = 11
+EFFORT_CATEGORIES = dict(low=(0, 70), medium=(65, 85), high=(80, 101))  # open intervals, as in schedule_generator
+MAIN_CHECKS = ['rating_placement', 'outcome_coverage', 'effort_coverage', 'same_trials', 'action_balance',
+               'effort_state_pattern', 'trial_order_pattern', 'attention_balance', 'distinct_schedule']
+CHECKS = ['columns', 'types', 'trial_in_experiment', 'block_number', 'trial_in_block', 'block_constant',
+          'outcome_sign', 'effort_range'] + MAIN_CHECKS
+MAX_EXAMPLES = 5
+
+
+###################################
+# FUNCTIONS
+###################################
+def schedule_kind(path):
+    name = os.path.basename(path)
+    return 'training' if 'training' in name else 'testing' if 'testing' in name else 'main'
+
+
+def load(paths):
+    """
+    the schedules as one table with file and kind columns (numbers as floats, nan where they are not numbers;
+    categories as pandas categoricals, nan where a value is unknown), and the missing columns of every file
+    """
+    frames, missing = [], {}
+    for path in paths:
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        missing[path] = [column for column in COLUMNS if column not in frame.columns]
+        if not missing[path]:
+            frames.append(frame[COLUMNS].assign(file=path))
+    if not frames:
+        return pd.DataFrame(columns=['file', 'kind'] + COLUMNS), missing
+    table = pd.concat(frames, ignore_index=True)
+    table['file'] = pd.Categorical(table['file'], categories=list(paths))
+    table['kind'] = table['file'].map(schedule_kind).astype(str)
+    for column in NUMBER_COLUMNS:
+        table[column] = pd.to_numeric(table[column], errors='coerce')
+    for column, values in CATEGORIES.items():
+        table[column] = pd.Categorical(table[column].where(table[column].isin(values)), categories=values)
+    table['rating'] = table['rating'].str.lower().map({'true': True, 'false': False})
+    return table, missing
+
+
+def _examples(frame, mask, label, column):
+    """
+    (file, check example) pairs of the rows of frame where mask is True
+    """
+    return pd.DataFrame(dict(file=frame.loc[mask, 'file'].astype(str),
+                             where=label + ' ' + frame.loc[mask, column].astype('Int64').astype(str)))
+
+
+def validate(paths):
+    """
+    check the schedule files in paths, returns the report (a dict)
+    """
+    paths = list(paths)
+    table, missing = load(paths)
+    violations = {}  # check name: DataFrame of (file, where)
+
+    def add(check, frame, mask, label='trial', column='trial_in_experiment'):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            violations[check] = pd.concat([violations.get(check), _examples(frame, mask, label, column)])
+
+    # rows
+    table['row'] = table.groupby('file', observed=True).cumcount() + 1
+    table['outcome'] = table['outcome_level'].abs()
+    for category, (low, high) in EFFORT_CATEGORIES.items():
+        table['effort_' + category] = (table['effort'] > low) & (table['effort'] < high)
+    # the sum of the hashes of the (outcome, effort) pairs of a block does not depend on their order
+    table['pair_hash'] = (pd.util.hash_pandas_object(table[['outcome', 'effort']], index=False).to_numpy()
+                          % np.uint64(2 ** 40)).astype(np.int64)
+    by_file = table.groupby('file', observed=True)
+    by_block = table.groupby(['file', 'block_number'], observed=True, sort=False)
+    add('types', table, table[NUMBER_COLUMNS + list(CATEGORIES) + ['rating']].isna().any(axis=1), 'row', 'row')
+    add('trial_in_experiment', table, table['trial_in_experiment'] != table['row'], 'row', 'row')
+    first = table['row'] == 1
+    step = by_file['block_number'].diff()
+    add('block_number', table, (first & (table['block_number'] != 1)) | (~first & ~step.isin([0, 1])))
+    add('trial_in_block', table, table['trial_in_block'] != by_block.cumcount() + 1)
+    sign = np.where(table['action_type'] == 'approach', 1, -1)
+    add('outcome_sign', table, (table['outcome_level'] * sign <= 0) | (table['actual_outcome'] * sign <= 0))
+    add('effort_range', table, ~table['effort'].between(0, 100, inclusive='right'))
+
+    # blocks
+    blocks = by_block.agg(
+        kind=('kind', 'first'),
+        **{f'{column}_values': (column, 'nunique') for column in BLOCK_COLUMNS},
+        **{column: (column, 'first') for column in BLOCK_COLUMNS},
+        ratings=('rating', 'sum'),
+        last_rating=('rating', 'last'),
+        outcome_levels=('outcome', 'nunique'),
+        **{f'effort_{category}': (f'effort_{category}', 'any') for category in EFFORT_CATEGORIES},
+        trials=('pair_hash', 'sum'),
+    ).reset_index()
+    add('block_constant', blocks, blocks[[f'{column}_values' for column in BLOCK_COLUMNS]].gt(1).any(axis=1),
+        'block', 'block_number')
+
+    # main schedules
+    main = blocks['kind'] == 'main'
+    file_outcome_levels = blocks['file'].map(by_file['outcome'].nunique()).astype(int)
+    ratings = table[table['rating'] == True]  # noqa: E712 (nan for unknown values)
+    gaps = ratings.groupby(['file', 'block_number'], observed=True)['trial_in_block'].diff()
+    bad_gap = (gaps < MIN_RATING_GAP) | (gaps > MAX_RATING_GAP)
+    add('rating_placement', ratings, bad_gap & (ratings['kind'] == 'main'))
+    # the blocks whose number of ratings is not the most common one in their file
+    rating_counts = blocks.groupby(['file', 'ratings'], observed=True).size().reset_index(name='blocks')
+    usual_ratings = rating_counts.sort_values(['blocks', 'ratings']).drop_duplicates('file', keep='last') \
+        .set_index('file')['ratings']
+    odd_ratings = blocks['ratings'].to_numpy() != blocks['file'].astype(str).map(usual_ratings.rename(str)).to_numpy()
+    add('rating_placement', blocks, main & ((blocks['last_rating'] != True) | odd_ratings),  # noqa: E712
+        'block', 'block_number')
+    add('outcome_coverage', blocks, main & (blocks['outcome_levels'] != file_outcome_levels), 'block', 'block_number')
+    add('effort_coverage', blocks, main & ~blocks[[f'effort_{category}' for category in EFFORT_CATEGORIES]].all(axis=1),
+        'block', 'block_number')
+    same = blocks.groupby(['file', 'action_type'], observed=True)['trials'].transform('nunique')
+    add('same_trials', blocks, main & (same > 1), 'block', 'block_number')
+
+    by_schedule = blocks.groupby('file', observed=True)
+    previous_type = by_schedule['action_type'].shift()
+    changes = (previous_type.notna() & (blocks['action_type'] != previous_type)).groupby(blocks['file'],
+                                                                                        observed=True).transform('sum')
+    approach_blocks = (blocks['action_type'] == 'approach').groupby(blocks['file'], observed=True).transform('sum')
+    add('action_balance', blocks, main & ((changes != 1) | (2 * approach_blocks != by_schedule['block_number']
+                                                            .transform('size'))), 'block', 'block_number')
+    for check, column in (('effort_state_pattern', 'global_effort_state'), ('trial_order_pattern', 'trial_order')):
+        previous = by_schedule[column].shift()
+        add(check, blocks, main & previous.notna() & (blocks[column] == previous), 'block', 'block_number')
+    focus_counts = blocks.groupby(['file', 'action_type', 'attention_focus'], observed=True)['block_number'] \
+        .transform('size')
+    add('attention_balance', blocks,
+        main & (focus_counts != focus_counts.groupby(blocks['file'], observed=True).transform('max')),
+        'block', 'block_number')
+
+    # copies: the same trials (in the same rows) as a main schedule of the same folder that comes before it in paths
+    row_hashes = pd.util.hash_pandas_object(table[COLUMNS + ['row']], index=False).to_numpy()
+    contents = pd.DataFrame(dict(file=table['file'].astype(str), hash=row_hashes % np.uint64(2 ** 40))) \
+        .groupby('file', sort=False)['hash'].sum()
+    copied = {}
+    for path, content in contents.items():
+        if schedule_kind(path) == 'main':
+            original = copied.setdefault((os.path.dirname(path), content), path)
+            if original != path:
+                violations['distinct_schedule'] = pd.concat([violations.get('distinct_schedule'), pd.DataFrame(dict(
+                    file=[path], where=['same trials as ' + os.path.basename(original)]))])
+
+    # report
+    kinds = {path: schedule_kind(path) for path in paths}
+    n_trials = by_file.size()
+    report = dict(passed=True, files={})
+    for path in paths:
+        checks = {}
+        for check in CHECKS:
+            if check in MAIN_CHECKS and kinds[path] != 'main':
+                continue
+            if check == 'columns':
+                checks[check] = dict(passed=not missing[path], violations=len(missing[path]),
+                                     examples=missing[path][:MAX_EXAMPLES])
+            elif missing[path]:
+                continue
+            else:
+                found = violations.get(check)
+                found = [] if found is None else found.loc[found['file'] == path, 'where'].tolist()
+                checks[check] = dict(passed=not found, violations=len(found), examples=found[:MAX_EXAMPLES])
+        passed = all(check['passed'] for check in checks.values())
+        report['files'][path] = dict(kind=kinds[path], trials=int(n_trials.get(path, 0)), passed=passed,
+                                     checks=checks)
+        report['passed'] = report['passed'] and passed
+    return report
+
+
+def failures(report):
+    """
+    one line per failed check of the report
+    """
+    return [f"{path}: {check} ({result['violations']} violations, e.g. {', '.join(map(str, result['examples']))})"
+            for path, file_report in report['files'].items()
+            for check, result in file_report['checks'].items() if not result['passed']]
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='check trial schedule csv files')
+    parser.add_argument('paths', nargs='*', help='schedule files (default: all files of the schedule folders)')
+    parser.add_argument('--json', help='file to save the report to')
+    args = parser.parse_args()
+    schedule_paths = args.paths or sorted(path for folder in FOLDERS
+                                          for path in glob.glob(os.path.join(REPOSITORY, folder, 'schedule_*.csv')))
+    start = time.perf_counter()
+    schedule_report = validate(schedule_paths)
+    seconds = time.perf_counter() - start
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(schedule_report, file, indent=1)
+    for line in failures(schedule_report):
+        print(line)
+    print(f"{len(schedule_paths)} schedules checked in {seconds * 1000:.0f} ms: "
+          f"{'all passed' if schedule_report['passed'] else 'FAILED'}")
+    sys.exit(0 if schedule_report['passed'] else 1)
@@ -0,0 +1,239 @@
+"""
+single-file container for everything recorded in a session: <session>.zip next to the behavioural csv
+    config.json                       dialog info, task variables and trigger codes
+    force/trial_<trial>_<chunk>.npy   full-rate gripper stream from the BIOPAC log (timestamp ms, channels...)
+    triggers/trial_<trial>_<chunk>.npy    EEG triggers (session time, code)
+    frames/trial_<trial>_<chunk>.npy  frame intervals (s)
+    files/...                         the session's other files (trial csv, summary, traces, journal, frame timing),
+                                      added when the session ends
+    index.json                        every member with its kind, trial and shape (written when the session ends)
+
+the streams are written in chunks during the session (write_trial() in the ITI, one chunk per stream and trial), and the
+archive is closed after every chunk, so it is a valid zip file even if the session crashes. members are stored
+uncompressed, so the readers open single members, and memory-map arrays, without extracting the archive:
+    archive = session_archive.open_archive('data/2_1_2025-01-22_14h20.17.139.zip')
+    force, trials = archive.stream('force')    # the whole force stream, and the trial of every sample
+    archive.chunks('triggers')        # (trial, memory-mapped array) per chunk
+    archive.csv('files/2_1_2025-01-22_14h20.17.139.csv')
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import io
+import json
+import os
+import re
+import struct
+import zipfile
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class ListTail:
+    """
+    stream source: the items appended to a list (e.g. win.frameIntervals) since the last call
+    """
+    def __init__(self, items, dtype=float):
+        self.items = items
+        self.dtype = dtype
+        self.n_read = len(items)
+
+    def __call__(self, final=False):
+        new_items = self.items[self.n_read:]
+        self.n_read += len(new_items)
+        return np.array(new_items, dtype=self.dtype)
+
+
+class TsvTail:
+    """
+    stream source: the numeric lines added to a tab-separated log (e.g. the BIOPAC log) since the last call.
+    lines that are not complete yet are kept for the next call; non-numeric lines (header, messages) are skipped.
+    """
+    def __init__(self, path, n_columns):
+        self.path = path
+        self.n_columns = n_columns
+        self.offset = 0
+        self.remainder = b''
+
+    def __call__(self, final=False):
+        if not os.path.exists(self.path):
+            return np.zeros((0, self.n_columns))
+        with open(self.path, 'rb') as logfile:
+            logfile.seek(self.offset)
+            new_bytes = logfile.read()
+        self.offset += len(new_bytes)
+        lines = (self.remainder + new_bytes).split(b'\n')
+        # the BIOPAC log starts every sample with a newline, so the last line may still be written to
+        self.remainder = b'' if final else lines.pop()
+        rows = []
+        for line in lines:
+            values = line.split(b'\t')
+            if len(values) == self.n_columns:
+                try:
+                    rows.append([float(value) for value in values])
+                except ValueError:
+                    pass
+        return np.array(rows, dtype=float).reshape(-1, self.n_columns)
+
+
+class SessionArchive:
+    def __init__(self, path, append=False, n_chunks=None):
+        """
+        append continues the archive of a resumed session; if n_chunks is given (the number of chunks at the last
+        checkpoint), the chunks written after it are removed first
+        """
+        self.path = path
+        self.sources = {}  # stream name -> callable returning the new data
+        mode = 'a' if append and os.path.exists(path) else 'w'
+        if mode == 'a' and n_chunks is not None:
+            self._drop_chunks(n_chunks)
+        with zipfile.ZipFile(path, mode, compression=zipfile.ZIP_STORED) as archive:
+            self.n_chunks = sum(name.endswith('.npy') for name in archive.namelist())
+
+    def add_stream(self, name, source):
+        """
+        register a stream: source() returns the data recorded since it was last called
+        """
+        self.sources[name] = source
+
+    def write_config(self, config):
+        with zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr('config.json', json.dumps(config, indent=1, default=str))
+
+    def write_trial(self, trial, final=False):
+        """
+        write the new data of every stream as chunks belonging to trial (call in the ITI, and at the end with final)
+        """
+        with zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_STORED) as archive:
+            for name, source in self.sources.items():
+                data = source(final=final)
+                if len(data):
+                    buffer = io.BytesIO()
+                    np.save(buffer, data)
+                    archive.writestr(f'{name}/trial_{trial:04d}_{self.n_chunks:05d}.npy', buffer.getvalue())
+                    self.n_chunks += 1
+
+    def _drop_chunks(self, n_chunks):
+        """
+        rewrite the archive without the chunks numbered n_chunks or higher (a zip file cannot be cut back in place)
+        """
+        with zipfile.ZipFile(self.path, 'r') as archive:
+            matches = [(member, ArchiveReader.chunk_name.match(member.filename)) for member in archive.infolist()]
+            kept = [member for member, match in matches if match is None or int(match['chunk']) < n_chunks]
+            if len(kept) == len(matches):
+                return
+            with zipfile.ZipFile(self.path + '.tmp', 'w', compression=zipfile.ZIP_STORED) as new_archive:
+                for member in kept:
+                    new_archive.writestr(member, archive.read(member))
+        os.replace(self.path + '.tmp', self.path)
+
+    def close(self, trial, files=()):
+        """
+        write the last chunks (belonging to trial), add the session's files and write the index
+        """
+        self.write_trial(trial, final=True)
+        with zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_STORED) as archive:
+            for path in files:
+                if os.path.exists(path):
+                    archive.write(path, 'files/' + os.path.basename(path))
+        reader = open_archive(self.path)
+        index = reader.build_index()
+        reader.close()
+        with zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr('index.json', json.dumps(index, indent=1))
+
+
+class ArchiveReader:
+    chunk_name = re.compile(r'(?P<kind>[^/]+)/trial_(?P<trial>\d+)_(?P<chunk>\d+)\.npy$')
+
+    def __init__(self, path):
+        self.path = path
+        self.zipfile = zipfile.ZipFile(path, 'r')
+        self.names = self.zipfile.namelist()
+
+    def open(self, name):
+        """
+        file-like object for one member
+        """
+        return self.zipfile.open(name)
+
+    def config(self):
+        return json.loads(self.zipfile.read('config.json'))
+
+    def csv(self, name):
+        import pandas as pd
+        with self.open(name) as member:
+            return pd.read_csv(member)
+
+    def array(self, name):
+        """
+        an .npy member as a read-only memory-mapped array (no copy, no extraction)
+        """
+        info = self.zipfile.getinfo(name)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return np.load(io.BytesIO(self.zipfile.read(name)))
+        with open(self.path, 'rb') as archive:
+            archive.seek(info.header_offset)
+            local_header = archive.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            data_offset = info.header_offset + 30 + name_length + extra_length
+            archive.seek(data_offset)
+            if np.lib.format.read_magic(archive) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(archive)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(archive)
+            array_offset = archive.tell()
+        if int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=array_offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+
+    def chunks(self, kind):
+        """
+        (trial, array) for every chunk of a stream, in the order they were written
+        """
+        found = [(int(match['chunk']), int(match['trial']), name) for name in self.names
+                 for match in [self.chunk_name.match(name)] if match and match['kind'] == kind]
+        return [(trial, self.array(name)) for _, trial, name in sorted(found)]
+
+    def stream(self, kind):
+        """
+        a whole stream as one array (and the trial of every row)
+        """
+        chunks = self.chunks(kind)
+        if not chunks:
+            return np.zeros(0), np.zeros(0, dtype=int)
+        data = np.concatenate([array for _, array in chunks])
+        trials = np.concatenate([np.full(len(array), trial) for trial, array in chunks])
+        return data, trials
+
+    def build_index(self):
+        index = {}
+        for name in self.names:
+            match = self.chunk_name.match(name)
+            if match:
+                array = self.array(name)
+                index[name] = dict(kind=match['kind'], trial=int(match['trial']), shape=list(array.shape),
+                                   dtype=str(array.dtype))
+            else:
+                index[name] = dict(kind=name.split('/')[0] if '/' in name else name,
+                                   size=self.zipfile.getinfo(name).file_size)
+        return index
+
+    def close(self):
+        self.zipfile.close()
+
+    def index(self):
+        if 'index.json' in self.names:
+            return json.loads(self.zipfile.read('index.json'))
+        return self.build_index()  # the session did not finish
+
+
+###################################
+# FUNCTIONS
+###################################
+def open_archive(path):
+    return ArchiveReader(path)
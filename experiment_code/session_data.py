@@ -0,0 +1,66 @@
+"""
+reading and writing the data files of a session
+the trial csv is append-only: main.py writes one line per trial and never rewrites it. session-level fields that are
+only known at the end (end time, duration, bonus payment) go into a small summary file next to it
+(<session>_summary.csv, one header and one data line, replaced atomically). load_session() merges the summary back
+into the last trial, so the data look like the files of earlier sessions, where main.py rewrote the last line.
+
+    trials = session_data.load_session('data/2_1_2025-01-22_14h20.17.139.csv')
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import os
+import pandas as pd
+
+
+###################################
+# FUNCTIONS
+###################################
+def session_name(filename):
+    """
+    the common prefix of a session's files (the trial csv without .csv)
+    """
+    return filename[:-4] if filename.endswith('.csv') else filename
+
+
+def write_summary(filename, summary):
+    """
+    write the session summary (a dict) for the session filename, replacing any earlier summary in one step
+    """
+    path = session_name(filename) + '_summary.csv'
+    with open(path + '.tmp', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(summary.keys())
+        writer.writerow(summary.values())
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def read_summary(filename):
+    """
+    the session summary as a dict, or None if the session has no summary (not finished, or an older file)
+    """
+    path = session_name(filename) + '_summary.csv'
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path).iloc[0].to_dict()
+
+
+def load_session(filename):
+    """
+    the trials of a session as a DataFrame, with the session summary filled into the last trial
+    """
+    trials = pd.read_csv(session_name(filename) + '.csv')
+    summary = read_summary(filename)
+    if summary and len(trials):
+        last = trials.index[-1]
+        for key, value in summary.items():
+            if key in trials.columns:
+                if isinstance(value, str) and trials[key].dtype != object:
+                    trials[key] = trials[key].astype(object)
+                trials.loc[last, key] = value
+    return trials
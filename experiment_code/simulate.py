@@ -0,0 +1,261 @@
+"""
+simulated participant for running whole sessions of main.py without a person (and without a display, see headless.py)
+the agent accepts or rejects offers with a parabolic effort-discounting model (as in old/staircase.py):
+    net value = reward - k * (effort / 10)**2        (for avoid trials, the reward is the loss that is avoided)
+    p(accept) = 1 / (1 + exp(-net value / temperature))
+it answers with realistic response times (slower for offers close to indifference), squeezes a simulated gripper until
+the effort bar is above the target line (so in shifted blocks it exerts more actual effort), and answers the rating
+sliders from its recent outcomes (reward rate) or exertion (heart rate).
+
+a single session runs through main.py with the agent's parameters in the REWARD_EFFORT_SIMULATE environment variable
+(json, all parameters optional), e.g.
+    REWARD_EFFORT_SIMULATE='{"k": 0.8, "seed": 1}' REWARD_EFFORT_DIALOG='{"participant nr": "sim_1", "trial schedule": "A_1"}' python main.py
+
+batches of sessions run in parallel, one main.py process per session:
+    python simulate.py --schedule A_1 --sessions 16 --k 0.5 1 1.5 --jobs 8
+the data files are written to data/ (or training_data/) exactly like real sessions, with participant numbers sim_<n>.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import effort_display
+import headless
+
+
+###################################
+# CLASSES
+###################################
+class SimulatedGripper:
+    """
+    stand-in for the BioPac gripper: sample() returns the raw grip strength of the simulated participant, i.e. the
+    zero baseline plus the force profile of the current squeeze plus tremor
+    """
+    def __init__(self, participant, zero_baseline=0.05, tremor=0.01):
+        self.participant = participant
+        self.zero_baseline = zero_baseline
+        self.tremor = tremor  # sd of the force noise, as a fraction of max strength
+
+    def sample(self):
+        effort = self.participant.effort_at(headless.vsync_clock.now())
+        noise = self.participant.rng.gauss(0, self.tremor)
+        return [self.zero_baseline + (effort / 100 + noise) * self.participant.max_strength]
+
+    def start_recording(self):
+        pass
+
+    def stop_recording(self):
+        pass
+
+
+class SimulatedParticipant:
+    """
+    parameters:
+        k: effort discounting (net value = reward - k * (effort / 10)**2)
+        temperature: choice noise (net value units); small values give near-deterministic choices
+        response_time: non-decision part of the response times (s)
+        response_time_scale: extra response time for offers at indifference (s)
+        squeeze_latency, squeeze_rise: delay (s) and time constant (s) of the force onset after accepting
+        overshoot: how far (fraction of the target) the agent squeezes above the target line
+        capacity: highest effort the agent can produce (% of the effort scale), reduced by fatigue
+        fatigue: capacity lost with every squeeze (% of the effort scale per squeeze at 100% effort)
+        rating_noise: sd of the ratings (slider steps)
+        max_strength: the agent's calibrated max strength (main.py uses this instead of a calibration file)
+        seed: seeds the agent and the task's random jitter, so sessions can be reproduced
+    """
+    def __init__(self, k=1.0, temperature=10.0, response_time=0.35, response_time_scale=0.6, squeeze_latency=0.25,
+                 squeeze_rise=0.2, overshoot=0.08, capacity=110.0, fatigue=0.05, rating_noise=0.7, max_strength=1.0,
+                 seed=None):
+        self.k = k
+        self.temperature = temperature
+        self.response_time = response_time
+        self.response_time_scale = response_time_scale
+        self.squeeze_latency = squeeze_latency
+        self.squeeze_rise = squeeze_rise
+        self.overshoot = overshoot
+        self.capacity = capacity
+        self.fatigue = fatigue
+        self.rating_noise = rating_noise
+        self.max_strength = max_strength
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.gripper = SimulatedGripper(self)
+
+        self.gv = None
+        self.offer = None  # (effort, displayed target, net value) of the current trial
+        self.attention_focus = None
+        self.rating = None  # the rating the agent gives on the current trial
+        self.squeeze = None  # (start time, target effort, hold duration) of the current squeeze
+        self.recent_points = 0.0  # running averages for the ratings
+        self.recent_effort = 0.0
+
+    def start_session(self, gv):
+        """
+        called by main.py once the task variables are set; from then on the agent answers all key presses
+        """
+        self.gv = gv
+        headless.set_responder(self.respond)
+
+    def net_value(self, effort, outcome_level, action_type):
+        reward = outcome_level if action_type == 'approach' else -outcome_level
+        return reward - self.k * (effort / 10) ** 2
+
+    def observe_offer(self, effort, outcome_level, action_type, effort_state, attention_focus):
+        """
+        called by main.py before the decision screen with the offer of the trial
+        """
+        display = effort_display.for_state(effort_state, self.gv)
+        target = display.inverse(effort * (1 + self.overshoot))  # actual effort that puts the bar above the line
+        self.offer = (effort, target, self.net_value(effort, outcome_level, action_type))
+        self.attention_focus = attention_focus
+        self.rating = None
+
+    def observe_outcome(self, points, effort_trace):
+        """
+        called by main.py after the outcome of each trial (before the rating)
+        """
+        effort = max(effort_trace) if effort_trace else 0.0
+        self.recent_points += 0.3 * (points - self.recent_points)
+        self.recent_effort += 0.3 * (effort - self.recent_effort)
+        self.capacity -= self.fatigue * effort / 100
+        self.squeeze = None
+
+    def choose(self):
+        """
+        accept (True) or reject (False) the current offer, and the response time
+        """
+        value = self.offer[2]
+        p_accept = 1 / (1 + math.exp(-max(min(value / self.temperature, 50), -50)))
+        difficulty = 4 * p_accept * (1 - p_accept)  # 1 at indifference, 0 for easy offers
+        rt = self.response_time + self.response_time_scale * difficulty * self.rng.lognormvariate(0, 0.3)
+        return self.rng.random() < p_accept, rt
+
+    def rating_target(self, attention_focus):
+        if attention_focus == 'reward':
+            rating = 5 + self.recent_points / 20  # points are between -100 and 100
+        else:
+            rating = self.recent_effort / 10
+        return int(round(min(max(rating + self.rng.gauss(0, self.rating_noise), 0), 10)))
+
+    def respond(self, key_list):
+        """
+        responder for headless.py: which key to press for the keys the task is waiting for, and after how long
+        """
+        accept_key, reject_key = self.gv['response_keys']
+        if 'space' in key_list and accept_key in key_list:
+            # rating slider: step the marker towards the rating, then confirm
+            if self.rating is None:
+                self.rating = self.rating_target(self.attention_focus)
+            marker = headless.last_slider.markerPos
+            if marker < self.rating:
+                return reject_key, 0.15 + self.rng.expovariate(10)
+            if marker > self.rating:
+                return accept_key, 0.15 + self.rng.expovariate(10)
+            return 'space', 0.4 + self.rng.expovariate(3)
+        if accept_key in key_list and reject_key in key_list and self.offer is not None:
+            accept, rt = self.choose()
+            if accept:
+                hold = self.gv['effort_duration'] + 0.3 + self.rng.expovariate(5)
+                self.squeeze = (headless.vsync_clock.now() + rt, self.offer[1], hold)
+            self.offer = None
+            return (accept_key if accept else reject_key), rt
+        candidates = [key for key in key_list if key != 'q']
+        if not candidates:
+            return None
+        # instructions and quiz: read for a moment, then continue
+        return ('space' if 'space' in candidates else self.rng.choice(candidates)), 0.5 + self.rng.expovariate(2)
+
+    def effort_at(self, t):
+        """
+        effort (% of max strength) the agent exerts at time t: a smooth rise to the target (capped by the agent's
+        capacity), held for a moment, then released
+        """
+        if self.squeeze is None:
+            return 0.0
+        start, target, hold = self.squeeze
+        t = t - start - self.squeeze_latency
+        if t <= 0:
+            return 0.0
+        level = min(target, self.capacity)
+        effort = level * (1 - math.exp(-t / self.squeeze_rise))
+        release = 3 * self.squeeze_rise + hold
+        if t > release:
+            effort *= math.exp(-(t - release) / self.squeeze_rise)
+        return effort
+
+
+###################################
+# FUNCTIONS
+###################################
+def from_environment():
+    """
+    the simulated participant described by the REWARD_EFFORT_SIMULATE environment variable, or None for a real session.
+    seeds the task's random number generators too, so a simulated session is reproducible.
+    """
+    parameters = os.environ.get('REWARD_EFFORT_SIMULATE')
+    if parameters is None:
+        return None
+    parameters = json.loads(parameters or '{}')
+    participant = SimulatedParticipant(**parameters)
+    if participant.seed is not None:
+        random.seed(participant.seed)
+        np.random.seed(participant.seed)
+    return participant
+
+
+def run_session(participant_nr, schedule, parameters, headless_mode='fast'):
+    """
+    run main.py with a simulated participant in a separate process. returns (participant_nr, return code, seconds, the
+    last line of output)
+    """
+    env = dict(os.environ,
+               REWARD_EFFORT_HEADLESS=headless_mode,
+               REWARD_EFFORT_SIMULATE=json.dumps(parameters),
+               REWARD_EFFORT_DIALOG=json.dumps({'participant nr': participant_nr, 'trial schedule': schedule}))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, 'main.py'], env=env, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    output = (process.stdout + process.stderr).strip().splitlines()
+    return participant_nr, process.returncode, time.perf_counter() - start, output[-1] if output else ''
+
+
+def run_batch(schedule, sessions, ks, temperature, seed, jobs, headless_mode='fast'):
+    """
+    run sessions simulated sessions of a schedule, cycling through the k values, jobs at a time
+    """
+    arguments = []
+    for n in range(sessions):
+        parameters = dict(k=ks[n % len(ks)], temperature=temperature, seed=seed + n)
+        arguments.append((f'sim_{seed + n}', schedule, parameters, headless_mode))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:  # each session is its own process
+        for (participant_nr, schedule, parameters, _), result in zip(arguments, executor.map(
+                lambda args: run_session(*args), arguments)):
+            _, returncode, seconds, last_line = result
+            status = 'ok' if returncode == 0 else f'FAILED ({returncode}): {last_line}'
+            print(f"{participant_nr:>10s}  k={parameters['k']:<5g} {seconds:6.1f} s  {status}")
+
+
+###################################
+# MAIN
+###################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run main.py sessions with simulated participants')
+    parser.add_argument('--schedule', default='A_1', help="trial schedule, e.g. A_1 or 'training'")
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--k', type=float, nargs='+', default=[1.0], help='effort discounting, cycled over sessions')
+    parser.add_argument('--temperature', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=1, help='seed of the first session (participant sim_<seed>)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--headless', default='fast', help="'fast' or a simulated refresh rate in Hz (real time)")
+    args = parser.parse_args()
+    run_batch(args.schedule, args.sessions, args.k, args.temperature, args.seed, args.jobs, args.headless)
@@ -0,0 +1,155 @@
+"""
+simulation of the adaptive staircase for the effort cost k (net value = reward - k * effort ** 2, calculate_net_value
+in old/staircase.py) from old/simulate-staircase.ipynb
+estimate_k() runs one simulated participant trial by trial, as in the notebook. simulate() runs a whole batch of
+simulated participants through the staircase together: every trial is a few array operations over participants.
+every participant has their own random stream (spawned from one seed), drawn in one go before the first trial, so a
+participant's staircase is the same whether they are simulated alone, with estimate_k(), or in a batch of any size:
+    estimated_k = staircase.simulate(np.linspace(0.001, 0.999, 1000), n_trials=50, seed=1)
+    estimated_k, history = staircase.simulate(true_ks, seed=1, record=True)    # plus (participants x trials) arrays
+    staircase.recovery(np.linspace(0.001, 0.999, 1000))                         # mean and sd of |true k - estimate|
+the step of k is 0.05 ('fixed') or 0.15 / log(trial + 4) ('log'), and the offers are random ('random') or aimed at a
+net value of about 0 for the current estimate of k ('informative'), the variants of the notebook. old/staircase.py, the
+task that ran the staircase, steps by 'log' and picks its offers the other way round ('task'): a random whole reward
+(4 to 30, at least 2 away from the last one), and the effort that brings the net value close to 0 (rounded to a whole
+effort level).
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+
+
+###################################
+# SETTINGS
+###################################
+INITIAL_OFFER = (18, 6)  # reward and effort of the first trial
+REWARD_RANGE = (8, 28)  # informative rewards are clipped to this range
+RANDOM_REWARD_RANGE = (10, 30)
+TASK_REWARDS = np.arange(4, 31)  # the rewards old/staircase.py offers
+TASK_MIN_REWARD_CHANGE = 2
+EFFORT_RANGE = (1, 10)
+TARGET_NET_VALUE_RANGE = (-1, 1)
+N_DRAWS = 3  # random numbers per trial: response noise, then the next offer's target net value (or reward) and effort
+
+
+###################################
+# FUNCTIONS
+###################################
+def net_value(reward, effort, k):
+    return reward - k * effort * effort  # not ** 2, which rounds differently for numpy scalars and arrays
+
+
+def step_size(trial, step='log'):
+    return 0.15 / np.log(trial + 4) if step == 'log' else 0.05
+
+
+def random_streams(n_participants, n_trials, seed=None):
+    """
+    the uniform random numbers of every participant, as a (participants x trials x N_DRAWS) array. participant i gets
+    the i-th stream spawned from seed, so their numbers do not depend on how many participants are simulated
+    """
+    streams = np.random.SeedSequence(seed).spawn(n_participants)
+    return np.stack([np.random.Generator(np.random.PCG64(stream)).random((n_trials, N_DRAWS)) for stream in streams])
+
+
+def task_offer(estimated_k, draws, reward):
+    """
+    the next offer of old/staircase.py after an offer of reward: the new reward is drawn uniformly from the task's
+    rewards at least TASK_MIN_REWARD_CHANGE away from it (what the task's redraw loop amounts to), the effort is the one
+    with a net value of target for the estimated k, rounded and clipped to the effort range (1 if there is none)
+    """
+    target = TARGET_NET_VALUE_RANGE[0] + (TARGET_NET_VALUE_RANGE[1] - TARGET_NET_VALUE_RANGE[0]) * draws[..., 1]
+    allowed = np.abs(TASK_REWARDS - np.asarray(reward, dtype=float)[..., None]) >= TASK_MIN_REWARD_CHANGE
+    choice = np.floor(draws[..., 2] * allowed.sum(axis=-1))  # the choice-th allowed reward
+    new_reward = TASK_REWARDS[np.argmax(np.cumsum(allowed, axis=-1) > choice[..., None], axis=-1)].astype(float)
+    with np.errstate(divide='ignore'):
+        squared_effort = (new_reward - target) / estimated_k
+    effort = np.where(squared_effort > 0, np.clip(np.round(np.sqrt(np.abs(squared_effort))), *EFFORT_RANGE), 1.0)
+    return new_reward, effort
+
+
+def next_offer(estimated_k, draws, offers='informative', reward=None):
+    """
+    reward and effort of the next trial from the uniform draws of this trial (scalars or arrays over participants).
+    the 'task' offers also depend on the reward of this trial
+    """
+    if offers == 'task':
+        return task_offer(estimated_k, draws, reward)
+    effort = EFFORT_RANGE[0] + (EFFORT_RANGE[1] - EFFORT_RANGE[0]) * draws[..., 2]
+    if offers == 'informative':
+        target = TARGET_NET_VALUE_RANGE[0] + (TARGET_NET_VALUE_RANGE[1] - TARGET_NET_VALUE_RANGE[0]) * draws[..., 1]
+        reward = np.clip(estimated_k * effort * effort + target, *REWARD_RANGE)
+    else:
+        reward = RANDOM_REWARD_RANGE[0] + (RANDOM_REWARD_RANGE[1] - RANDOM_REWARD_RANGE[0]) * draws[..., 1]
+    return reward, effort
+
+
+def estimate_k(true_k, draws=None, n_trials=50, initial_k=0.5, noise=0.1, step='log', offers='informative'):
+    """
+    one simulated participant, trial by trial (draws: their (trials x N_DRAWS) uniform random numbers, e.g. a row of
+    random_streams()). returns the final estimate of k and the offers, estimates, estimated net values and responses of
+    every trial
+    """
+    draws = np.random.random((n_trials, N_DRAWS)) if draws is None else draws
+    estimated_k = initial_k
+    reward, effort = INITIAL_OFFER
+    rewards, efforts, estimated_ks, estimated_net_values, responses = [], [], [], [], []
+    for trial in range(len(draws)):
+        accept = net_value(reward, effort, true_k) > 0
+        if draws[trial, 0] < noise:  # flip the response with a probability equal to noise
+            accept = not accept
+        estimated_net_value = net_value(reward, effort, estimated_k)
+        rewards.append(reward)
+        efforts.append(effort)
+        estimated_ks.append(estimated_k)
+        estimated_net_values.append(estimated_net_value)
+        responses.append('accept' if accept else 'reject')
+        if estimated_net_value < 0 and accept:
+            estimated_k -= step_size(trial, step)
+        elif estimated_net_value > 0 and not accept:
+            estimated_k += step_size(trial, step)
+        reward, effort = next_offer(estimated_k, draws[trial], offers, reward)
+    return estimated_k, rewards, efforts, estimated_ks, estimated_net_values, responses
+
+
+def simulate(true_ks, n_trials=50, initial_k=0.5, noise=0.1, step='log', offers='informative', seed=None, draws=None,
+             record=False):
+    """
+    all participants (one per true k) through the staircase together. returns the final estimates of k, and with
+    record the offers, estimates, estimated net values and responses (True for accept) as (participants x trials)
+    arrays
+    """
+    true_ks = np.asarray(true_ks, dtype=float)
+    n = len(true_ks)
+    draws = random_streams(n, n_trials, seed) if draws is None else draws
+    n_trials = draws.shape[1]
+    estimated_k = np.full(n, float(initial_k))
+    reward, effort = np.full(n, float(INITIAL_OFFER[0])), np.full(n, float(INITIAL_OFFER[1]))
+    if record:
+        history = {name: np.zeros((n, n_trials))
+                   for name in ('rewards', 'efforts', 'estimated_ks', 'estimated_net_values')}
+        history['responses'] = np.zeros((n, n_trials), dtype=bool)
+    for trial in range(n_trials):
+        accept = (net_value(reward, effort, true_ks) > 0) ^ (draws[:, trial, 0] < noise)
+        estimated_net_value = net_value(reward, effort, estimated_k)
+        if record:
+            history['rewards'][:, trial], history['efforts'][:, trial] = reward, effort
+            history['estimated_ks'][:, trial] = estimated_k
+            history['estimated_net_values'][:, trial] = estimated_net_value
+            history['responses'][:, trial] = accept
+        size = step_size(trial, step)
+        estimated_k = estimated_k - size * ((estimated_net_value < 0) & accept) \
+            + size * ((estimated_net_value > 0) & ~accept)
+        reward, effort = next_offer(estimated_k, draws[:, trial], offers, reward)
+    return (estimated_k, history) if record else estimated_k
+
+
+def recovery(true_ks, **simulate_args):
+    """
+    mean and sd of the absolute difference between the true and the estimated k (the notebook's check over 1000 true
+    ks)
+    """
+    differences = np.abs(np.asarray(true_ks) - simulate(true_ks, **simulate_args))
+    return differences.mean(), differences.std()
@@ -0,0 +1,88 @@
+"""
+faster startup of main.py: numpy, pandas and the task modules that do not touch psychopy (BACKGROUND_MODULES) are
+imported on a background thread while the participant info pop-up is open, and startup times are recorded with mark().
+psychopy.visual (pyglet and OpenGL) and the modules that use it are imported on the main thread once the pop-up is
+closed, as the GUI toolkits must not be loaded off the main thread while the pop-up's event loop runs.
+    dialog_closed        the pop-up was closed
+    first_frame          the first screen (the welcome screen) is on the monitor
+    first_trial_ready    the stimuli of the first trial are built (after the instructions)
+the times are seconds since main.py started; report() prints them and saves them to <session>_startup.csv.
+bench_startup.py runs main.py headless a few times and summarises these times.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import importlib
+import threading
+import time
+
+_start = time.perf_counter()  # main.py imports this module first
+
+
+###################################
+# SETTINGS
+###################################
+BACKGROUND_MODULES = ['numpy', 'effort_display', 'simulate', 'session_data', 'checkpoint', 'session_archive',
+                      'calibration_store', 'schedule_store', 'schedule_validator', 'effort_traces', 'journal',
+                      'frame_timing', 'tracing', 'timeline']
+
+
+###################################
+# FUNCTIONS
+###################################
+marks = {}
+_import_thread = None
+_import_error = None
+
+
+def _import_all(modules):
+    global _import_error
+    try:
+        for module in modules:
+            importlib.import_module(module)
+    except BaseException as error:  # re-raised in the main thread by wait_for_imports()
+        _import_error = error
+
+
+def import_in_background(modules):
+    """
+    start importing modules (names) on a background thread
+    """
+    global _import_thread
+    _import_thread = threading.Thread(target=_import_all, args=(list(modules),), name='background_imports', daemon=True)
+    _import_thread.start()
+
+
+def wait_for_imports():
+    """
+    wait until the background imports are done (the import statements after this only look the modules up)
+    """
+    if _import_thread is not None:
+        _import_thread.join()
+    if _import_error is not None:
+        raise _import_error
+
+
+def mark(name):
+    """
+    record the time of a startup step (only the first time it happens, e.g. first_frame)
+    """
+    if name not in marks:
+        marks[name] = time.perf_counter() - _start
+
+
+def report(filename=None):
+    """
+    print the startup times, and save them to <filename>_startup.csv
+    """
+    for name, seconds in marks.items():
+        print(f'Startup: {name:20s} {seconds:7.3f} s')
+    if 'dialog_closed' in marks and 'first_frame' in marks:
+        print(f"Startup: dialog to first frame {marks['first_frame'] - marks['dialog_closed']:.3f} s")
+    if filename is not None:
+        with open(filename + '_startup.csv', 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['step', 'seconds'])
+            writer.writerows(marks.items())
@@ -0,0 +1,88 @@
+"""
+streaming estimates of grip strength for gripper_calibration.py
+a StrengthStream collects timestamped samples (the full-rate BIOPAC stream, or the mouse in dummy mode) with running
+prefix sums, so adding a sample is O(1) and the mean over any time window is two binary searches and a subtraction:
+    stream = strength_stream.StrengthStream()
+    stream.extend(*gripper.read_buffer())    # BIOPAC timestamps (ms) and values since the last call
+    stream.mean_last(2)                      # mean of the last 2 seconds (the zero baseline)
+    stream.peak_window_mean(0.25)            # mean of the half second around the peak (the max strength of a trial)
+windows are defined by time, not by sample count, so they do not depend on how fast the samples come in.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class StrengthStream:
+    def __init__(self, time_scale=1.0, capacity=2048):
+        """
+        time_scale converts the sample timestamps to seconds (0.001 for the millisecond BIOPAC timestamps)
+        """
+        self.time_scale = time_scale
+        self._times = np.zeros(capacity)
+        self._sums = np.zeros(capacity + 1)  # _sums[i] is the sum of the first i values
+        self.n = 0
+        self.peak = -np.inf
+        self.peak_index = None
+
+    def add(self, t, value):
+        """
+        add one sample (timestamps must not decrease)
+        """
+        if self.n == len(self._times):
+            self._times = np.concatenate([self._times, np.zeros_like(self._times)])  # double the capacity
+            self._sums = np.concatenate([self._sums, np.zeros(len(self._sums) - 1)])
+        self._times[self.n] = t * self.time_scale
+        self._sums[self.n + 1] = self._sums[self.n] + value
+        if value > self.peak:
+            self.peak = value
+            self.peak_index = self.n
+        self.n += 1
+
+    def extend(self, times, values):
+        for t, value in zip(times, values):
+            self.add(t, value)
+
+    @property
+    def times(self):
+        """
+        sample times in seconds
+        """
+        return self._times[:self.n]
+
+    @property
+    def values(self):
+        return np.diff(self._sums[:self.n + 1])
+
+    def mean(self, start, end):
+        """
+        mean of the samples from start up to and including end (seconds), nan if there are none
+        """
+        first = np.searchsorted(self.times, start, side='left')
+        last = np.searchsorted(self.times, end, side='right')
+        if last <= first:
+            return np.nan
+        return (self._sums[last] - self._sums[first]) / (last - first)
+
+    def mean_last(self, duration):
+        """
+        mean of the last duration seconds
+        """
+        if self.n == 0:
+            return np.nan
+        end = self._times[self.n - 1]
+        return self.mean(end - duration, end)
+
+    def peak_window_mean(self, half_width=0.25):
+        """
+        mean of the samples within half_width seconds of the peak sample
+        """
+        if self.peak_index is None:
+            return np.nan
+        peak_time = self._times[self.peak_index]
+        return self.mean(peak_time - half_width, peak_time + half_width)
@@ -0,0 +1,60 @@
+"""
+cache of pre-rendered TextStims (and other stimuli that are expensive to build, like the rating sliders)
+changing TextStim.text forces a full re-layout and texture upload, so every string the session will show gets its own
+TextStim, keyed by (string, font, height, wrap width, style). warm_up() draws them all once at startup so that the
+first time a screen is shown it only takes one frame.
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+from backend import visual
+
+
+###################################
+# CLASSES
+###################################
+class TextCache:
+    def __init__(self, win):
+        self.win = win
+        self._stims = {}
+
+    def get(self, text, like=None, **style):
+        """
+        return a TextStim showing text. the style is copied from the TextStim like (if given) and then overridden by
+        any keyword arguments (font, height, wrapWidth, pos, color, bold, alignText).
+        the position is not part of the key: a cached stim is moved to the requested position.
+        """
+        if like is not None:
+            style = {**dict(font=like.font, height=like.height, wrapWidth=like.wrapWidth, pos=like.pos,
+                            color=like.color, bold=like.bold, alignText=like.alignText), **style}
+        key = (text, style.get('font'), style.get('height'), style.get('wrapWidth'), style.get('bold', False),
+               str(style.get('color')), style.get('alignText', 'center'))
+        stim = self._stims.get(key)
+        if stim is None:
+            stim = visual.TextStim(self.win, text=text, **style)
+            self._stims[key] = stim
+        elif 'pos' in style:
+            stim.pos = style['pos']
+        return stim
+
+    def get_or_create(self, key, create):
+        """
+        cache any other stimulus (e.g. a rating slider): create() is only called the first time key is requested
+        """
+        if key not in self._stims:
+            self._stims[key] = create()
+        return self._stims[key]
+
+    def warm_up(self, texts=(), like=None, stimuli=(), **style):
+        """
+        pre-render texts (with the given style) and stimuli by drawing them once to the back buffer, which is then cleared
+        """
+        for text in texts:
+            self.get(text, like, **style).draw()
+        for stim in stimuli:
+            stim.draw()
+        self.win.clearBuffer()
+
+    def __len__(self):
+        return len(self._stims)
@@ -0,0 +1,104 @@
+"""
+frame-locked animation timeline for the outcome animations in helper_functions.py
+animations are described as functions of elapsed time (in seconds) rather than of frame number, so their duration and
+speed no longer depend on the monitor refresh rate or on how long each frame takes to draw
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class Timeline:
+    """
+    a set of tracks that are evaluated once per screen refresh.
+    each track is a function of elapsed time that sets one property (position, opacity, ...) of one or more stimuli.
+    the time passed to the tracks is the predicted onset of the frame being drawn, so if a frame is dropped the next
+    frame simply jumps ahead to where the animation should be rather than lagging behind.
+    """
+    def __init__(self, win, duration):
+        self.win = win
+        self.duration = duration
+        self.tracks = []
+        self.frame_period = win.monitorFramePeriod or 1 / 60
+
+    def add(self, stimuli, attribute, function):
+        """
+        add a track: for every stimulus, stimulus.<attribute> = function(t, start_value) on each frame,
+        where t is the elapsed time and start_value is the value of the attribute when the animation starts
+        """
+        if not isinstance(stimuli, list):
+            stimuli = [stimuli]
+        for stim in stimuli:
+            self.tracks.append((stim, attribute, function))
+        return self
+
+    def play(self, draw):
+        """
+        run the animation. draw is called once per frame, must draw and flip the window and return the flip time.
+        returns the achieved duration (first to last flip), the number of frames shown and the number of dropped frames.
+        """
+        start_values = [np.array(getattr(stim, attribute), dtype=float) for stim, attribute, _ in self.tracks]
+        first_flip = None
+        last_flip = None
+        n_frames = 0
+        dropped_frames = 0
+
+        t = 0.0
+        while True:
+            t = min(t, self.duration)
+            for (stim, attribute, function), start_value in zip(self.tracks, start_values):
+                setattr(stim, attribute, function(t, start_value))
+            flip_time = draw()
+            n_frames += 1
+
+            if first_flip is None:
+                first_flip = flip_time
+            else:
+                # any interval longer than one refresh means we missed one or more frames
+                dropped_frames += max(0, int(round((flip_time - last_flip) / self.frame_period)) - 1)
+            last_flip = flip_time
+
+            if t >= self.duration:
+                break
+            t = last_flip + self.frame_period - first_flip  # predicted onset of the next frame
+
+        return dict(duration=last_flip - first_flip, frames=n_frames, dropped_frames=dropped_frames)
+
+
+###################################
+# FUNCTIONS
+###################################
+def linear_move(distance, duration):
+    """
+    track function: move from the start position by distance (x, y) at constant speed over duration
+    """
+    distance = np.array(distance, dtype=float)
+    return lambda t, start: start + distance * (t / duration)
+
+
+def accelerate_move(distance, duration):
+    """
+    track function: move from the start position by distance (x, y), starting slow and speeding up (falling)
+    """
+    distance = np.array(distance, dtype=float)
+    return lambda t, start: start + distance * (t / duration) ** 2
+
+
+def fade_out(duration):
+    """
+    track function: fade the opacity from its start value down to 0 over duration
+    """
+    return lambda t, start: start * (1 - t / duration)
+
+
+def follow(leader, offset):
+    """
+    track function: stay at a fixed offset from another stimulus (e.g. the flame under the spaceship)
+    """
+    offset = np.array(offset, dtype=float)
+    return lambda t, start: np.array(leader.pos, dtype=float) + offset
@@ -0,0 +1,155 @@
+"""
+opt-in span tracing of the trial loop (stimulus construction, drawing, flips, triggers, key polling, effort sampling,
+ratings, csv writes). turned on with the REWARD_EFFORT_TRACE environment variable; when it is off, traced() leaves the
+functions untouched and span() returns a shared no-op context manager, so the instrumentation costs next to nothing.
+
+at the end of a session save() writes the spans as a chrome trace-event file (open *_trace.json in chrome://tracing or
+https://ui.perfetto.dev) and a per-span latency table (*_latency.csv, also printed).
+
+    REWARD_EFFORT_TRACE=1 python main.py
+    python tracing.py data/2_1_2025-01-22_14h20.17.139_trace.json    # print the latency table of a saved trace
+"""
+
+###################################
+# IMPORT PACKAGES
+###################################
+import csv
+import functools
+import json
+import os
+import sys
+import time
+import numpy as np
+
+
+###################################
+# CLASSES
+###################################
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        _spans.append((self.name, self.start, time.perf_counter_ns() - self.start, _trial, self.args))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+###################################
+# FUNCTIONS
+###################################
+ENABLED = bool(os.environ.get('REWARD_EFFORT_TRACE'))
+_spans = []  # (name, start ns, duration ns, trial, args)
+_trial = 0
+_no_span = _NoSpan()
+
+
+def span(name, **args):
+    """
+    context manager that records how long its block takes, e.g.
+        with tracing.span('csv_write'):
+            datafile.write(...)
+    """
+    if not ENABLED:
+        return _no_span
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """
+    decorator that records every call of a function as a span (named after the function unless a name is given)
+    """
+    def decorate(function):
+        if not ENABLED:
+            return function
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _spans.append((span_name, start, time.perf_counter_ns() - start, _trial, None))
+        return wrapper
+    return decorate
+
+
+def set_trial(trial):
+    """
+    spans recorded from now on belong to this trial
+    """
+    global _trial
+    _trial = trial
+
+
+def trace_events(spans):
+    """
+    spans as chrome trace events (complete events, timestamps in microseconds from the first span)
+    """
+    t0 = min((start for _, start, _, _, _ in spans), default=0)
+    return [dict(name=name, cat='task', ph='X', ts=(start - t0) / 1000, dur=duration / 1000, pid=os.getpid(), tid=0,
+                 args=dict(args or {}, trial=trial))
+            for name, start, duration, trial, args in spans]
+
+
+def latency_table(events):
+    """
+    count, total, mean, median, p99 and max duration (ms) per span name, from chrome trace events
+    """
+    durations = {}
+    for event in events:
+        durations.setdefault(event['name'], []).append(event['dur'] / 1000)
+    rows = []
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values = np.array(values)
+        rows.append(dict(span=name, count=len(values), total_ms=round(float(values.sum()), 3),
+                         mean_ms=round(float(values.mean()), 4), median_ms=round(float(np.median(values)), 4),
+                         p99_ms=round(float(np.percentile(values, 99)), 4), max_ms=round(float(values.max()), 4)))
+    return rows
+
+
+def print_latency_table(rows):
+    print(f"{'span':22s} {'count':>7s} {'total ms':>10s} {'mean ms':>9s} {'median':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for row in rows:
+        print(f"{row['span']:22s} {row['count']:7d} {row['total_ms']:10.1f} {row['mean_ms']:9.3f} "
+              f"{row['median_ms']:9.3f} {row['p99_ms']:9.3f} {row['max_ms']:9.3f}")
+
+
+def save(filename):
+    """
+    write filename_trace.json and filename_latency.csv and print the latency table (does nothing if tracing is off)
+    """
+    if not ENABLED:
+        return
+    events = trace_events(_spans)
+    with open(filename + '_trace.json', 'w') as tracefile:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), tracefile)
+    rows = latency_table(events)
+    with open(filename + '_latency.csv', 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()) if rows else ['span'])
+        writer.writeheader()
+        writer.writerows(rows)
+    print_latency_table(rows)
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        with open(path, 'r') as tracefile:
+            print_latency_table(latency_table(json.load(tracefile)['traceEvents']))